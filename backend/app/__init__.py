@@ -1,13 +1,13 @@
-from flask import Flask
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_identity
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
-from redis import Redis
 from config.config import config
+from app.utils.replica import RoutingSession, REPLICA_BIND
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 bcrypt = Bcrypt()
 redis_client = None
@@ -16,6 +16,36 @@ def create_app():
     """Application factory function"""
     app = Flask(__name__)
     app.config.from_object(config)
+    # from_object skips lower-case names, which is how Celery settings are
+    # spelled; copy them too so the worker and the web client share them
+    app.config.update({
+        key: getattr(config, key) for key in dir(config)
+        if key.islower() and not key.startswith('_') and not callable(getattr(config, key))
+    })
+
+    # Database engines: pool settings shared by the primary and the replica
+    database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    engine_options = {}
+    if database_uri not in ('sqlite://', 'sqlite:///:memory:'):
+        engine_options.update(
+            pool_size=app.config['DB_POOL_SIZE'],
+            max_overflow=app.config['DB_MAX_OVERFLOW'],
+            pool_timeout=app.config['DB_POOL_TIMEOUT'],
+            pool_recycle=app.config['DB_POOL_RECYCLE'],
+            pool_pre_ping=app.config['DB_POOL_PRE_PING']
+        )
+    if database_uri.startswith('sqlite'):
+        from app.utils.sqlite import sqlite_engine_options
+        engine_options.update(sqlite_engine_options(app.config))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options,
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    if app.config['DATABASE_REPLICA_URL']:
+        app.config['SQLALCHEMY_BINDS'] = {
+            **(app.config.get('SQLALCHEMY_BINDS') or {}),
+            REPLICA_BIND: app.config['DATABASE_REPLICA_URL']
+        }
 
     # Initialize extensions
     db.init_app(app)
@@ -23,10 +53,31 @@ def create_app():
     bcrypt.init_app(app)
     CORS(app)
 
+    from app.utils import sql_metrics
+    sql_metrics.init_app(app)
+
+    from app.utils import slow_queries
+    slow_queries.init_app(app)
+
+    @app.after_request
+    def pin_writer_to_primary(response):
+        """Keep a user who just changed data off the replica for a while"""
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            try:
+                verify_jwt_in_request(optional=True)
+                user_id = get_jwt_identity()
+            except Exception:
+                user_id = None
+            if user_id is not None:
+                from app.utils.replica import mark_recent_write
+                mark_recent_write(user_id)
+        return response
+
     # Initialize Redis
     global redis_client
     try:
-        redis_client = Redis.from_url(app.config['REDIS_URL'], decode_responses=True)
+        from app.utils.redis_pool import ResilientRedis
+        redis_client = ResilientRedis.from_config(app.config)
     except Exception as e:
         print(f"Redis connection failed: {e}")
         redis_client = None
@@ -40,7 +91,15 @@ def create_app():
 
     # Create database tables
     with app.app_context():
+        from app.utils.sqlite import apply_sqlite_pragmas
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                apply_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
         db.create_all()
+        # create_all skips existing tables, so add indexes declared since
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
         # Create default admin user
         from app.models.user import User
         admin_exists = User.query.filter_by(role='admin').first()
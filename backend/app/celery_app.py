@@ -3,6 +3,7 @@ Celery configuration and initialization
 """
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 from config.config import config
 from app import create_app
 
@@ -24,14 +25,22 @@ def make_celery(flask_app):
 
     # Configure periodic tasks
     celery.conf.beat_schedule = {
-        'send-daily-reminders': {
-            'task': 'app.tasks.send_daily_reminders',
-            'schedule': crontab(hour=00, minute=55),
+        'dispatch-due-reminders': {
+            'task': 'app.tasks.dispatch_due_reminders',
+            'schedule': crontab(),
+        },
+        'sync-reminder-schedule': {
+            'task': 'app.tasks.sync_reminder_schedule',
+            'schedule': crontab(minute=5),
         },
         'send-monthly-reports': {
             'task': 'app.tasks.send_monthly_reports',
             'schedule': crontab(day_of_month=30, hour=00, minute=55),
         },
+        'sweep-exports': {
+            'task': 'app.tasks.sweep_exports',
+            'schedule': crontab(minute=15),
+        },
     }
 
     class ContextTask(celery.Task):
@@ -41,6 +50,12 @@ def make_celery(flask_app):
                 return self.run(*args, **kwargs)
 
     celery.Task = ContextTask
+
+    from app.utils import sql_metrics, email_templates
+    sql_metrics.init_celery(celery, flask_app)
+
+    # Compile email templates before the first task instead of during it
+    worker_process_init.connect(lambda **kwargs: email_templates.precompile(), weak=False)
     return celery
 
 celery = make_celery(flask_app)
\ No newline at end of file
@@ -5,6 +5,8 @@ from app.models.patient import Patient
 from app.models.department import Department
 from app.models.appointment import Appointment
 from app.models.treatment import Treatment
+from app.models.export_job import ExportJob
+from app.models.reminder_delivery import ReminderDelivery
 
 __all__ = [
     'User',
@@ -13,5 +15,7 @@ __all__ = [
     'Patient',
     'Department',
     'Appointment',
-    'Treatment'
+    'Treatment',
+    'ExportJob',
+    'ReminderDelivery'
 ]
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from app import db
 
 class Appointment(db.Model):
@@ -18,8 +19,32 @@ class Appointment(db.Model):
     #Treatment table relationship
     treatment = db.relationship('Treatment', backref='appointment', uselist=False, cascade='all, delete-orphan')
 
-    #Unique constraint to prevent double booking
-    __table_args__ = (db.UniqueConstraint('doctor_id', 'appointment_date', 'appointment_time', name='_doctor_datetime_uc'),)
+    #Unique constraint to prevent double booking, plus composite indexes
+    #matching the filter and sort order of the list and dashboard queries
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'appointment_date', 'appointment_time', name='_doctor_datetime_uc'),
+        db.Index('ix_appointments_doctor_status_date', 'doctor_id', 'status', 'appointment_date'),
+        db.Index('ix_appointments_doctor_patient', 'doctor_id', 'patient_id'),
+        db.Index('ix_appointments_patient_date', 'patient_id', 'appointment_date'),
+        db.Index('ix_appointments_status_date', 'status', 'appointment_date'),
+    )
+
+    @staticmethod
+    def eager_options(include_details=False):
+        """Loader options matching to_dict(include_details=...).
+
+        Loads everything the serializer touches in the same query so list
+        endpoints run a constant number of statements.
+        """
+        if not include_details:
+            return []
+
+        from app.models.doctor import Doctor
+        return [
+            joinedload(Appointment.patient),
+            joinedload(Appointment.doctor).joinedload(Doctor.department),
+            joinedload(Appointment.treatment)
+        ]
 
     def to_dict(self, include_details=False):
         """Convert appointment to dictionary"""
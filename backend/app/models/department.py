@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import func
 from app import db
 
 class Department(db.Model):
@@ -18,13 +19,30 @@ class Department(db.Model):
         """Count of registered doctors in this department"""
         return self.doctors.filter_by(is_available=True).count()
 
-    def to_dict(self):
+    @staticmethod
+    def available_doctor_counts(dept_ids=None):
+        """Map department id to its count of available doctors in one GROUP BY query"""
+        from app.models.doctor import Doctor
+        query = db.session.query(Doctor.department_id, func.count(Doctor.id)).filter(
+            Doctor.is_available == True
+        )
+        if dept_ids is not None:
+            query = query.filter(Doctor.department_id.in_(dept_ids))
+        return dict(query.group_by(Doctor.department_id).all())
+
+    @staticmethod
+    def to_dict_many(departments):
+        """Convert a list of departments using a single count query"""
+        counts = Department.available_doctor_counts([dept.id for dept in departments])
+        return [dept.to_dict(doctors_count=counts.get(dept.id, 0)) for dept in departments]
+
+    def to_dict(self, doctors_count=None):
         """Convert department to dictionary"""
         return {
             'id': self.id,
             'name': self.name,
             'description': self.description,
-            'doctors_count': self.doctors_count,
+            'doctors_count': self.doctors_count if doctors_count is None else doctors_count,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from app import db
 
 class Doctor(db.Model):
@@ -18,10 +19,18 @@ class Doctor(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    #Department listings and counts filter on both columns
+    __table_args__ = (db.Index('ix_doctors_department_available', 'department_id', 'is_available'),)
+
     #Relationships
     appointments = db.relationship('Appointment', backref='doctor', lazy='dynamic', cascade='all, delete-orphan')
     availability_slots = db.relationship('DoctorAvailability', backref='doctor', lazy='dynamic', cascade='all, delete-orphan')
 
+    @staticmethod
+    def eager_options():
+        """Loader options matching to_dict()"""
+        return [joinedload(Doctor.department)]
+
     def to_dict(self):
         """Convert doctor to dictionary"""
         data = {
@@ -57,8 +66,12 @@ class DoctorAvailability(db.Model):
     is_available = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    # Unique constraint to prevent duplicate slots
-    __table_args__ = (db.UniqueConstraint('doctor_id', 'date', 'start_time', name='_doctor_date_time_uc'),)
+    # Unique constraint to prevent duplicate slots, plus a covering index
+    # for the per-doctor date range lookups
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'date', 'start_time', name='_doctor_date_time_uc'),
+        db.Index('ix_doctor_availability_doctor_date', 'doctor_id', 'date', 'is_available'),
+    )
 
     def to_dict(self):
         """Convert availability to dictionary"""
@@ -0,0 +1,68 @@
+import json
+import hashlib
+from datetime import datetime
+from app import db
+
+class ExportJob(db.Model):
+    """Background CSV export and the artifact it produced"""
+    __tablename__ = 'export_jobs'
+
+    IN_FLIGHT_STATUSES = ('Pending', 'Running')
+    FINAL_STATUSES = ('Completed', 'Failed')
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    kind = db.Column(db.String(50), nullable=False)  # 'treatments'
+    params = db.Column(db.Text, nullable=False)  # JSON, normalized by params_json
+    request_hash = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), default='Pending', nullable=False, index=True)  # 'Pending', 'Running', 'Completed', 'Failed'
+    total_rows = db.Column(db.Integer, nullable=True)
+    rows_written = db.Column(db.Integer, default=0, nullable=False)
+    file_name = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def params_json(params):
+        """Canonical JSON for params, so equal requests hash the same"""
+        return json.dumps(params, sort_keys=True, separators=(',', ':'))
+
+    @staticmethod
+    def hash_request(kind, params):
+        """Hash identifying an export request by what it would contain"""
+        return hashlib.sha256(f"{kind}:{ExportJob.params_json(params)}".encode()).hexdigest()
+
+    def get_params(self):
+        return json.loads(self.params)
+
+    @property
+    def progress(self):
+        """Percentage of rows written, once the row count is known"""
+        if self.status == 'Completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.rows_written * 100 / self.total_rows))
+
+    def to_dict(self):
+        """Convert export job to dictionary"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.get_params(),
+            'status': self.status,
+            'progress': self.progress,
+            'total_rows': self.total_rows,
+            'rows_written': self.rows_written,
+            'file_name': self.file_name,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+    def __repr__(self):
+        return f'<ExportJob {self.id} {self.kind} {self.status}>'
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+class ReminderDelivery(db.Model):
+    """Ledger of reminder emails, one row per appointment and reminder type.
+
+    A reminder is only sent by whoever moves its row to 'Sending', so
+    re-running or retrying the reminder job never sends a message twice.
+    """
+    __tablename__ = 'reminder_deliveries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), nullable=False)
+    reminder_type = db.Column(db.String(30), nullable=False)  # 'appointment'
+    status = db.Column(db.String(20), default='Pending', nullable=False, index=True)  # 'Pending', 'Sending', 'Retrying', 'Sent', 'Skipped', 'Dead'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('appointment_id', 'reminder_type', name='_appointment_reminder_uc'),
+    )
+
+    # States in which nothing is left to do
+    FINAL_STATUSES = ('Sent', 'Skipped', 'Dead')
+
+    @staticmethod
+    def ensure(appointment_ids, reminder_type):
+        """Ledger rows for appointment_ids, created where missing: {appointment_id: (id, status)}"""
+        def existing():
+            return {
+                appointment_id: (delivery_id, status)
+                for delivery_id, appointment_id, status in db.session.query(
+                    ReminderDelivery.id, ReminderDelivery.appointment_id, ReminderDelivery.status
+                ).filter(
+                    ReminderDelivery.appointment_id.in_(appointment_ids),
+                    ReminderDelivery.reminder_type == reminder_type
+                )
+            }
+
+        deliveries = existing()
+        missing = [appointment_id for appointment_id in appointment_ids if appointment_id not in deliveries]
+        if missing:
+            insert = ReminderDelivery.__table__.insert()
+            try:
+                db.session.execute(insert, [
+                    {'appointment_id': appointment_id, 'reminder_type': reminder_type}
+                    for appointment_id in missing
+                ])
+                db.session.commit()
+            except IntegrityError:
+                # Another run created some of them first; add the rest one by one
+                db.session.rollback()
+                for appointment_id in missing:
+                    try:
+                        db.session.execute(insert.values(appointment_id=appointment_id, reminder_type=reminder_type))
+                        db.session.commit()
+                    except IntegrityError:
+                        db.session.rollback()
+            deliveries = existing()
+        return deliveries
+
+    @staticmethod
+    def claim(delivery_id, lease_seconds):
+        """Atomically mark a delivery as being sent; False if it is done or in flight.
+
+        A 'Sending' row older than lease_seconds belongs to a worker that
+        died mid-send and may be claimed again.
+        """
+        now = datetime.utcnow()
+        result = db.session.execute(
+            ReminderDelivery.__table__.update().where(
+                ReminderDelivery.id == delivery_id,
+                ReminderDelivery.status.notin_(ReminderDelivery.FINAL_STATUSES),
+                or_(
+                    ReminderDelivery.status != 'Sending',
+                    ReminderDelivery.updated_at < now - timedelta(seconds=lease_seconds)
+                )
+            ).values(
+                status='Sending',
+                attempts=ReminderDelivery.attempts + 1,
+                updated_at=now
+            )
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def mark(delivery_id, status, error=None):
+        """Record the outcome of a send attempt"""
+        values = {'status': status, 'last_error': error, 'updated_at': datetime.utcnow()}
+        if status == 'Sent':
+            values['sent_at'] = values['updated_at']
+        db.session.execute(
+            ReminderDelivery.__table__.update().where(ReminderDelivery.id == delivery_id).values(**values)
+        )
+        db.session.commit()
+
+    def to_dict(self):
+        """Convert reminder delivery to dictionary"""
+        return {
+            'id': self.id,
+            'appointment_id': self.appointment_id,
+            'reminder_type': self.reminder_type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+    def __repr__(self):
+        return f'<ReminderDelivery {self.appointment_id} {self.reminder_type} {self.status}>'
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from app import db
 
 class Treatment(db.Model):
@@ -14,6 +15,20 @@ class Treatment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    @staticmethod
+    def eager_options(include_appointment=False):
+        """Loader options matching to_dict(include_appointment=...)"""
+        if not include_appointment:
+            return []
+
+        from app.models.appointment import Appointment
+        from app.models.doctor import Doctor
+        return [
+            joinedload(Treatment.appointment)
+            .joinedload(Appointment.doctor)
+            .joinedload(Doctor.department)
+        ]
+
     def to_dict(self, include_appointment=False):
         """Convert treatment to dictionary"""
         data = {
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import or_, func
 from app import db
@@ -7,15 +7,28 @@ from app.models.doctor import Doctor
 from app.models.patient import Patient
 from app.models.appointment import Appointment
 from app.models.department import Department
-from app.utils.decorators import role_required
-from app.utils.cache import invalidate_cache, cache_response
+from app.models.export_job import ExportJob
+from app.models.reminder_delivery import ReminderDelivery
+from app.utils.decorators import role_required, read_replica
+from app.utils.sql_metrics import query_budget
+from app.utils.slow_queries import get_slow_queries
+from app.utils.cache import invalidate_tags, cache_response, get_cache_stats
+from app.utils.pagination import paginate_keyset, InvalidCursor
+from app.utils.exports import treatment_export_query, csv_export_response, create_export_job, send_export_file
+from app.utils.celery_client import enqueue
+from app.utils.serializers import (
+    PATIENT_SHAPES, DOCTOR_SHAPES, APPOINTMENT_SHAPES, requested_shape, json_rows_response,
+    wants_stream, ndjson_response, InvalidShape
+)
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
 @bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 @role_required('admin')
-@cache_response('admin_dashboard', timeout=300)
+@read_replica
+@cache_response('admin_dashboard', tags=('department', 'doctor', 'patient', 'appointment'), stale_ttl=600)
+@query_budget(8)
 def dashboard():
     """Get admin dashboard statistics"""
     try:
@@ -41,18 +54,38 @@ def dashboard():
         return jsonify({'error': f'Failed to fetch dashboard data: {str(e)}'}), 500
 
 
+@bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def cache_stats():
+    """Get cache hit ratios per tier and hit/miss counters per tag"""
+    return jsonify(get_cache_stats()), 200
+
+
+@bp.route('/slow-queries', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def slow_queries():
+    """Get the most recent slow queries logged by this worker, newest first"""
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'threshold_ms': current_app.config['SLOW_QUERY_THRESHOLD_MS'],
+        'queries': get_slow_queries(limit)
+    }), 200
+
+
 #Department Management Routes
 
 """Get all departments"""
 @bp.route('/departments', methods=['GET'])
 @jwt_required()
 @role_required('admin')
-@cache_response('admin_departments', timeout=600)
+@cache_response('admin_departments', tags=('department', 'doctor'))
 def get_departments():
     try:
         departments = Department.query.all()
         return jsonify({
-            'departments': [dept.to_dict() for dept in departments]
+            'departments': Department.to_dict_many(departments)
         }), 200
     except Exception as e:
         return jsonify({'error': f'Failed to fetch departments: {str(e)}'}), 500
@@ -76,7 +109,7 @@ def create_department():
         db.session.add(department)
         db.session.commit()
 
-        invalidate_cache('departments')
+        invalidate_tags('department')
 
         return jsonify({
             'message': 'Department created successfully',
@@ -112,7 +145,7 @@ def update_department(dept_id):
             department.description = data['description']
 
         db.session.commit()
-        invalidate_cache('departments')
+        invalidate_tags('department')
 
         return jsonify({
             'message': 'Department updated successfully',
@@ -141,7 +174,7 @@ def delete_department(dept_id):
     try:
         db.session.delete(department)
         db.session.commit()
-        invalidate_cache('departments')
+        invalidate_tags('department')
 
         return jsonify({'message': 'Department deleted successfully'}), 200
 
@@ -155,27 +188,38 @@ def delete_department(dept_id):
 @bp.route('/doctors', methods=['GET'])
 @jwt_required()
 @role_required('admin')
+@read_replica
+@query_budget(3)
 def get_doctors():
-    """Get all doctors with optional filters"""
+    """Get a page of doctors with optional filters"""
     try:
-        query = Doctor.query
+        shape = requested_shape(DOCTOR_SHAPES)
+        query = shape.query()
 
         # Filter by department
         dept_id = request.args.get('department_id')
         if dept_id:
-            query = query.filter_by(department_id=dept_id)
+            query = query.filter(Doctor.department_id == dept_id)
 
         # Filter by availability
         is_available = request.args.get('is_available')
         if is_available is not None:
-            query = query.filter_by(is_available=is_available.lower() == 'true')
+            query = query.filter(Doctor.is_available == (is_available.lower() == 'true'))
 
-        doctors = query.all()
+        # Search by doctor or department name
+        query_str = request.args.get('q', '').strip()
+        if query_str:
+            query = query.filter(or_(
+                Doctor.full_name.ilike(f'%{query_str}%'),
+                Department.name.ilike(f'%{query_str}%')
+            ))
 
-        return jsonify({
-            'doctors': [doctor.to_dict() for doctor in doctors]
-        }), 200
+        rows, page = paginate_keyset(query, [Doctor.id])
 
+        return json_rows_response('doctors', shape, rows, pagination=page)
+
+    except (InvalidCursor, InvalidShape) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch doctors: {str(e)}'}), 500
 
@@ -186,11 +230,12 @@ def get_doctors():
 @role_required('admin')
 def get_doctor(doctor_id):
     
-    doctor = Doctor.query.get(doctor_id)
+    shape = DOCTOR_SHAPES['detail']
+    doctor = shape.query().filter(Doctor.id == doctor_id).first()
     if not doctor:
         return jsonify({'error': 'Doctor not found'}), 404
 
-    return jsonify({'doctor': doctor.to_dict()}), 200
+    return jsonify({'doctor': shape.serialize(doctor)}), 200
 
 
 """Create a new doctor account"""
@@ -241,7 +286,7 @@ def create_doctor():
         db.session.add(doctor)
         db.session.commit()
 
-        invalidate_cache('doctors')
+        invalidate_tags('doctor', 'department')
 
         return jsonify({
             'message': 'Doctor created successfully',
@@ -295,7 +340,7 @@ def update_doctor(doctor_id):
             doctor.user.email = data['email']
 
         db.session.commit()
-        invalidate_cache('doctors')
+        invalidate_tags('doctor', f'doctor:{doctor_id}', 'department')
 
         return jsonify({
             'message': 'Doctor updated successfully',
@@ -330,7 +375,7 @@ def delete_doctor(doctor_id):
         doctor.user.is_blacklisted = True
         doctor.is_available = False
         db.session.commit()
-        invalidate_cache('doctors')
+        invalidate_tags('doctor', f'doctor:{doctor_id}', 'department')
 
         return jsonify({'message': 'Doctor blacklisted successfully'}), 200
 
@@ -344,29 +389,157 @@ def delete_doctor(doctor_id):
 @bp.route('/patients', methods=['GET'])
 @jwt_required()
 @role_required('admin')
+@read_replica
+@query_budget(3)
 def get_patients():
-    """Get all patients"""
+    """Get a page of patients, or all of them as NDJSON when streaming"""
     try:
-        patients = Patient.query.all()
+        shape = requested_shape(PATIENT_SHAPES)
+        query = shape.query()
 
-        return jsonify({
-            'patients': [patient.to_dict() for patient in patients]
-        }), 200
+        # Search by name, phone or ID
+        query_str = request.args.get('q', '').strip()
+        if query_str:
+            query = query.filter(or_(
+                Patient.full_name.ilike(f'%{query_str}%'),
+                Patient.phone.ilike(f'%{query_str}%'),
+                Patient.id == int(query_str) if query_str.isdigit() else False
+            ))
+
+        if wants_stream():
+            return ndjson_response(shape, query.order_by(Patient.id))
+
+        rows, page = paginate_keyset(query, [Patient.id])
 
+        return json_rows_response('patients', shape, rows, pagination=page)
+
+    except (InvalidCursor, InvalidShape) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch patients: {str(e)}'}), 500
 
 
+@bp.route('/export/treatments', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+@read_replica
+def export_treatments():
+    """Stream treatment history of the given ?patient_id= values, or of all patients, as CSV"""
+    try:
+        patient_ids = request.args.getlist('patient_id', type=int) or None
+
+        return csv_export_response(
+            treatment_export_query(patient_ids),
+            'treatment_history_bulk.csv'
+        )
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to export treatments: {str(e)}'}), 500
+
+
+@bp.route('/export/treatments/jobs', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def start_treatment_export():
+    """Queue a background CSV export for the given patient_ids, or all patients"""
+    data = request.get_json(silent=True) or {}
+    patient_ids = data.get('patient_ids')
+
+    if patient_ids is not None:
+        if not isinstance(patient_ids, list) or not all(isinstance(pid, int) for pid in patient_ids):
+            return jsonify({'error': 'patient_ids must be a list of integers'}), 400
+        patient_ids = sorted(set(patient_ids))
+
+    try:
+        job, created = create_export_job(
+            int(get_jwt_identity()), 'treatments', {'patient_ids': patient_ids}
+        )
+
+        return jsonify({
+            'message': 'Export started' if created else 'Existing export reused',
+            'job': job.to_dict()
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to start export: {str(e)}'}), 500
+
+
+@bp.route('/export/status/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_export_status(job_id):
+    """Get status and progress of an export job"""
+    job = ExportJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@bp.route('/export/download/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def download_export(job_id):
+    """Download the CSV produced by an export job"""
+    job = ExportJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+
+    return send_export_file(job)
+
+
+@bp.route('/reminders/dead-letter', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_dead_reminders():
+    """Get reminders that failed every retry, most recent first"""
+    limit = min(request.args.get('limit', 100, type=int), current_app.config['MAX_ITEMS_PER_PAGE'])
+    deliveries = ReminderDelivery.query.filter_by(status='Dead').order_by(
+        ReminderDelivery.updated_at.desc()
+    ).limit(limit).all()
+
+    return jsonify({'reminders': [delivery.to_dict() for delivery in deliveries]}), 200
+
+
+@bp.route('/reminders/<int:delivery_id>/retry', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def retry_reminder(delivery_id):
+    """Queue a dead-lettered reminder for another round of attempts"""
+    delivery = ReminderDelivery.query.get(delivery_id)
+    if not delivery:
+        return jsonify({'error': 'Reminder not found'}), 404
+    if delivery.status != 'Dead':
+        return jsonify({'error': f'Only dead-lettered reminders can be retried (status: {delivery.status})'}), 409
+
+    try:
+        delivery.status = 'Pending'
+        delivery.attempts = 0
+        db.session.commit()
+        enqueue('app.tasks.deliver_reminder', delivery.id)
+
+        return jsonify({
+            'message': 'Reminder queued',
+            'reminder': delivery.to_dict()
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to queue reminder: {str(e)}'}), 500
+
+
 @bp.route('/patients/<int:patient_id>', methods=['GET'])
 @jwt_required()
 @role_required('admin')
 def get_patient(patient_id):
     """Get a specific patient"""
-    patient = Patient.query.get(patient_id)
+    shape = PATIENT_SHAPES['detail']
+    patient = shape.query().filter(Patient.id == patient_id).first()
     if not patient:
         return jsonify({'error': 'Patient not found'}), 404
 
-    return jsonify({'patient': patient.to_dict()}), 200
+    return jsonify({'patient': shape.serialize(patient)}), 200
 
 
 @bp.route('/patients/<int:patient_id>', methods=['PUT'])
@@ -409,6 +582,7 @@ def update_patient(patient_id):
             patient.user.email = data['email']
 
         db.session.commit()
+        invalidate_tags('patient', f'patient:{patient_id}')
 
         return jsonify({
             'message': 'Patient updated successfully',
@@ -432,6 +606,7 @@ def blacklist_patient(patient_id):
     try:
         patient.user.is_blacklisted = True
         db.session.commit()
+        invalidate_tags('patient', f'patient:{patient_id}')
 
         return jsonify({'message': 'Patient blacklisted successfully'}), 200
 
@@ -445,37 +620,51 @@ def blacklist_patient(patient_id):
 @bp.route('/appointments', methods=['GET'])
 @jwt_required()
 @role_required('admin')
+@read_replica
+@query_budget(3)
 def get_appointments():
-    """Get all appointments with optional filters"""
+    """Get a page of appointments with optional filters, newest first.
+
+    With Accept: application/x-ndjson or ?stream=1 every matching
+    appointment is streamed instead, one JSON object per line.
+    """
     try:
-        query = Appointment.query
+        shape = requested_shape(APPOINTMENT_SHAPES)
+        query = shape.query()
 
         # Filter by status
         status = request.args.get('status')
         if status:
-            query = query.filter_by(status=status)
+            query = query.filter(Appointment.status == status)
 
         # Filter by date
         date = request.args.get('date')
         if date:
-            query = query.filter_by(appointment_date=date)
+            query = query.filter(Appointment.appointment_date == date)
 
         # Filter by doctor
         doctor_id = request.args.get('doctor_id')
         if doctor_id:
-            query = query.filter_by(doctor_id=doctor_id)
+            query = query.filter(Appointment.doctor_id == doctor_id)
 
         # Filter by patient
         patient_id = request.args.get('patient_id')
         if patient_id:
-            query = query.filter_by(patient_id=patient_id)
+            query = query.filter(Appointment.patient_id == patient_id)
 
-        appointments = query.order_by(Appointment.appointment_date.desc()).all()
+        if wants_stream():
+            return ndjson_response(
+                shape, query.order_by(Appointment.appointment_date.desc(), Appointment.id.desc())
+            )
 
-        return jsonify({
-            'appointments': [apt.to_dict(include_details=True) for apt in appointments]
-        }), 200
+        rows, page = paginate_keyset(
+            query, [Appointment.appointment_date, Appointment.id], descending=True
+        )
+
+        return json_rows_response('appointments', shape, rows, pagination=page)
 
+    except (InvalidCursor, InvalidShape) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch appointments: {str(e)}'}), 500
     """Search patients by name, ID, or contact"""
@@ -3,6 +3,7 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from app import db
 from app.models.user import User
 from app.models.patient import Patient
+from app.utils.cache import invalidate_tags
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -43,6 +44,7 @@ def register():
         )
         db.session.add(patient)
         db.session.commit()
+        invalidate_tags('patient')
 
         return jsonify({
             'message': 'Registration successful',
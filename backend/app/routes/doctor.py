@@ -8,15 +8,22 @@ from app.models.doctor import Doctor, DoctorAvailability
 from app.models.appointment import Appointment
 from app.models.treatment import Treatment
 from app.models.patient import Patient
-from app.utils.decorators import role_required
+from app.utils.decorators import role_required, read_replica
+from app.utils.sql_metrics import query_budget
 from app.utils.validators import parse_date, parse_time
-from app.utils.cache import invalidate_cache
+from app.utils.pagination import paginate_keyset, InvalidCursor
+from app.utils.serializers import PATIENT_SHAPES, requested_shape, json_rows_response, InvalidShape
+from app.utils.cache import cache_response, invalidate_tags, add_cache_tags, SCOPE_USER
+from app.utils.reminder_schedule import schedule_reminder
 
 bp = Blueprint('doctor', __name__, url_prefix='/api/doctor')
 
 @bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 @role_required('doctor')
+@read_replica
+@cache_response('doctor_dashboard', scope=SCOPE_USER, vary_by_day=True)
+@query_budget(6)
 def dashboard():
     """Get doctor dashboard statistics"""
     try:
@@ -27,6 +34,8 @@ def dashboard():
         if not doctor:
             return jsonify({'error': 'Doctor profile not found'}), 404
 
+        add_cache_tags(f'doctor:{doctor.id}')
+
         # Get today's date
         today = date.today()
         week_from_now = today + timedelta(days=7)
@@ -77,6 +86,9 @@ def dashboard():
 @bp.route('/appointments', methods=['GET'])
 @jwt_required()
 @role_required('doctor')
+@read_replica
+@cache_response('doctor_appointments', tags=('patient', 'department'), scope=SCOPE_USER, vary_by_day=True)
+@query_budget(4)
 def get_appointments():
     """Get doctor's appointments with optional filters"""
     try:
@@ -87,7 +99,11 @@ def get_appointments():
         if not doctor:
             return jsonify({'error': 'Doctor profile not found'}), 404
 
-        query = Appointment.query.filter_by(doctor_id=doctor.id)
+        add_cache_tags(f'doctor:{doctor.id}')
+
+        query = Appointment.query.options(
+            *Appointment.eager_options(include_details=True)
+        ).filter_by(doctor_id=doctor.id)
 
         # Filter by status
         status = request.args.get('status')
@@ -201,8 +217,8 @@ def complete_appointment(appointment_id):
             db.session.add(treatment)
 
         db.session.commit()
-        invalidate_cache('appointments')
-        invalidate_cache('treatments')
+        invalidate_tags('appointment', f'doctor:{doctor.id}', f'patient:{appointment.patient_id}')
+        schedule_reminder(appointment)
 
         return jsonify({
             'message': 'Appointment completed successfully',
@@ -243,7 +259,8 @@ def cancel_appointment(appointment_id):
 
         appointment.status = 'Cancelled'
         db.session.commit()
-        invalidate_cache('appointments')
+        invalidate_tags('appointment', f'doctor:{doctor.id}', f'patient:{appointment.patient_id}')
+        schedule_reminder(appointment)
 
         return jsonify({
             'message': 'Appointment cancelled successfully',
@@ -260,8 +277,11 @@ def cancel_appointment(appointment_id):
 @bp.route('/patients', methods=['GET'])
 @jwt_required()
 @role_required('doctor')
+@read_replica
+@cache_response('doctor_patients', tags=('patient',), scope=SCOPE_USER)
+@query_budget(4)
 def get_patients():
-    """Get all patients assigned to this doctor"""
+    """Get a page of the patients assigned to this doctor"""
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
@@ -270,18 +290,21 @@ def get_patients():
         if not doctor:
             return jsonify({'error': 'Doctor profile not found'}), 404
 
+        add_cache_tags(f'doctor:{doctor.id}')
+
         # Get distinct patients who have appointments with this doctor
         patient_ids = db.session.query(Appointment.patient_id).filter(
             Appointment.doctor_id == doctor.id
-        ).distinct().all()
-
-        patient_ids = [pid[0] for pid in patient_ids]
-        patients = Patient.query.filter(Patient.id.in_(patient_ids)).all()
+        )
+        shape = requested_shape(PATIENT_SHAPES)
+        rows, page = paginate_keyset(
+            shape.query().filter(Patient.id.in_(patient_ids)), [Patient.id]
+        )
 
-        return jsonify({
-            'patients': [patient.to_dict() for patient in patients]
-        }), 200
+        return json_rows_response('patients', shape, rows, pagination=page)
 
+    except (InvalidCursor, InvalidShape) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch patients: {str(e)}'}), 500
 
@@ -289,6 +312,8 @@ def get_patients():
 @bp.route('/patients/<int:patient_id>/history', methods=['GET'])
 @jwt_required()
 @role_required('doctor')
+@read_replica
+@query_budget(5)
 def get_patient_history(patient_id):
     """Get patient's treatment history with this doctor"""
     try:
@@ -304,16 +329,15 @@ def get_patient_history(patient_id):
             return jsonify({'error': 'Patient not found'}), 404
 
         # Get all appointments for this patient with this doctor
-        appointments = Appointment.query.filter_by(
+        appointments = Appointment.query.options(
+            *Appointment.eager_options(include_details=True)
+        ).filter_by(
             patient_id=patient_id,
             doctor_id=doctor.id
         ).order_by(Appointment.appointment_date.desc()).all()
 
-        # Get treatment records
-        appointment_ids = [apt.id for apt in appointments]
-        treatments = Treatment.query.filter(
-            Treatment.appointment_id.in_(appointment_ids)
-        ).all()
+        # Treatment records were loaded with the appointments
+        treatments = [apt.treatment for apt in appointments if apt.treatment]
 
         return jsonify({
             'patient': patient.to_dict(),
@@ -371,7 +395,7 @@ def update_patient_treatment(patient_id):
             db.session.add(treatment)
 
         db.session.commit()
-        invalidate_cache('treatments')
+        invalidate_tags(f'doctor:{doctor.id}', f'patient:{patient_id}')
 
         return jsonify({
             'message': 'Treatment updated successfully',
@@ -467,7 +491,7 @@ def set_availability():
         db.session.add(availability)
         db.session.commit()
 
-        invalidate_cache('availability')
+        invalidate_tags(f'doctor:{doctor.id}')
 
         return jsonify({
             'message': 'Availability set successfully',
@@ -502,7 +526,7 @@ def delete_availability(availability_id):
 
         db.session.delete(availability)
         db.session.commit()
-        invalidate_cache('availability')
+        invalidate_tags(f'doctor:{doctor.id}')
 
         return jsonify({'message': 'Availability slot deleted successfully'}), 200
 
@@ -554,6 +578,7 @@ def update_profile():
             doctor.bio = data['bio']
 
         db.session.commit()
+        invalidate_tags('doctor', f'doctor:{doctor.id}')
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date, timedelta
 from sqlalchemy import and_, or_
@@ -9,17 +9,23 @@ from app.models.doctor import Doctor, DoctorAvailability
 from app.models.department import Department
 from app.models.appointment import Appointment
 from app.models.treatment import Treatment
-from app.utils.decorators import role_required
+from app.models.export_job import ExportJob
+from app.utils.decorators import role_required, read_replica
+from app.utils.sql_metrics import query_budget
 from app.utils.validators import parse_date, parse_time
-from app.utils.cache import cache_response, invalidate_cache
-import csv
-import io
+from app.utils.cache import cache_response, invalidate_tags, add_cache_tags, SCOPE_USER
+from app.utils.exports import treatment_export_query, csv_export_response, create_export_job, send_export_file
+from app.utils.serializers import DOCTOR_SHAPES, requested_shape, json_rows_response, InvalidShape
+from app.utils.reminder_schedule import schedule_reminder, forget_delivery
 
 bp = Blueprint('patient', __name__, url_prefix='/api/patient')
 
 @bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 @role_required('patient')
+@read_replica
+@cache_response('patient_dashboard', tags=('department', 'doctor'), scope=SCOPE_USER, vary_by_day=True)
+@query_budget(6)
 def dashboard():
     """Get patient dashboard with departments and statistics"""
     try:
@@ -30,6 +36,8 @@ def dashboard():
         if not patient:
             return jsonify({'error': 'Patient profile not found'}), 404
 
+        add_cache_tags(f'patient:{patient.id}')
+
         # Get all departments
         departments = Department.query.all()
 
@@ -49,7 +57,7 @@ def dashboard():
         ).count()
 
         return jsonify({
-            'departments': [dept.to_dict() for dept in departments],
+            'departments': Department.to_dict_many(departments),
             'upcoming_appointments': upcoming_appointments,
             'total_appointments': total_appointments
         }), 200
@@ -63,14 +71,15 @@ def dashboard():
 @bp.route('/departments', methods=['GET'])
 @jwt_required()
 @role_required('patient')
-@cache_response('patient_departments', timeout=600)
+@read_replica
+@cache_response('patient_departments', tags=('department', 'doctor'))
 def get_departments():
     """Get all departments/specializations"""
     try:
         departments = Department.query.all()
 
         return jsonify({
-            'departments': [dept.to_dict() for dept in departments]
+            'departments': Department.to_dict_many(departments)
         }), 200
 
     except Exception as e:
@@ -80,6 +89,7 @@ def get_departments():
 @bp.route('/departments/<int:dept_id>/doctors', methods=['GET'])
 @jwt_required()
 @role_required('patient')
+@cache_response('patient_department_doctors', tags=('department', 'doctor'))
 def get_department_doctors(dept_id):
     """Get all doctors in a specific department"""
     try:
@@ -87,14 +97,15 @@ def get_department_doctors(dept_id):
         if not department:
             return jsonify({'error': 'Department not found'}), 404
 
-        doctors = Doctor.query.filter_by(
-            department_id=dept_id,
-            is_available=True
+        shape = DOCTOR_SHAPES['summary']
+        doctors = shape.query().filter(
+            Doctor.department_id == dept_id,
+            Doctor.is_available == True
         ).all()
 
         return jsonify({
             'department': department.to_dict(),
-            'doctors': [doctor.to_dict() for doctor in doctors]
+            'doctors': shape.serialize_many(doctors)
         }), 200
 
     except Exception as e:
@@ -104,22 +115,25 @@ def get_department_doctors(dept_id):
 @bp.route('/doctors', methods=['GET'])
 @jwt_required()
 @role_required('patient')
+@read_replica
+@cache_response('patient_doctors', tags=('department', 'doctor'))
 def get_doctors():
     """Get all available doctors with optional filters"""
     try:
-        query = Doctor.query.filter_by(is_available=True)
+        shape = requested_shape(DOCTOR_SHAPES)
+        query = shape.query().filter(Doctor.is_available == True)
 
         # Filter by department
         dept_id = request.args.get('department_id')
         if dept_id:
-            query = query.filter_by(department_id=dept_id)
+            query = query.filter(Doctor.department_id == dept_id)
 
         doctors = query.all()
 
-        return jsonify({
-            'doctors': [doctor.to_dict() for doctor in doctors]
-        }), 200
+        return json_rows_response('doctors', shape, doctors)
 
+    except InvalidShape as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch doctors: {str(e)}'}), 500
 
@@ -161,6 +175,9 @@ def get_doctor(doctor_id):
 @bp.route('/appointments', methods=['GET'])
 @jwt_required()
 @role_required('patient')
+@read_replica
+@cache_response('patient_appointments', tags=('doctor', 'department'), scope=SCOPE_USER, vary_by_day=True)
+@query_budget(4)
 def get_appointments():
     """Get patient's appointments"""
     try:
@@ -171,7 +188,11 @@ def get_appointments():
         if not patient:
             return jsonify({'error': 'Patient profile not found'}), 404
 
-        query = Appointment.query.filter_by(patient_id=patient.id)
+        add_cache_tags(f'patient:{patient.id}')
+
+        query = Appointment.query.options(
+            *Appointment.eager_options(include_details=True)
+        ).filter_by(patient_id=patient.id)
 
         # Filter by status
         status = request.args.get('status')
@@ -284,7 +305,8 @@ def book_appointment():
         db.session.add(appointment)
         db.session.commit()
 
-        invalidate_cache('appointments')
+        invalidate_tags('appointment', f'doctor:{appointment.doctor_id}', f'patient:{patient.id}')
+        schedule_reminder(appointment)
 
         return jsonify({
             'message': 'Appointment booked successfully',
@@ -356,8 +378,11 @@ def reschedule_appointment(appointment_id):
         if 'notes' in data:
             appointment.notes = data['notes']
 
+        # A reminder sent for the old time should go out again for the new one
+        forget_delivery(appointment.id)
         db.session.commit()
-        invalidate_cache('appointments')
+        invalidate_tags('appointment', f'doctor:{appointment.doctor_id}', f'patient:{patient.id}')
+        schedule_reminder(appointment)
 
         return jsonify({
             'message': 'Appointment rescheduled successfully',
@@ -398,7 +423,8 @@ def cancel_appointment(appointment_id):
 
         appointment.status = 'Cancelled'
         db.session.commit()
-        invalidate_cache('appointments')
+        invalidate_tags('appointment', f'doctor:{appointment.doctor_id}', f'patient:{patient.id}')
+        schedule_reminder(appointment)
 
         return jsonify({
             'message': 'Appointment cancelled successfully',
@@ -415,6 +441,9 @@ def cancel_appointment(appointment_id):
 @bp.route('/treatments', methods=['GET'])
 @jwt_required()
 @role_required('patient')
+@read_replica
+@cache_response('patient_treatments', tags=('doctor', 'department'), scope=SCOPE_USER)
+@query_budget(3)
 def get_treatment_history():
     """Get patient's treatment history"""
     try:
@@ -425,15 +454,13 @@ def get_treatment_history():
         if not patient:
             return jsonify({'error': 'Patient profile not found'}), 404
 
-        # Get all appointments for this patient
-        appointment_ids = db.session.query(Appointment.id).filter_by(
-            patient_id=patient.id
-        ).all()
-        appointment_ids = [aid[0] for aid in appointment_ids]
+        add_cache_tags(f'patient:{patient.id}')
 
-        # Get all treatments
-        treatments = Treatment.query.filter(
-            Treatment.appointment_id.in_(appointment_ids)
+        # Get all treatments for this patient's appointments
+        treatments = Treatment.query.options(
+            *Treatment.eager_options(include_appointment=True)
+        ).join(Appointment).filter(
+            Appointment.patient_id == patient.id
         ).all()
 
         return jsonify({
@@ -532,6 +559,7 @@ def update_profile():
             patient.allergies = data['allergies']
 
         db.session.commit()
+        invalidate_tags('patient', f'patient:{patient.id}')
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -548,8 +576,9 @@ def update_profile():
 @bp.route('/export/treatments', methods=['GET'])
 @jwt_required()
 @role_required('patient')
+@read_replica
 def export_treatments():
-    """Generate and return treatment history as a CSV file"""
+    """Stream treatment history as a CSV file"""
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
@@ -558,57 +587,58 @@ def export_treatments():
         if not patient:
             return jsonify({'error': 'Patient profile not found'}), 404
 
-        # Get all appointments with treatments for this patient
-        appointments = Appointment.query.filter_by(patient_id=patient.id).order_by(
-            Appointment.appointment_date.desc()
-        ).all()
+        return csv_export_response(
+            treatment_export_query([patient.id]),
+            f'treatment_history_{patient.id}.csv'
+        )
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to export treatments: {str(e)}'}), 500
+
+
+@bp.route('/export/treatments/jobs', methods=['POST'])
+@jwt_required()
+@role_required('patient')
+def start_treatment_export():
+    """Queue a background CSV export of the patient's treatment history"""
+    try:
+        user_id = int(get_jwt_identity())
+        patient = User.query.get(user_id).patient_profile
 
-        # Create CSV data
-        output = io.StringIO(newline='')
-        writer = csv.writer(output)
-
-        # Write header
-        writer.writerow([
-            'Appointment ID',
-            'Patient Name',
-            'Doctor Name',
-            'Department',
-            'Appointment Date',
-            'Appointment Time',
-            'Status',
-            'Diagnosis',
-            'Prescription',
-            'Notes',
-            'Next Visit Date'
-        ])
-
-        # Write data rows
-        for apt in appointments:
-            doctor = Doctor.query.get(apt.doctor_id)
-            treatment = Treatment.query.filter_by(appointment_id=apt.id).first()
-
-            print(treatment)
-
-            writer.writerow([
-                apt.id,
-                patient.full_name,
-                doctor.full_name if doctor else 'N/A',
-                doctor.department.name if doctor and doctor.department else 'N/A',
-                apt.appointment_date.strftime('%Y-%m-%d'),
-                apt.appointment_time,
-                apt.status,
-                treatment.diagnosis if treatment else 'N/A',
-                treatment.prescription if treatment else 'N/A',
-                treatment.treatment_notes if treatment else 'N/A',
-                treatment.next_visit_date.strftime('%Y-%m-%d') if treatment and treatment.next_visit_date else 'N/A'
-            ])
-
-        # Return CSV file as response
-        response = make_response(output.getvalue())
-        response.headers['Content-Disposition'] = \
-            f'attachment; filename=treatment_history_{patient.id}.csv'
-        response.headers['Content-Type'] = 'text/csv; charset=utf-8'
-        return response
+        if not patient:
+            return jsonify({'error': 'Patient profile not found'}), 404
+
+        job, created = create_export_job(user_id, 'treatments', {'patient_ids': [patient.id]})
+
+        return jsonify({
+            'message': 'Export started' if created else 'Existing export reused',
+            'job': job.to_dict()
+        }), 202
 
     except Exception as e:
-        return jsonify({'error': f'Failed to export treatments: {str(e)}'}), 500
\ No newline at end of file
+        db.session.rollback()
+        return jsonify({'error': f'Failed to start export: {str(e)}'}), 500
+
+
+@bp.route('/export/status/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required('patient')
+def get_export_status(job_id):
+    """Get status and progress of one of the patient's export jobs"""
+    job = ExportJob.query.filter_by(id=job_id, user_id=int(get_jwt_identity())).first()
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@bp.route('/export/download/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required('patient')
+def download_export(job_id):
+    """Download the CSV produced by one of the patient's export jobs"""
+    job = ExportJob.query.filter_by(id=job_id, user_id=int(get_jwt_identity())).first()
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+
+    return send_export_file(job)
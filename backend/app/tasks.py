@@ -2,14 +2,21 @@
 Celery tasks for background jobs
 """
 from datetime import datetime, timedelta
-from celery import shared_task
-from app.models import Appointment, Doctor, Patient, Treatment, User
+from celery import shared_task, chord
+from flask import current_app
+from app.models import Appointment, Doctor, Patient, Treatment, User, Department, ExportJob, ReminderDelivery
 from app import db
+from app.utils.replica import use_replica
+from app.utils import exports
+from app.utils.smtp_pool import SMTPPool
+from app.utils.email_templates import render_email
+from app.utils import reminder_schedule
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-import smtplib
+import time
+import random
 import os
 
 
@@ -19,11 +26,36 @@ EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_USER = os.getenv('SMTP_USERNAME', 'projectaaron11@gmail.com')
 EMAIL_PASSWORD = os.getenv('SMTP_PASSWORD', 'xypc lhco tpoq bvza')
 EMAIL_FROM = os.getenv('EMAIL_FROM', 'hospitalmanagement913@gmail.com')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', '1') == '1'
 
 
-def send_email(to_email, subject, html_content, attachment=None, attachment_name=None):
+def get_smtp_pool():
     """
-    Send email with optional attachment
+    This worker's SMTP session pool, created on first use
+    """
+    pool = current_app.extensions.get('smtp_pool')
+    if pool is None:
+        config = current_app.config
+        pool = current_app.extensions.setdefault('smtp_pool', SMTPPool(
+            EMAIL_HOST,
+            EMAIL_PORT,
+            EMAIL_USER,
+            EMAIL_PASSWORD,
+            use_tls=EMAIL_USE_TLS,
+            max_sessions=config['SMTP_POOL_SIZE'],
+            acquire_timeout=config['SMTP_POOL_TIMEOUT'],
+            idle_timeout=config['SMTP_IDLE_TIMEOUT'],
+            max_messages=config['SMTP_MAX_MESSAGES_PER_SESSION'],
+            timeout=config['SMTP_TIMEOUT']
+        ))
+    return pool
+
+
+def send_email(to_email, subject, html_content, attachment=None, attachment_name=None, text_content=None,
+               raise_errors=False):
+    """
+    Send email with optional attachment and plain-text alternative
+    Returns False on failure, or raises if raise_errors is set
     """
     try:        
         msg = MIMEMultipart('alternative')
@@ -31,6 +63,10 @@ def send_email(to_email, subject, html_content, attachment=None, attachment_name
         msg['To'] = to_email
         msg['Subject'] = subject
 
+        # Clients show the last alternative they support, so plain text goes first
+        if text_content:
+            msg.attach(MIMEText(text_content, 'plain'))
+
         html_part = MIMEText(html_content, 'html')
         msg.attach(html_part)
 
@@ -41,103 +77,324 @@ def send_email(to_email, subject, html_content, attachment=None, attachment_name
             part.add_header('Content-Disposition', f'attachment; filename={attachment_name}')
             msg.attach(part)
 
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.send_message(msg)
+        get_smtp_pool().send_message(msg)
 
         return True
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error sending email: {str(e)}")
         return False
 
 
+def reminder_query():
+    """
+    One joined query with everything a reminder needs, for booked appointments
+    of patients with an email address
+    """
+    patient_user = db.aliased(User)
+    return db.session.query(
+        Appointment.id.label('appointment_id'),
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Patient.full_name.label('patient_name'),
+        patient_user.email.label('email'),
+        Doctor.full_name.label('doctor_name'),
+        Department.name.label('department_name')
+    ).join(
+        Patient, Appointment.patient_id == Patient.id
+    ).join(
+        patient_user, Patient.user_id == patient_user.id
+    ).join(
+        Doctor, Appointment.doctor_id == Doctor.id
+    ).outerjoin(
+        Department, Doctor.department_id == Department.id
+    ).filter(
+        Appointment.status == 'Booked',
+        patient_user.email.isnot(None),
+        patient_user.email != ''
+    )
+
+
+def daily_reminder_query(day):
+    """
+    reminder_query limited to appointments on day
+    """
+    return reminder_query().filter(Appointment.appointment_date == day).order_by(Appointment.id)
+
+
+def render_reminder_email(row):
+    """
+    Subject, HTML and plain-text body of the reminder for one daily_reminder_query row
+    """
+    subject = f"Appointment Reminder - {row.appointment_date}"
+    html_content, text_content = render_email(
+        'reminder',
+        plain_text=current_app.config['EMAIL_PLAIN_TEXT'],
+        patient_name=row.patient_name,
+        doctor_name=row.doctor_name,
+        department_name=row.department_name,
+        appointment_date=row.appointment_date.strftime('%B %d, %Y'),
+        appointment_time=row.appointment_time
+    )
+    return subject, html_content, text_content
+
+
+def dispatch_deliveries(deliveries):
+    """
+    Queue deliver_reminder for each ReminderDelivery.ensure entry not yet done
+    """
+    queued = 0
+    for delivery_id, status in deliveries.values():
+        if status not in ReminderDelivery.FINAL_STATUSES:
+            deliver_reminder.delay(delivery_id)
+            queued += 1
+    return queued
+
+
 @shared_task(name='app.tasks.send_daily_reminders')
 def send_daily_reminders():
     """
-    Daily job to send appointment reminders
-    Runs every day at 8 AM
+    Send reminders for all of today's appointments in one run
+    No longer scheduled; dispatch_due_reminders sends each reminder
+    REMINDER_LEAD_HOURS before its appointment instead
+
+    Records a ReminderDelivery for each of today's appointments and queues
+    deliver_reminder for those not yet sent, REMINDER_BATCH_SIZE at a time.
+    Re-running it only re-queues reminders that are still outstanding.
+
+    Only delivery ids are queued, not the loaded rows: each deliver_reminder
+    re-reads its appointment in one joined query after claiming it, so an
+    appointment cancelled or moved after queuing is skipped or sent with
+    current details. This job itself runs a fixed number of statements per batch.
     """
     try:
         today = datetime.now().date()
-
-        # Get all appointments scheduled for today with status 'Booked'
-        appointments = Appointment.query.filter(
-            Appointment.appointment_date == today,
-            Appointment.status == 'Booked'
-        ).all()
-
-        sent_count = 0
-        for apt in appointments:
-            patient = Patient.query.get(apt.patient_id)
-            doctor = Doctor.query.get(apt.doctor_id)
-
-            if not patient or not doctor:
-                continue
-
-            patient_user = User.query.get(patient.user_id)
-            if not patient_user or not patient_user.email:
-                continue
-
-            # Create reminder email
-            subject = f"Appointment Reminder - {apt.appointment_date}"
-            html_content = f"""
-            <html>
-                <head>
-                    <style>
-                        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                        .header {{ background-color: #007bff; color: white; padding: 20px; text-align: center; }}
-                        .content {{ padding: 20px; background-color: #f8f9fa; }}
-                        .info {{ background-color: white; padding: 15px; margin: 10px 0; border-radius: 5px; }}
-                        .footer {{ text-align: center; padding: 20px; color: #666; font-size: 12px; }}
-                    </style>
-                </head>
-                <body>
-                    <div class="container">
-                        <div class="header">
-                            <h1>🏥 Appointment Reminder</h1>
-                        </div>
-                        <div class="content">
-                            <p>Dear {patient.full_name},</p>
-                            <p>This is a friendly reminder about your appointment scheduled for today.</p>
-
-                            <div class="info">
-                                <h3>Appointment Details:</h3>
-                                <p><strong>Doctor:</strong> {doctor.full_name}</p>
-                                <p><strong>Department:</strong> {doctor.department.name if doctor.department else 'N/A'}</p>
-                                <p><strong>Date:</strong> {apt.appointment_date.strftime('%B %d, %Y')}</p>
-                                <p><strong>Time:</strong> {apt.appointment_time}</p>
-                            </div>
-
-                            <p>Please arrive 10 minutes before your scheduled time.</p>
-                            <p>If you need to reschedule, please contact us as soon as possible.</p>
-                        </div>
-                        <div class="footer">
-                            <p>Hospital Management System</p>
-                            <p>This is an automated message, please do not reply.</p>
-                        </div>
-                    </div>
-                </body>
-            </html>
-            """
-
-            if send_email(patient_user.email, subject, html_content):
-                sent_count += 1
-
-        print(f"Daily reminders sent: {sent_count} reminders for {len(appointments)} appointments")
-        return {'status': 'success', 'sent': sent_count, 'total': len(appointments)}
+        batch_size = current_app.config['REMINDER_BATCH_SIZE']
+        ids_query = daily_reminder_query(today).with_entities(Appointment.id)
+        timings = {'load': 0.0, 'ledger': 0.0, 'dispatch': 0.0}
+
+        total = 0
+        queued = 0
+        last_id = 0
+        while True:
+            started = time.perf_counter()
+            appointment_ids = [
+                appointment_id for (appointment_id,) in
+                ids_query.filter(Appointment.id > last_id).limit(batch_size)
+            ]
+            timings['load'] += time.perf_counter() - started
+            if not appointment_ids:
+                break
+            total += len(appointment_ids)
+            last_id = appointment_ids[-1]
+
+            started = time.perf_counter()
+            deliveries = ReminderDelivery.ensure(appointment_ids, reminder_schedule.REMINDER_TYPE)
+            timings['ledger'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            queued += dispatch_deliveries(deliveries)
+            timings['dispatch'] += time.perf_counter() - started
+
+        timings = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+        print(f"Daily reminders queued: {queued} reminders for {total} appointments, timings: {timings}")
+        return {'status': 'success', 'queued': queued, 'done': total - queued, 'total': total, 'timings': timings}
 
     except Exception as e:
+        db.session.rollback()
         print(f"Error in send_daily_reminders: {str(e)}")
         return {'status': 'error', 'message': str(e)}
 
 
+@shared_task(bind=True, name='app.tasks.deliver_reminder', max_retries=None)
+def deliver_reminder(self, delivery_id):
+    """
+    Send one reminder from the delivery ledger
+    Runs a fixed number of statements: the claim, one reminder_query lookup and the mark
+    Failed sends are retried with exponential backoff, up to
+    REMINDER_MAX_RETRIES times, then the delivery is marked 'Dead'
+    """
+    config = current_app.config
+    if not ReminderDelivery.claim(delivery_id, config['REMINDER_SEND_LEASE']):
+        return {'status': 'skipped', 'delivery_id': delivery_id}
+
+    row = reminder_query().join(
+        ReminderDelivery, ReminderDelivery.appointment_id == Appointment.id
+    ).filter(ReminderDelivery.id == delivery_id).first()
+    if row is None:
+        # Cancelled, completed or left without an email address since it was queued
+        ReminderDelivery.mark(delivery_id, 'Skipped')
+        return {'status': 'skipped', 'delivery_id': delivery_id}
+
+    try:
+        subject, html_content, text_content = render_reminder_email(row)
+        send_email(row.email, subject, html_content, text_content=text_content, raise_errors=True)
+    except Exception as e:
+        db.session.rollback()
+        attempt = self.request.retries + 1
+        if self.request.retries >= config['REMINDER_MAX_RETRIES']:
+            ReminderDelivery.mark(delivery_id, 'Dead', str(e))
+            print(f"Reminder {delivery_id} dead-lettered after {attempt} attempts: {str(e)}")
+            return {'status': 'dead', 'delivery_id': delivery_id, 'message': str(e)}
+
+        ReminderDelivery.mark(delivery_id, 'Retrying', str(e))
+        countdown = min(config['REMINDER_RETRY_BACKOFF'] * (2 ** self.request.retries),
+                        config['REMINDER_RETRY_BACKOFF_MAX'])
+        print(f"Reminder {delivery_id} attempt {attempt} failed, retrying in {countdown}s: {str(e)}")
+        raise self.retry(exc=e, countdown=countdown * (1 + random.random()))
+
+    ReminderDelivery.mark(delivery_id, 'Sent')
+    return {'status': 'success', 'delivery_id': delivery_id}
+
+
+@shared_task(name='app.tasks.dispatch_due_reminders')
+def dispatch_due_reminders():
+    """
+    Every minute: queue the reminders that have come due in the reminder schedule
+    """
+    try:
+        now = datetime.now()
+        limit = current_app.config['REMINDER_BATCH_SIZE']
+        lead = current_app.config['REMINDER_LEAD_HOURS'] * 3600
+        queued = 0
+        expired = 0
+        while True:
+            due = reminder_schedule.pop_due(now, limit)
+            if not due:
+                break
+            try:
+                # Reminders for appointments that have started by now are dropped
+                appointment_ids = [
+                    appointment_id for appointment_id, score in due if score + lead > now.timestamp()
+                ]
+                expired += len(due) - len(appointment_ids)
+                if appointment_ids:
+                    deliveries = ReminderDelivery.ensure(appointment_ids, reminder_schedule.REMINDER_TYPE)
+                    queued += dispatch_deliveries(deliveries)
+            except Exception:
+                reminder_schedule.restore(due)
+                raise
+            if len(due) < limit:
+                break
+
+        if queued or expired:
+            print(f"Due reminders: {queued} queued, {expired} expired")
+        return {'status': 'success', 'queued': queued, 'expired': expired}
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in dispatch_due_reminders: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task(name='app.tasks.sync_reminder_schedule')
+def sync_reminder_schedule():
+    """
+    Hourly job re-adding upcoming appointments missing from the reminder schedule
+    """
+    try:
+        scheduled = reminder_schedule.sync_schedule()
+        print(f"Reminder schedule synced: {scheduled} appointments")
+        return {'status': 'success', 'scheduled': scheduled}
+
+    except Exception as e:
+        print(f"Error in sync_reminder_schedule: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
+
+
+def monthly_report_query(first_day, last_day):
+    """
+    Every appointment between first_day and last_day of available doctors with an email,
+    with patient and treatment, ordered by doctor
+    """
+    doctor_user = db.aliased(User)
+    return db.session.query(
+        Doctor.id,
+        Doctor.full_name,
+        doctor_user.email,
+        Appointment.appointment_date,
+        Appointment.status,
+        Patient.full_name,
+        Treatment.diagnosis,
+        Treatment.prescription
+    ).join(
+        Appointment, Appointment.doctor_id == Doctor.id
+    ).join(
+        doctor_user, Doctor.user_id == doctor_user.id
+    ).outerjoin(
+        Patient, Appointment.patient_id == Patient.id
+    ).outerjoin(
+        Treatment, Treatment.appointment_id == Appointment.id
+    ).filter(
+        Doctor.is_available == True,
+        doctor_user.email.isnot(None),
+        doctor_user.email != '',
+        Appointment.appointment_date >= first_day,
+        Appointment.appointment_date <= last_day
+    ).order_by(Doctor.id, Appointment.appointment_date, Appointment.id)
+
+
+def collect_monthly_reports(rows):
+    """
+    Group monthly_report_query rows into one report payload per doctor
+    """
+    reports = []
+    report = None
+    for (doctor_id, doctor_name, email, appointment_date, status,
+         patient_name, diagnosis, prescription) in rows:
+        if report is None or report['doctor_id'] != doctor_id:
+            report = {
+                'doctor_id': doctor_id,
+                'doctor_name': doctor_name,
+                'email': email,
+                'total': 0,
+                'completed': 0,
+                'cancelled': 0,
+                'appointments': []
+            }
+            reports.append(report)
+
+        report['total'] += 1
+        if status == 'Completed':
+            report['completed'] += 1
+        elif status == 'Cancelled':
+            report['cancelled'] += 1
+        report['appointments'].append([
+            appointment_date.strftime('%d/%m/%Y'),
+            patient_name or 'N/A',
+            status,
+            diagnosis if diagnosis is not None else 'N/A',
+            prescription if prescription is not None else 'N/A'
+        ])
+    return reports
+
+
+def render_monthly_report(month_name, report):
+    """
+    Subject, HTML and plain-text body of one doctor's monthly report
+    """
+    subject = f"Monthly Activity Report - {month_name}"
+    html_content, text_content = render_email(
+        'monthly_report',
+        subheading=month_name,
+        plain_text=current_app.config['EMAIL_PLAIN_TEXT'],
+        month_name=month_name,
+        **report
+    )
+    return subject, html_content, text_content
+
+
 @shared_task(name='app.tasks.send_monthly_reports')
+@use_replica()
 def send_monthly_reports():
     """
     Monthly job to send activity reports to doctors
     Runs on the 1st of every month at 9 AM
+
+    Reads last month's activity for every doctor in one query, then fans
+    the reports out in chunks of MONTHLY_REPORT_CHUNK_SIZE to
+    send_monthly_report_batch; summarize_monthly_reports totals the results.
     """
     try:
         # Get last month's date range
@@ -148,120 +405,92 @@ def send_monthly_reports():
 
         month_name = last_day_prev_month.strftime('%B %Y')
 
-        # Get all active doctors
-        doctors = Doctor.query.filter_by(is_available=True).all()
-
-        sent_count = 0
-        for doctor in doctors:
-            # Get appointments for this doctor in the last month
-            appointments = Appointment.query.filter(
-                Appointment.doctor_id == doctor.id,
-                Appointment.appointment_date >= first_day_prev_month.date(),
-                Appointment.appointment_date <= last_day_prev_month.date()
-            ).all()
-
-            if not appointments:
-                continue  # Skip if no appointments
-
-            doctor_user = User.query.get(doctor.user_id)
-            if not doctor_user or not doctor_user.email:
-                continue
-
-            # Calculate statistics
-            total_appointments = len(appointments)
-            completed = len([a for a in appointments if a.status == 'Completed'])
-            cancelled = len([a for a in appointments if a.status == 'Cancelled'])
-
-            # Generate appointment details HTML
-            appointment_rows = ""
-            for apt in appointments:
-                patient = Patient.query.get(apt.patient_id)
-                treatment = Treatment.query.filter_by(appointment_id=apt.id).first()
-
-                appointment_rows += f"""
-                <tr>
-                    <td style="padding: 8px; border: 1px solid #ddd;">{apt.appointment_date.strftime('%d/%m/%Y')}</td>
-                    <td style="padding: 8px; border: 1px solid #ddd;">{patient.full_name if patient else 'N/A'}</td>
-                    <td style="padding: 8px; border: 1px solid #ddd;">{apt.status}</td>
-                    <td style="padding: 8px; border: 1px solid #ddd;">{treatment.diagnosis if treatment else 'N/A'}</td>
-                    <td style="padding: 8px; border: 1px solid #ddd;">{treatment.prescription if treatment else 'N/A'}</td>
-                </tr>
-                """
-
-            # Create report email
-            subject = f"Monthly Activity Report - {month_name}"
-            html_content = f"""
-            <html>
-                <head>
-                    <style>
-                        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                        .container {{ max-width: 800px; margin: 0 auto; padding: 20px; }}
-                        .header {{ background-color: #28a745; color: white; padding: 20px; text-align: center; }}
-                        .content {{ padding: 20px; background-color: #f8f9fa; }}
-                        .stats {{ display: flex; justify-content: space-around; margin: 20px 0; }}
-                        .stat-box {{ background-color: white; padding: 20px; border-radius: 5px; text-align: center; flex: 1; margin: 0 10px; }}
-                        .stat-number {{ font-size: 36px; font-weight: bold; color: #007bff; }}
-                        table {{ width: 100%; border-collapse: collapse; background-color: white; margin: 20px 0; }}
-                        th {{ background-color: #007bff; color: white; padding: 12px; text-align: left; }}
-                        .footer {{ text-align: center; padding: 20px; color: #666; font-size: 12px; }}
-                    </style>
-                </head>
-                <body>
-                    <div class="container">
-                        <div class="header">
-                            <h1>📊 Monthly Activity Report</h1>
-                            <h2>{month_name}</h2>
-                        </div>
-                        <div class="content">
-                            <p>Dear Dr. {doctor.full_name},</p>
-                            <p>Here is your activity summary for {month_name}:</p>
-
-                            <div class="stats">
-                                <div class="stat-box">
-                                    <div class="stat-number">{total_appointments}</div>
-                                    <div>Total Appointments</div>
-                                </div>
-                                <div class="stat-box">
-                                    <div class="stat-number">{completed}</div>
-                                    <div>Completed</div>
-                                </div>
-                                <div class="stat-box">
-                                    <div class="stat-number">{cancelled}</div>
-                                    <div>Cancelled</div>
-                                </div>
-                            </div>
-
-                            <h3>Appointment Details:</h3>
-                            <table>
-                                <thead>
-                                    <tr>
-                                        <th>Date</th>
-                                        <th>Patient</th>
-                                        <th>Status</th>
-                                        <th>Diagnosis</th>
-                                        <th>Treatment</th>
-                                    </tr>
-                                </thead>
-                                <tbody>
-                                    {appointment_rows}
-                                </tbody>
-                            </table>
-                        </div>
-                        <div class="footer">
-                            <p>Hospital Management System</p>
-                            <p>This is an automated monthly report.</p>
-                        </div>
-                    </div>
-                </body>
-            </html>
-            """
-
-            if send_email(doctor_user.email, subject, html_content):
-                sent_count += 1
-
-        print(f"Monthly reports sent: {sent_count} reports to {len(doctors)} doctors")
-        return {'status': 'success', 'sent': sent_count, 'total': len(doctors)}
+        rows = monthly_report_query(first_day_prev_month.date(), last_day_prev_month.date()).yield_per(
+            current_app.config['REMINDER_BATCH_SIZE']
+        )
+        reports = collect_monthly_reports(rows)
+        if not reports:
+            print(f"Monthly reports: no doctor activity in {month_name}")
+            return {'status': 'success', 'sent': 0, 'total': 0}
+
+        chunk_size = current_app.config['MONTHLY_REPORT_CHUNK_SIZE']
+        batches = [reports[i:i + chunk_size] for i in range(0, len(reports), chunk_size)]
+        chord(
+            send_monthly_report_batch.s(month_name, batch) for batch in batches
+        )(summarize_monthly_reports.s(month_name))
+
+        print(f"Monthly reports queued: {len(reports)} reports in {len(batches)} batches")
+        return {'status': 'queued', 'total': len(reports), 'batches': len(batches)}
 
     except Exception as e:
         print(f"Error in send_monthly_reports: {str(e)}")
-        return {'status': 'error', 'message': str(e)}
\ No newline at end of file
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task(name='app.tasks.send_monthly_report_batch')
+def send_monthly_report_batch(month_name, reports):
+    """
+    Render and send one chunk of monthly reports
+    """
+    sent_count = 0
+    for report in reports:
+        try:
+            subject, html_content, text_content = render_monthly_report(month_name, report)
+        except Exception as e:
+            print(f"Error rendering monthly report for doctor {report['doctor_id']}: {str(e)}")
+            continue
+        if send_email(report['email'], subject, html_content, text_content=text_content):
+            sent_count += 1
+    return {'sent': sent_count, 'total': len(reports)}
+
+
+@shared_task(name='app.tasks.summarize_monthly_reports')
+def summarize_monthly_reports(results, month_name):
+    """
+    Chord callback adding up the batch results of send_monthly_reports
+    """
+    sent_count = sum(result['sent'] for result in results)
+    total = sum(result['total'] for result in results)
+    print(f"Monthly reports sent for {month_name}: {sent_count} reports to {total} doctors")
+    return {'status': 'success', 'sent': sent_count, 'total': total}
+
+@shared_task(name='app.tasks.run_export_job')
+def run_export_job(job_id):
+    """
+    Build the artifact for a queued export job
+    """
+    job = ExportJob.query.get(job_id)
+    if not job or job.status not in ExportJob.IN_FLIGHT_STATUSES:
+        return {'status': 'skipped', 'job_id': job_id}
+
+    try:
+        exports.EXPORT_RUNNERS[job.kind](job)
+        print(f"Export job {job_id} completed: {job.rows_written} rows in {job.file_name}")
+        return {'status': 'success', 'job_id': job_id, 'file_name': job.file_name}
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in run_export_job {job_id}: {str(e)}")
+        job = ExportJob.query.get(job_id)
+        if job:
+            job.status = 'Failed'
+            job.error = str(e)
+            db.session.commit()
+        return {'status': 'error', 'job_id': job_id, 'message': str(e)}
+
+
+@shared_task(name='app.tasks.sweep_exports')
+def sweep_exports():
+    """
+    Hourly job removing export jobs and artifacts past their retention
+    """
+    try:
+        result = exports.sweep_exports()
+        print(f"Export sweep: {result['jobs_removed']} jobs, {result['files_removed']} files removed, "
+              f"{result['jobs_abandoned']} stuck jobs failed")
+        return {'status': 'success', **result}
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in sweep_exports: {str(e)}")
+        return {'status': 'error', 'message': str(e)}
@@ -1,78 +1,518 @@
+import os
 import json
+import time
+import logging
+import threading
+from datetime import date
 from functools import wraps
-from flask import request
+from flask import request, g, current_app, copy_current_request_context
+from flask_jwt_extended import get_jwt_identity
 from app import redis_client
+from app.utils.local_cache import LocalCache
+from app.utils.replica import use_primary
 
-def cache_key_from_request(prefix, *args, **kwargs):
-    """Generate cache key from request parameters"""
+logger = logging.getLogger('app.cache')
+
+# Redis key layout for tag-based invalidation:
+#   cache:tag:<tag>  -> set of cache keys that depend on <tag>
+#   cache:stats      -> hash of "<tag>:hits" / "<tag>:misses" counters
+#   cache:stats:redis -> hits/misses of the Redis tier
+#   cache:invalidate -> pub/sub channel carrying invalidated tag lists
+TAG_KEY_PREFIX = 'cache:tag:'
+STATS_KEY = 'cache:stats'
+REDIS_STATS_KEY = 'cache:stats:redis'
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+# In-process tier, created per worker process on first use
+_local_cache = None
+_local_cache_pid = None
+_local_cache_lock = threading.Lock()
+
+# Per-tag hits served by the in-process tier, flushed to STATS_KEY in
+# batches so a local hit never waits on Redis
+_local_tag_hits = {}
+_local_tag_hits_flushed_at = 0.0
+_local_tag_hits_lock = threading.Lock()
+
+# Tags whose invalidation failed while Redis was down, per process
+_pending_tags = set()
+_pending_lock = threading.Lock()
+
+# Key scoping modes for cache_response
+SCOPE_GLOBAL = 'global'  # One entry shared by every caller
+SCOPE_ROLE = 'role'      # One entry per role (admin / doctor / patient)
+SCOPE_USER = 'user'      # One entry per JWT identity
+
+def redis_available():
+    """True when Redis is configured and its circuit breaker is not open"""
+    return redis_client is not None and redis_client.available
+
+def _scope_key(scope):
+    """Return the key segment identifying who a cached entry belongs to"""
+    if scope == SCOPE_GLOBAL:
+        return 'global'
+
+    user_id = get_jwt_identity()
+    if scope == SCOPE_USER:
+        return f"user={user_id}"
+    if scope == SCOPE_ROLE:
+        # role_required has already loaded the user into the session
+        from app.models.user import User
+        return f"role={User.query.get(int(user_id)).role}"
+
+    raise ValueError(f"Unknown cache scope: {scope}")
+
+def cache_key_from_request(prefix, scope=SCOPE_GLOBAL, vary_by_day=False, **kwargs):
+    """Generate cache key from request parameters and caller scope"""
     params = request.args.to_dict()
+    params.update(kwargs)
+    if vary_by_day:
+        params['_day'] = date.today().isoformat()
     params_str = json.dumps(params, sort_keys=True)
-    return f"{prefix}:{params_str}"
+    return f"{prefix}:{_scope_key(scope)}:{params_str}"
+
+def _serialize_response(response):
+    """Convert a successful view response into a JSON-safe dict"""
+    if response.status_code != 200:
+        return None
+    return {
+        'body': response.get_data(as_text=True),
+        'status': response.status_code,
+        'mimetype': response.mimetype
+    }
+
+def _deserialize_response(data):
+    """Rebuild a Flask response from a cached dict"""
+    response = current_app.response_class(
+        data['body'],
+        status=data['status'],
+        mimetype=data['mimetype']
+    )
+    response.headers['X-Cache'] = 'HIT'
+    return response
 
-def cache_response(prefix, timeout=300):
-    """Decorator to cache API responses"""
+def tag_key(tag):
+    """Redis key of the set holding all cache keys for a tag"""
+    return f"{TAG_KEY_PREFIX}{tag}"
+
+def add_cache_tags(*tags):
+    """Declare extra tags for the response currently being cached.
+
+    Used from inside a cached view for dependencies that are only known
+    after a lookup, e.g. add_cache_tags(f'patient:{patient.id}').
+    """
+    g.setdefault('cache_tags', set()).update(tags)
+
+def _listen_for_invalidations(local_cache):
+    """Drop local entries for tags invalidated by any process"""
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Messages may have been missed while disconnected
+            local_cache.clear()
+            for message in pubsub.listen():
+                local_cache.invalidate_tags(json.loads(message['data']))
+        except Exception as e:
+            logger.warning("Cache invalidation listener error: %s", e)
+            local_cache.clear()
+            time.sleep(1)
+
+def get_local_cache():
+    """Return this process's in-process cache tier.
+
+    Created lazily so that every forked gunicorn or Celery worker gets its
+    own cache and its own pub/sub listener thread.
+    """
+    global _local_cache, _local_cache_pid
+
+    if _local_cache is not None and _local_cache_pid == os.getpid():
+        return _local_cache
+
+    with _local_cache_lock:
+        if _local_cache is None or _local_cache_pid != os.getpid():
+            local_cache = LocalCache(
+                max_entries=current_app.config['CACHE_LOCAL_MAX_ENTRIES'],
+                timeout=current_app.config['CACHE_LOCAL_TIMEOUT']
+            )
+            listener = threading.Thread(
+                target=_listen_for_invalidations,
+                args=(local_cache,),
+                name='cache-invalidation-listener',
+                daemon=True
+            )
+            listener.start()
+            _local_cache = local_cache
+            _local_cache_pid = os.getpid()
+
+    return _local_cache
+
+def _record_stats(tags, field, tier_field=None):
+    """Increment hit/miss counters for each tag, and for the Redis tier"""
+    if not tags and not tier_field:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        if tier_field:
+            pipe.hincrby(REDIS_STATS_KEY, tier_field, 1)
+        for tag in tags:
+            pipe.hincrby(STATS_KEY, f"{tag}:{field}", 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Cache stats error: %s", e)
+
+def _count_local_hit(tags):
+    """Count a local-tier hit for each tag, flushing every CACHE_STATS_FLUSH_INTERVAL"""
+    with _local_tag_hits_lock:
+        for tag in tags:
+            _local_tag_hits[tag] = _local_tag_hits.get(tag, 0) + 1
+    if time.monotonic() - _local_tag_hits_flushed_at >= current_app.config['CACHE_STATS_FLUSH_INTERVAL']:
+        flush_local_hits()
+
+def flush_local_hits():
+    """Add the local-tier hits counted so far to the shared per-tag counters"""
+    global _local_tag_hits_flushed_at
+    with _local_tag_hits_lock:
+        counts = dict(_local_tag_hits)
+        _local_tag_hits.clear()
+        _local_tag_hits_flushed_at = time.monotonic()
+    if not counts or not redis_available():
+        _restore_local_hits(counts)
+        return
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for tag, count in counts.items():
+            pipe.hincrby(STATS_KEY, f"{tag}:hits", count)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Cache stats error: %s", e)
+        _restore_local_hits(counts)
+
+def _restore_local_hits(counts):
+    """Keep unflushed hits for the next flush"""
+    with _local_tag_hits_lock:
+        for tag, count in counts.items():
+            _local_tag_hits[tag] = _local_tag_hits.get(tag, 0) + count
+
+def cache_response(prefix, timeout=None, tags=(), scope=SCOPE_GLOBAL, vary_by_day=False, stale_ttl=0):
+    """Decorator to cache API responses.
+
+    tags lists the entities the response depends on. They may reference
+    view arguments, e.g. 'doctor:{doctor_id}'. Entries live until their
+    timeout or until one of their tags is invalidated.
+
+    scope must be SCOPE_USER for any view whose output depends on who is
+    calling, otherwise one user's data would be served to another. Views
+    with filters relative to today should set vary_by_day.
+
+    Rebuilds are single-flight: on a miss one worker takes a Redis lock and
+    runs the view while the others wait for its result. With stale_ttl,
+    an expired entry is still served for that many seconds while one
+    worker refreshes it in the background.
+
+    Rebuilds always read from the primary, also under read_replica: a
+    rebuild usually follows a write that invalidated the entry, and
+    caching rows from a lagging replica would serve them until the next
+    invalidation.
+
+    Only 200 responses are cached.
+    """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            if not redis_client:
+            if not redis_available():
                 return fn(*args, **kwargs)
 
+            replay_pending_invalidations()
+
             # Generate cache key
-            cache_key = cache_key_from_request(prefix)
-
-            # Try to get from cache
-            try:
-                cached_data = redis_client.get(cache_key)
-                if cached_data:
-                    return json.loads(cached_data)
-            except Exception as e:
-                print(f"Cache read error: {e}")
-
-            # Call the function
-            response = fn(*args, **kwargs)
-
-            # Cache the response
-            try:
-                redis_client.setex(cache_key, timeout, json.dumps(response))
-            except Exception as e:
-                print(f"Cache write error: {e}")
-
-            return response
+            cache_key = cache_key_from_request(prefix, scope, vary_by_day, **kwargs)
+            entry_timeout = timeout or current_app.config['CACHE_DEFAULT_TIMEOUT']
+
+            def compute():
+                """Run the view and store its response in both tiers"""
+                g.cache_tags = {tag.format(**kwargs) for tag in tags}
+                with use_primary():
+                    response = current_app.make_response(fn(*args, **kwargs))
+                entry_tags = sorted(g.pop('cache_tags', ()))
+                _record_stats(entry_tags, 'misses')
+
+                data = _serialize_response(response)
+                if data is not None:
+                    entry = set_cache(cache_key, data, entry_timeout, entry_tags, stale_ttl)
+                    get_local_cache().set(cache_key, entry, entry_tags, entry_timeout + stale_ttl)
+                return response
+
+            entry = _get_entry(cache_key)
+            if entry is not None:
+                if entry['fresh_until'] > time.time():
+                    return _deserialize_response(entry['data'])
+
+                # Stale but inside the stale window: serve it and let one
+                # worker refresh in the background
+                lock = _rebuild_lock(cache_key)
+                if _acquire(lock):
+                    _refresh_in_background(compute, lock)
+                return _deserialize_response(entry['data'])
+
+            # Miss: only one worker rebuilds, the others wait for its result
+            lock = _rebuild_lock(cache_key)
+            if _acquire(lock):
+                try:
+                    return compute()
+                finally:
+                    _release(lock)
+
+            deadline = time.monotonic() + current_app.config['CACHE_LOCK_WAIT']
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = _get_entry(cache_key)
+                if entry is not None:
+                    return _deserialize_response(entry['data'])
+
+            return compute()
         return wrapper
     return decorator
 
-def invalidate_cache(pattern):
-    """Invalidate cache keys matching pattern"""
-    if not redis_client:
-        return
+def _get_entry(cache_key):
+    """Look a key up in the in-process tier, then in Redis"""
+    local_cache = get_local_cache()
+    entry = local_cache.get(cache_key)
+    if entry is not None:
+        _count_local_hit(entry['tags'])
+        return entry
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(cache_key)
+        pipe.ttl(cache_key)
+        cached_data, ttl = pipe.execute()
 
+        if not cached_data:
+            redis_client.hincrby(REDIS_STATS_KEY, 'misses', 1)
+            return None
+
+        entry = json.loads(cached_data)
+        _record_stats(entry['tags'], 'hits', tier_field='hits')
+        local_cache.set(cache_key, entry, entry['tags'], ttl)
+        return entry
+    except Exception as e:
+        logger.warning("Cache read error: %s", e)
+
+    return None
+
+def _rebuild_lock(cache_key):
+    """Redis lock held by the single worker rebuilding an entry"""
+    # thread_local=False so a background refresh thread can release it
+    return redis_client.lock(
+        f"cache:lock:{cache_key}",
+        timeout=current_app.config['CACHE_LOCK_TIMEOUT'],
+        thread_local=False
+    )
+
+def _acquire(lock):
+    """Try to take a rebuild lock without blocking.
+
+    Returns True when Redis cannot be reached so the caller rebuilds
+    without coordination rather than failing the request.
+    """
     try:
-        keys = redis_client.keys(f"{pattern}*")
-        if keys:
-            redis_client.delete(*keys)
+        return lock.acquire(blocking=False)
     except Exception as e:
-        print(f"Cache invalidation error: {e}")
+        logger.warning("Cache lock error: %s", e)
+        return True
+
+def _release(lock):
+    """Release a rebuild lock, ignoring locks that already expired"""
+    try:
+        lock.release()
+    except Exception as e:
+        logger.warning("Cache lock release error: %s", e)
+
+def _refresh_in_background(compute, lock):
+    """Recompute a stale entry in a thread with a copy of this request"""
+    saved_g = dict(vars(g))
+
+    @copy_current_request_context
+    def refresh():
+        # The copied request gets a fresh app context; restore the JWT
+        # data loaded by jwt_required so the view sees the same caller
+        vars(g).update(saved_g)
+        try:
+            compute()
+        except Exception as e:
+            logger.warning("Cache refresh error: %s", e)
+        finally:
+            _release(lock)
+
+    threading.Thread(target=refresh, name='cache-refresh', daemon=True).start()
 
-def set_cache(key, value, timeout=300):
-    """Set a cache value"""
-    if not redis_client:
+def invalidate_tags(*tags):
+    """Delete every cached entry that depends on any of the given tags.
+
+    Entries are removed from Redis and the invalidation is broadcast so
+    every process drops them from its in-process tier as well. If Redis
+    cannot be reached the tags are kept and replayed once it is back, so
+    entries written before the outage are not served stale afterwards.
+    """
+    if redis_client is None or not tags:
+        return
+
+    if _local_cache is not None:
+        _local_cache.invalidate_tags(tags)
+
+    with _pending_lock:
+        tags = set(tags) | _pending_tags
+        _pending_tags.clear()
+
+    if not redis_available():
+        _defer_invalidation(tags)
         return
 
     try:
-        redis_client.setex(key, timeout, json.dumps(value))
+        tag_keys = [tag_key(tag) for tag in tags]
+        pipe = redis_client.pipeline(transaction=False)
+        for key in tag_keys:
+            pipe.smembers(key)
+        members = pipe.execute()
+
+        keys = set(tag_keys)
+        for tag_members in members:
+            keys.update(tag_members)
+        redis_client.delete(*keys)
+        redis_client.publish(INVALIDATION_CHANNEL, json.dumps(sorted(tags)))
     except Exception as e:
-        print(f"Cache set error: {e}")
+        logger.warning("Cache invalidation error: %s", e)
+        _defer_invalidation(tags)
+
+def _defer_invalidation(tags):
+    """Remember tags whose invalidation could not reach Redis"""
+    with _pending_lock:
+        _pending_tags.update(tags)
+
+def replay_pending_invalidations():
+    """Retry invalidations deferred while Redis was unreachable"""
+    if _pending_tags and redis_available():
+        invalidate_tags(*_pending_tags)
+
+def _hit_ratio(counters):
+    """Add a hit_ratio field to a hits/misses dict"""
+    total = counters['hits'] + counters['misses']
+    counters['hit_ratio'] = round(counters['hits'] / total, 4) if total else 0.0
+    return counters
+
+def get_cache_stats():
+    """Return hit ratios per tier and hit/miss counters per tag.
+
+    Local tier numbers are for the answering worker process only. Redis
+    tier and per-tag numbers are shared by all processes; per-tag hits
+    include local-tier hits, which each process adds in batches every
+    CACHE_STATS_FLUSH_INTERVAL seconds.
+    """
+    if redis_client is None:
+        return {'tiers': {}, 'tags': {}}
+
+    flush_local_hits()
+
+    try:
+        raw = redis_client.hgetall(STATS_KEY)
+        raw_redis = redis_client.hgetall(REDIS_STATS_KEY)
+    except Exception as e:
+        logger.warning("Cache stats error: %s", e)
+        return {
+            'tiers': {'local': get_local_cache().stats()},
+            'tags': {},
+            'redis': redis_client.metrics()
+        }
+
+    tags = {}
+    for field, value in raw.items():
+        tag, _, counter = field.rpartition(':')
+        tags.setdefault(tag, {'hits': 0, 'misses': 0})[counter] = int(value)
+
+    redis_tier = {
+        'hits': int(raw_redis.get('hits', 0)),
+        'misses': int(raw_redis.get('misses', 0))
+    }
+
+    return {
+        'tiers': {
+            'local': get_local_cache().stats(),
+            'redis': _hit_ratio(redis_tier)
+        },
+        'tags': {tag: _hit_ratio(counters) for tag, counters in tags.items()},
+        'redis': redis_client.metrics()
+    }
+
+def set_cache(key, value, timeout=None, tags=(), stale_ttl=0):
+    """Set a cache value, optionally registering it under tags.
+
+    The value is considered fresh for timeout seconds and kept for
+    stale_ttl more. Returns the stored entry.
+    """
+    if timeout is None:
+        timeout = current_app.config['CACHE_DEFAULT_TIMEOUT']
+
+    entry = {'data': value, 'tags': list(tags), 'fresh_until': time.time() + timeout}
+    if not redis_available():
+        return entry
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.setex(key, timeout + stale_ttl, json.dumps(entry))
+        for tag in tags:
+            pipe.sadd(tag_key(tag), key)
+            pipe.expire(tag_key(tag), current_app.config['CACHE_TAG_TIMEOUT'])
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Cache set error: %s", e)
+
+    return entry
 
 def get_cache(key):
     """Get a cache value"""
-    if not redis_client:
+    if not redis_available():
         return None
 
     try:
         cached_data = redis_client.get(key)
         if cached_data:
-            return json.loads(cached_data)
+            return json.loads(cached_data)['data']
     except Exception as e:
-        print(f"Cache get error: {e}")
+        logger.warning("Cache get error: %s", e)
 
     return None
+
+def get_cache_many(keys):
+    """Get several cache values in one round-trip; missing keys map to None"""
+    if not redis_available() or not keys:
+        return {key: None for key in keys}
+
+    try:
+        values = redis_client.get_many(list(keys))
+        return {
+            key: json.loads(value)['data'] if value else None
+            for key, value in zip(keys, values)
+        }
+    except Exception as e:
+        logger.warning("Cache get error: %s", e)
+
+    return {key: None for key in keys}
+
+def set_cache_many(mapping, timeout=None):
+    """Set several untagged cache values in one round-trip"""
+    if not redis_available() or not mapping:
+        return
+
+    if timeout is None:
+        timeout = current_app.config['CACHE_DEFAULT_TIMEOUT']
+
+    fresh_until = time.time() + timeout
+    try:
+        redis_client.set_many({
+            key: json.dumps({'data': value, 'tags': [], 'fresh_until': fresh_until})
+            for key, value in mapping.items()
+        }, timeout)
+    except Exception as e:
+        logger.warning("Cache set error: %s", e)
@@ -0,0 +1,27 @@
+from celery import Celery
+from flask import current_app
+
+
+def get_celery():
+    """Celery client used by the web process to enqueue tasks.
+
+    Tasks are sent by name, so the web process does not import the task
+    modules or build the worker's Celery app.
+    """
+    client = current_app.extensions.get('celery_client')
+    if client is None:
+        client = Celery(
+            current_app.import_name,
+            broker=current_app.config['broker_url'],
+            backend=current_app.config['result_backend']
+        )
+        client.conf.update({
+            key: value for key, value in current_app.config.items() if key.islower()
+        })
+        current_app.extensions['celery_client'] = client
+    return client
+
+
+def enqueue(task_name, *args, **kwargs):
+    """Send a task to the workers by its registered name"""
+    return get_celery().send_task(task_name, args=args, kwargs=kwargs)
@@ -27,3 +27,20 @@ def role_required(*roles):
             return fn(*args, **kwargs)
         return wrapper
     return decorator
+
+def read_replica(fn):
+    """Decorator to serve a read-only view from the replica bind.
+
+    Users who wrote within READ_YOUR_WRITES_WINDOW keep reading from the
+    primary so they always see their own changes.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        from app import db
+        from app.utils.replica import use_replica, recently_wrote
+
+        if recently_wrote(get_jwt_identity()):
+            return fn(*args, **kwargs)
+        with use_replica(db.session):
+            return fn(*args, **kwargs)
+    return wrapper
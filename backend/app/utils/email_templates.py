@@ -0,0 +1,81 @@
+import os
+from functools import lru_cache
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
+from markupsafe import Markup
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')
+
+# Compiled templates are cached by the environment; templates never change
+# while a worker runs, so their files are not checked for updates
+_environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False
+)
+
+# Layout settings per email; the body template is <name>.html, with an
+# optional plain-text <name>.txt and the stylesheet <name>.css
+EMAILS = {
+    'reminder': {
+        'heading': '🏥 Appointment Reminder',
+        'footer_note': 'This is an automated message, please do not reply.'
+    },
+    'monthly_report': {
+        'heading': '📊 Monthly Activity Report',
+        'footer_note': 'This is an automated monthly report.'
+    }
+}
+
+_CONTENT_MARKER = '\x00content\x00'
+
+
+@lru_cache(maxsize=128)
+def _chrome(name, subheading=None):
+    """The layout around an email's body, rendered once: (before, after).
+
+    Stylesheet, header and footer are the same for every recipient, so
+    only the body template is rendered per message.
+    """
+    html = _environment.get_template('layout.html').render(
+        stylesheet=f'{name}.css',
+        subheading=subheading,
+        content=Markup(_CONTENT_MARKER),
+        **EMAILS[name]
+    )
+    before, after = html.split(_CONTENT_MARKER)
+    return before, after
+
+
+@lru_cache(maxsize=None)
+def _text_template(name):
+    try:
+        return _environment.get_template(f'{name}.txt')
+    except TemplateNotFound:
+        return None
+
+
+def render_email(name, subheading=None, plain_text=True, **context):
+    """Render email name as (html, text); text is None without a .txt template.
+
+    subheading is part of the cached layout, so it should take few
+    distinct values, e.g. the report month.
+    """
+    before, after = _chrome(name, subheading)
+    html = before + _environment.get_template(f'{name}.html').render(context) + after
+
+    text = None
+    if plain_text:
+        template = _text_template(name)
+        if template is not None:
+            text = template.render(context)
+    return html, text
+
+
+def precompile():
+    """Compile every email template now rather than on first send"""
+    for name in EMAILS:
+        _chrome(name)
+        _environment.get_template(f'{name}.html')
+        _text_template(name)
@@ -0,0 +1,329 @@
+import io
+import os
+import re
+import csv
+import zlib
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from flask import request, jsonify, current_app, send_from_directory, stream_with_context
+from app import db
+from app.models.patient import Patient
+from app.models.doctor import Doctor
+from app.models.department import Department
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+from app.models.export_job import ExportJob
+from app.utils.replica import iter_query, use_replica
+from app.utils.celery_client import enqueue
+
+logger = logging.getLogger('app.exports')
+
+# Files written by the export runner: artifacts named by run_treatment_export
+# (ending in the job id) and its temp files. The sweep only ever deletes
+# these, never other files that happen to be in EXPORT_DIR.
+EXPORT_FILE_NAME = re.compile(r'^(treatment_history_\w+_\d{8}_\d{6}_\d+\.csv|\.export_\d+\.tmp)$')
+
+TREATMENT_EXPORT_HEADER = [
+    'Appointment ID',
+    'Patient Name',
+    'Doctor Name',
+    'Department',
+    'Appointment Date',
+    'Appointment Time',
+    'Status',
+    'Diagnosis',
+    'Prescription',
+    'Notes',
+    'Next Visit Date'
+]
+
+# Rows buffered per chunk written to the response
+CSV_CHUNK_ROWS = 500
+
+
+def treatment_export_query(patient_ids=None):
+    """One joined query yielding a CSV row per appointment, newest first per patient.
+
+    patient_ids limits the export to those patients; None exports everyone.
+    """
+    query = db.session.query(
+        Appointment.id,
+        Patient.full_name,
+        Doctor.full_name,
+        Department.name,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.status,
+        Treatment.diagnosis,
+        Treatment.prescription,
+        Treatment.treatment_notes,
+        Treatment.next_visit_date
+    ).join(
+        Patient, Appointment.patient_id == Patient.id
+    ).outerjoin(
+        Doctor, Appointment.doctor_id == Doctor.id
+    ).outerjoin(
+        Department, Doctor.department_id == Department.id
+    ).outerjoin(
+        Treatment, Treatment.appointment_id == Appointment.id
+    )
+
+    if patient_ids is not None:
+        query = query.filter(Appointment.patient_id.in_(patient_ids))
+
+    return query.order_by(
+        Appointment.patient_id, Appointment.appointment_date.desc(), Appointment.id.desc()
+    )
+
+
+def _treatment_csv_row(row):
+    (appointment_id, patient_name, doctor_name, department_name, appointment_date,
+     appointment_time, status, diagnosis, prescription, notes, next_visit_date) = row
+    has_treatment = diagnosis is not None
+    return [
+        appointment_id,
+        patient_name,
+        doctor_name or 'N/A',
+        department_name or 'N/A',
+        appointment_date.strftime('%Y-%m-%d'),
+        appointment_time,
+        status,
+        diagnosis if has_treatment else 'N/A',
+        prescription if has_treatment else 'N/A',
+        notes if has_treatment else 'N/A',
+        next_visit_date.strftime('%Y-%m-%d') if next_visit_date else 'N/A'
+    ]
+
+
+def iter_treatment_csv(rows):
+    """Yield the treatment CSV as text chunks of up to CSV_CHUNK_ROWS rows"""
+    buffer = io.StringIO(newline='')
+    writer = csv.writer(buffer)
+    writer.writerow(TREATMENT_EXPORT_HEADER)
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow(_treatment_csv_row(row))
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def iter_gzip(chunks):
+    """Gzip-compress a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def csv_export_response(query, filename):
+    """Stream query's rows as a CSV attachment, gzipped if the client accepts it"""
+    chunks = iter_treatment_csv(iter_query(query, current_app.config['STREAM_YIELD_PER']))
+    use_gzip = current_app.config['EXPORT_GZIP'] and 'gzip' in request.accept_encodings
+
+    response = current_app.response_class(
+        stream_with_context(iter_gzip(chunks) if use_gzip else chunks),
+        mimetype='text/csv'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+# ============= Background export jobs =============
+
+def export_path(file_name):
+    """Absolute path of an export artifact"""
+    return os.path.join(current_app.config['EXPORT_DIR'], file_name)
+
+
+def _export_label(patient_ids):
+    """File name part naming who an export covers"""
+    return patient_ids[0] if patient_ids and len(patient_ids) == 1 else 'bulk'
+
+
+def find_reusable_job(user_id, kind, params):
+    """The user's export of the same request that is still queued or running.
+
+    Finished exports are not reused by request: the data may have changed
+    since. A new job is run instead, and it reuses the existing file only
+    if its content hash matches.
+    """
+    return ExportJob.query.filter(
+        ExportJob.user_id == user_id,
+        ExportJob.request_hash == ExportJob.hash_request(kind, params),
+        ExportJob.status.in_(ExportJob.IN_FLIGHT_STATUSES)
+    ).order_by(ExportJob.created_at.desc()).first()
+
+
+def create_export_job(user_id, kind, params):
+    """Queue an export, or return the matching one already queued or running.
+
+    Returns (job, created). Identical exports share one file through the
+    content hash check in the runner.
+    """
+    job = find_reusable_job(user_id, kind, params)
+    if job:
+        return job, False
+
+    job = ExportJob(
+        user_id=user_id,
+        kind=kind,
+        params=ExportJob.params_json(params),
+        request_hash=ExportJob.hash_request(kind, params)
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    try:
+        enqueue('app.tasks.run_export_job', job.id)
+    except Exception as e:
+        logger.warning("Export enqueue error: %s", e)
+        job.status = 'Failed'
+        job.error = 'Export queue is unavailable, please try again later'
+        db.session.commit()
+
+    return job, True
+
+
+def _update_job(job_id, **values):
+    """Write job progress on its own connection.
+
+    The export session is in the middle of iterating a result set, and
+    committing it would close that cursor.
+    """
+    with db.engine.begin() as connection:
+        connection.execute(
+            ExportJob.__table__.update().where(ExportJob.id == job_id).values(**values)
+        )
+
+
+def run_treatment_export(job):
+    """Write a treatment export to EXPORT_DIR, reusing an identical existing file"""
+    patient_ids = job.get_params().get('patient_ids')
+    query = treatment_export_query(patient_ids)
+
+    job_id = job.id
+    job.status = 'Running'
+    job.started_at = datetime.utcnow()
+    job.total_rows = query.order_by(None).count()
+    db.session.commit()
+
+    os.makedirs(current_app.config['EXPORT_DIR'], exist_ok=True)
+    temp_path = export_path(f'.export_{job_id}.tmp')
+    digest = hashlib.sha256()
+    counter = {'rows': 0}
+
+    def counted(rows):
+        for row in rows:
+            counter['rows'] += 1
+            yield row
+
+    try:
+        with use_replica(), open(temp_path, 'w', newline='', encoding='utf-8') as output:
+            rows = iter_query(query, current_app.config['STREAM_YIELD_PER'])
+            for chunk in iter_treatment_csv(counted(rows)):
+                output.write(chunk)
+                digest.update(chunk.encode('utf-8'))
+                _update_job(job_id, rows_written=counter['rows'])
+
+        content_hash = digest.hexdigest()
+        duplicate = ExportJob.query.filter(
+            ExportJob.content_hash == content_hash,
+            ExportJob.status == 'Completed',
+            ExportJob.id != job_id
+        ).first()
+
+        if duplicate and os.path.exists(export_path(duplicate.file_name)):
+            os.remove(temp_path)
+            file_name = duplicate.file_name
+        else:
+            label = _export_label(patient_ids)
+            file_name = f"treatment_history_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id}.csv"
+            os.replace(temp_path, export_path(file_name))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    job.status = 'Completed'
+    job.rows_written = counter['rows']
+    job.content_hash = content_hash
+    job.file_name = file_name
+    job.completed_at = datetime.utcnow()
+    db.session.commit()
+
+
+def send_export_file(job):
+    """Response for a download request: the file, or why it is not available"""
+    if job.status != 'Completed':
+        return jsonify({'error': f'Export is not ready (status: {job.status})', 'job': job.to_dict()}), 409
+    if not os.path.exists(export_path(job.file_name)):
+        return jsonify({'error': 'Export file has expired, please export again'}), 410
+
+    label = _export_label(job.get_params().get('patient_ids'))
+    return send_from_directory(
+        current_app.config['EXPORT_DIR'],
+        job.file_name,
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name=f'treatment_history_{label}.csv'
+    )
+
+
+EXPORT_RUNNERS = {
+    'treatments': run_treatment_export
+}
+
+
+def sweep_exports():
+    """Delete finished jobs older than EXPORT_RETENTION_HOURS and export files no job uses.
+
+    Queued or running jobs are never deleted, as their task still expects
+    the row. One that is older than the retention period has been lost,
+    e.g. with a crashed worker, and is marked Failed so that requests for
+    the same export are no longer attached to it; the next sweep removes it.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['EXPORT_RETENTION_HOURS'])
+
+    expired = ExportJob.query.filter(
+        ExportJob.created_at < cutoff,
+        ExportJob.status.in_(ExportJob.FINAL_STATUSES)
+    ).all()
+    for job in expired:
+        db.session.delete(job)
+
+    abandoned = ExportJob.query.filter(
+        ExportJob.created_at < cutoff,
+        ExportJob.status.in_(ExportJob.IN_FLIGHT_STATUSES)
+    ).update({'status': 'Failed', 'error': 'Export did not finish in time'}, synchronize_session=False)
+    db.session.commit()
+
+    live_files = {
+        file_name for (file_name,) in db.session.query(ExportJob.file_name).filter(
+            ExportJob.file_name.isnot(None)
+        )
+    }
+
+    # Expired artifacts plus leftovers from crashed exports
+    removed_files = 0
+    export_dir = current_app.config['EXPORT_DIR']
+    if os.path.isdir(export_dir):
+        for file_name in os.listdir(export_dir):
+            path = os.path.join(export_dir, file_name)
+            if file_name in live_files or not EXPORT_FILE_NAME.match(file_name) or not os.path.isfile(path):
+                continue
+            if datetime.utcfromtimestamp(os.path.getmtime(path)) < cutoff:
+                os.remove(path)
+                removed_files += 1
+
+    return {'jobs_removed': len(expired), 'jobs_abandoned': abandoned, 'files_removed': removed_files}
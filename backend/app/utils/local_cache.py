@@ -0,0 +1,88 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class LocalCache:
+    """Size-bounded in-process LRU cache with per-entry TTL.
+
+    Sits in front of Redis in cache_response. Entries are indexed by tag
+    so that invalidations broadcast over Redis pub/sub can drop them.
+    """
+
+    def __init__(self, max_entries=1024, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tag_index = {}           # tag -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value or None, refreshing its LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value, tags = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, tags=(), timeout=None):
+        """Store a value, evicting the least recently used entries if full"""
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + timeout, value, tuple(tags))
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags):
+        """Drop every entry registered under any of the given tags"""
+        with self._lock:
+            for tag in tags:
+                for key in self._tag_index.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def stats(self):
+        """Return hit/miss counters for this process"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries
+        }
+
+    def _remove(self, key):
+        """Remove a key and its tag index entries; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
@@ -0,0 +1,80 @@
+import json
+import base64
+from datetime import date, datetime, time
+from flask import request, current_app
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded"""
+
+
+def _encode_value(value):
+    """Make a sort key value JSON-safe"""
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+def _decode_value(column, value):
+    """Convert a JSON cursor value back to the column's Python type"""
+    python_type = column.type.python_type
+    if python_type in (date, datetime, time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+def encode_cursor(values):
+    """Encode sort key values as an opaque URL-safe token"""
+    raw = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token, columns):
+    """Decode a cursor token into typed values for the given sort columns"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError('wrong number of values')
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {e}') from e
+
+def get_page_size():
+    """Page size from ?limit=, defaulting to ITEMS_PER_PAGE and capped at MAX_ITEMS_PER_PAGE"""
+    default = current_app.config['ITEMS_PER_PAGE']
+    maximum = current_app.config['MAX_ITEMS_PER_PAGE']
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+def paginate_keyset(query, columns, descending=False):
+    """Return one page of query ordered by columns, after ?cursor= if given.
+
+    columns must end with a unique column (normally the primary key) so
+    the sort order is total. Returns (items, page) where page holds the
+    next_cursor, has_more and limit fields for the response, plus an
+    exact total when the client asks for it with ?include_total=true.
+    """
+    limit = get_page_size()
+    page = {'limit': limit}
+
+    if request.args.get('include_total') == 'true':
+        page['total'] = query.order_by(None).count()
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    items = query.order_by(*order).limit(limit + 1).all()
+
+    page['has_more'] = len(items) > limit
+    items = items[:limit]
+    page['next_cursor'] = (
+        encode_cursor([getattr(items[-1], column.key) for column in columns])
+        if page['has_more'] else None
+    )
+    return items, page
@@ -0,0 +1,212 @@
+import time
+import threading
+from redis import Redis, ConnectionPool
+from redis.lock import Lock
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+# Circuit breaker states
+CLOSED = 'closed'        # Redis healthy, calls go through
+OPEN = 'open'            # Redis failing, calls are skipped until the cool-down ends
+HALF_OPEN = 'half_open'  # Cool-down over, one trial call decides the next state
+
+
+class CircuitOpenError(RedisConnectionError):
+    """Raised instead of calling Redis while the circuit is open"""
+
+
+class ResilientRedis:
+    """Redis client with an explicit connection pool and a circuit breaker.
+
+    Behaves like a redis.Redis instance: any command is forwarded to the
+    underlying client. Connection failures and timeouts are counted, and
+    after failure_threshold consecutive failures every call fails fast with
+    CircuitOpenError for reset_timeout seconds instead of waiting on a
+    socket timeout.
+    """
+
+    def __init__(self, url, max_connections=50, socket_timeout=0.5,
+                 socket_connect_timeout=0.5, failure_threshold=5, reset_timeout=30):
+        self.url = url
+        self.socket_connect_timeout = socket_connect_timeout
+        self.pool = ConnectionPool.from_url(
+            url,
+            decode_responses=True,
+            max_connections=max_connections,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_connect_timeout,
+            socket_keepalive=True,
+            health_check_interval=30
+        )
+        self.client = Redis(connection_pool=self.pool)
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        # Counters exposed by metrics()
+        self.calls = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.trips = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a client from the Flask config"""
+        return cls(
+            config['REDIS_URL'],
+            max_connections=config['REDIS_MAX_CONNECTIONS'],
+            socket_timeout=config['REDIS_SOCKET_TIMEOUT'],
+            socket_connect_timeout=config['REDIS_CONNECT_TIMEOUT'],
+            failure_threshold=config['REDIS_BREAKER_FAILURE_THRESHOLD'],
+            reset_timeout=config['REDIS_BREAKER_RESET_TIMEOUT']
+        )
+
+    @property
+    def available(self):
+        """False while the circuit is open and calls would be skipped"""
+        if self.state != OPEN:
+            return True
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.call(attr, *args, **kwargs)
+        return call
+
+    def call(self, fn, *args, **kwargs):
+        """Run a Redis operation through the circuit breaker"""
+        trial = self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except (RedisConnectionError, RedisTimeoutError):
+            self._record_failure(trial)
+            raise
+        except Exception:
+            # Redis answered, e.g. with a command error
+            self._record_success(trial)
+            raise
+        self._record_success(trial)
+        return result
+
+    def register_script(self, script):
+        """Register a Lua script; local bookkeeping only, no round-trip"""
+        return self.client.register_script(script)
+
+    def lock(self, name, **kwargs):
+        """Return a redis-py Lock whose commands go through the breaker"""
+        return Lock(self, name, **kwargs)
+
+    def pipeline(self, transaction=True):
+        """Return a pipeline whose execute() goes through the breaker"""
+        return _ResilientPipeline(self, self.client.pipeline(transaction=transaction))
+
+    def pubsub(self, **kwargs):
+        """Return a PubSub on a dedicated connection without a read timeout.
+
+        Subscribers block on reads for as long as the channel is idle, so
+        they cannot share the pool's short socket timeout.
+        """
+        client = Redis.from_url(
+            self.url,
+            decode_responses=True,
+            socket_connect_timeout=self.socket_connect_timeout,
+            socket_keepalive=True
+        )
+        return client.pubsub(**kwargs)
+
+    def get_many(self, keys):
+        """Fetch several keys in one round-trip"""
+        if not keys:
+            return []
+        return self.call(self.client.mget, keys)
+
+    def set_many(self, mapping, timeout):
+        """Set several keys with the same expiry in one round-trip"""
+        if not mapping:
+            return
+        pipe = self.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.setex(key, timeout, value)
+        pipe.execute()
+
+    def metrics(self):
+        """Return breaker state and pool usage"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self._consecutive_failures,
+            'calls': self.calls,
+            'failures': self.failures,
+            'short_circuited': self.short_circuited,
+            'trips': self.trips,
+            'pool': {
+                'max_connections': self.pool.max_connections,
+                'in_use': len(self.pool._in_use_connections),
+                'idle': len(self.pool._available_connections)
+            }
+        }
+
+    def _before_call(self):
+        """Fail fast while open; let a single trial call through when half-open"""
+        with self._lock:
+            self.calls += 1
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.short_circuited += 1
+                    raise CircuitOpenError('Redis circuit breaker is open')
+                self.state = HALF_OPEN
+
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self.short_circuited += 1
+                    raise CircuitOpenError('Redis circuit breaker is half-open')
+                self._trial_in_flight = True
+                return True
+
+            return False
+
+    def _record_success(self, trial):
+        with self._lock:
+            self._consecutive_failures = 0
+            if trial:
+                self._trial_in_flight = False
+                self.state = CLOSED
+
+    def _record_failure(self, trial):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if trial:
+                self._trial_in_flight = False
+            if trial or self._consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.trips += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class _ResilientPipeline:
+    """Pipeline wrapper that routes execute() through the circuit breaker"""
+
+    def __init__(self, resilient, pipeline):
+        self._resilient = resilient
+        self._pipeline = pipeline
+
+    def __getattr__(self, name):
+        return getattr(self._pipeline, name)
+
+    def execute(self, raise_on_error=True):
+        return self._resilient.call(self._pipeline.execute, raise_on_error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._pipeline.reset()
@@ -0,0 +1,118 @@
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db, redis_client
+from app.models.appointment import Appointment
+from app.models.reminder_delivery import ReminderDelivery
+
+logger = logging.getLogger('app.reminders')
+
+# Sorted set of appointment ids scored by when their reminder is due (epoch seconds)
+SCHEDULE_KEY = 'reminders:schedule'
+
+# ReminderDelivery.reminder_type of the appointment reminder
+REMINDER_TYPE = 'appointment'
+
+# Pops up to ARGV[2] members due by ARGV[1], atomically, so two drains
+# running at once never get the same appointment
+_POP_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+end
+return due
+"""
+_pop_due = None
+
+
+def _starts_at(appointment_date, appointment_time):
+    return datetime.combine(appointment_date, appointment_time)
+
+
+def send_at(appointment_date, appointment_time):
+    """When the reminder for an appointment at this date and time is due"""
+    lead = timedelta(hours=current_app.config['REMINDER_LEAD_HOURS'])
+    return _starts_at(appointment_date, appointment_time) - lead
+
+
+def schedule_reminder(appointment):
+    """Add, move or remove appointment's reminder to match its status and time.
+
+    Called after the change is committed. Failures are logged and left for
+    sync_schedule to repair.
+    """
+    if redis_client is None:
+        return
+    try:
+        if appointment.status == 'Booked':
+            due = send_at(appointment.appointment_date, appointment.appointment_time)
+            redis_client.zadd(SCHEDULE_KEY, {str(appointment.id): due.timestamp()})
+        else:
+            redis_client.zrem(SCHEDULE_KEY, str(appointment.id))
+    except Exception as e:
+        logger.warning("Reminder schedule error: %s", e)
+
+
+def forget_delivery(appointment_id):
+    """Drop the ledger entry of a rescheduled appointment so it is reminded again.
+
+    Only adds the delete to the session; the caller commits it.
+    """
+    ReminderDelivery.query.filter_by(
+        appointment_id=appointment_id, reminder_type=REMINDER_TYPE
+    ).delete(synchronize_session=False)
+
+
+def pop_due(now, limit):
+    """Remove and return up to limit (appointment_id, due timestamp) pairs due by now"""
+    global _pop_due
+    if _pop_due is None:
+        _pop_due = redis_client.register_script(_POP_DUE_SCRIPT)
+    due = redis_client.call(_pop_due, keys=[SCHEDULE_KEY], args=[now.timestamp(), limit])
+    return [(int(due[i]), float(due[i + 1])) for i in range(0, len(due), 2)]
+
+
+def restore(due):
+    """Put popped (appointment_id, due timestamp) pairs back, e.g. after a failed dispatch"""
+    if due:
+        redis_client.zadd(SCHEDULE_KEY, {str(appointment_id): score for appointment_id, score in due})
+
+
+def sync_schedule():
+    """Schedule every booked appointment in the next REMINDER_SYNC_DAYS not yet dispatched.
+
+    Backfills reminders whose schedule_reminder call was lost, e.g. while
+    Redis was down. Appointments with a ledger row were already dispatched;
+    re-sending those is left to the lease and retries of deliver_reminder,
+    as queueing them again would start a second send. Returns how many
+    appointments were (re)scheduled.
+    """
+    now = datetime.now()
+    rows = db.session.query(
+        Appointment.id, Appointment.appointment_date, Appointment.appointment_time
+    ).outerjoin(
+        ReminderDelivery, db.and_(
+            ReminderDelivery.appointment_id == Appointment.id,
+            ReminderDelivery.reminder_type == REMINDER_TYPE
+        )
+    ).filter(
+        Appointment.status == 'Booked',
+        Appointment.appointment_date >= now.date(),
+        Appointment.appointment_date <= now.date() + timedelta(days=current_app.config['REMINDER_SYNC_DAYS']),
+        ReminderDelivery.id.is_(None)
+    ).yield_per(current_app.config['REMINDER_BATCH_SIZE'])
+
+    scheduled = 0
+    batch = {}
+    for appointment_id, appointment_date, appointment_time in rows:
+        if _starts_at(appointment_date, appointment_time) <= now:
+            continue
+        batch[str(appointment_id)] = send_at(appointment_date, appointment_time).timestamp()
+        if len(batch) >= 1000:
+            redis_client.zadd(SCHEDULE_KEY, batch)
+            scheduled += len(batch)
+            batch = {}
+    if batch:
+        redis_client.zadd(SCHEDULE_KEY, batch)
+        scheduled += len(batch)
+    return scheduled
@@ -0,0 +1,105 @@
+import logging
+from contextlib import contextmanager
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger('app.replica')
+
+REPLICA_BIND = 'replica'
+
+# Redis key marking a user who wrote recently and must read from the primary
+RECENT_WRITE_KEY_PREFIX = 'db:recent_write:'
+
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to the replica bind when asked to.
+
+    Routing is opt-in per session through info['use_replica'], set by the
+    read_replica decorator and the use_replica() context manager. Flushes,
+    UPDATE/DELETE statements and anything issued without the flag go to
+    the primary. Without a replica bind configured this is a no-op.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('use_replica') and not self._flushing
+                and (clause is None or isinstance(clause, Select))):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def use_replica(session=None):
+    """Route reads in the block to the replica, e.g. in reporting tasks"""
+    from app import db
+    session = session or db.session
+    previous = session.info.get('use_replica', False)
+    session.info['use_replica'] = True
+    try:
+        yield session
+    finally:
+        session.info['use_replica'] = previous
+
+
+@contextmanager
+def use_primary(session=None):
+    """Route reads in the block to the primary, even inside read_replica"""
+    from app import db
+    session = session or db.session
+    previous = session.info.get('use_replica', False)
+    session.info['use_replica'] = False
+    try:
+        yield session
+    finally:
+        session.info['use_replica'] = previous
+
+
+def iter_query(query, batch_size, session=None):
+    """Iterate query in batches from a streamed response body.
+
+    The body is read after the view has returned, when read_replica has
+    already reset the session's routing, so the view's choice is captured
+    here and restored while the rows are fetched.
+    """
+    from app import db
+    session = session or db.session
+    replica = session.info.get('use_replica', False)
+
+    def rows():
+        previous = session.info.get('use_replica', False)
+        session.info['use_replica'] = replica
+        try:
+            yield from query.yield_per(batch_size)
+        finally:
+            session.info['use_replica'] = previous
+    return rows()
+
+
+def mark_recent_write(user_id):
+    """Pin user_id to the primary for READ_YOUR_WRITES_WINDOW seconds"""
+    from app import redis_client
+    if redis_client is None or user_id is None:
+        return
+    try:
+        redis_client.setex(
+            f"{RECENT_WRITE_KEY_PREFIX}{user_id}",
+            current_app.config['READ_YOUR_WRITES_WINDOW'],
+            1
+        )
+    except Exception as e:
+        logger.warning("Recent write mark error: %s", e)
+
+
+def recently_wrote(user_id):
+    """True if user_id wrote within the window, or if that cannot be checked"""
+    from app import redis_client
+    if redis_client is None or not redis_client.available:
+        # Without the marker the replica could serve this user stale rows
+        return True
+    try:
+        return bool(redis_client.exists(f"{RECENT_WRITE_KEY_PREFIX}{user_id}"))
+    except Exception as e:
+        logger.warning("Recent write check error: %s", e)
+        return True
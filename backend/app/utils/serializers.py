@@ -0,0 +1,314 @@
+import json
+from datetime import date, datetime, time
+from json.encoder import encode_basestring_ascii
+from flask import request, current_app, stream_with_context
+from app import db
+from app.utils.replica import iter_query
+from app.models.patient import Patient
+from app.models.doctor import Doctor
+from app.models.department import Department
+from app.models.appointment import Appointment
+from app.models.treatment import Treatment
+
+# orjson is optional; without it the stdlib encoder is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class InvalidShape(ValueError):
+    """Raised when a client asks for a shape that does not exist"""
+
+
+def dumps(value):
+    """Encode any JSON value compactly, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+def _hour_minute(value):
+    return value.strftime('%H:%M')
+
+_PLAIN_STRING_FORMATTERS = (_iso, _hour_minute)
+
+
+def _value_encoder(column, formatter):
+    """Return a function rendering one column value as a JSON fragment.
+
+    Chosen once per field from the column type, so encoding a row is a
+    fixed sequence of calls with no type checks or intermediate dicts.
+    """
+    if formatter in _PLAIN_STRING_FORMATTERS:
+        # Output never needs escaping, so skip the JSON encoder
+        return lambda value: 'null' if value is None else '"' + formatter(value) + '"'
+    if formatter is not None:
+        return lambda value: 'null' if value is None else dumps(formatter(value))
+
+    python_type = column.type.python_type
+    if python_type is bool:
+        return lambda value: 'null' if value is None else ('true' if value else 'false')
+    if python_type is int:
+        return lambda value: 'null' if value is None else str(value)
+    if python_type is float:
+        return lambda value: 'null' if value is None else repr(float(value))
+    if python_type is str:
+        return lambda value: 'null' if value is None else encode_basestring_ascii(value)
+    if python_type in (date, datetime, time):
+        return lambda value: 'null' if value is None else '"' + value.isoformat() + '"'
+    return lambda value: 'null' if value is None else dumps(value)
+
+
+class Nested:
+    """Field placeholder embedding another shape, e.g. an optional joined row.
+
+    Renders as null when the nested shape's first column (its primary key)
+    is NULL, i.e. when an outer join found nothing, or with omit_if_null
+    leaves the key out altogether, as the models' to_dict() methods do.
+    """
+
+    def __init__(self, shape, omit_if_null=False):
+        self.shape = shape
+        self.omit_if_null = omit_if_null
+
+
+class Shape:
+    """A named response shape backed by a column-only SQL projection.
+
+    query() selects just the shape's columns, so rows come back as plain
+    tuples without going through the ORM identity map, and large columns
+    that the shape leaves out are never read. fields is a list of
+    (name, column, formatter) where formatter may be None, or
+    (name, Nested(shape), None) for an embedded object.
+
+    encode() turns a row straight into a JSON string with per-field
+    encoders compiled when the shape is defined; serialize() builds a
+    dict for callers that need one.
+    """
+
+    def __init__(self, name, fields, outerjoins=()):
+        self.name = name
+        self.fields = fields
+        self.outerjoins = outerjoins
+        self._compile()
+
+    def _compile(self):
+        self.columns = []  # (label, column) in row order
+        self._parts = []   # (row offset, encoder(row, offset) -> '"key":value' with separator)
+        self._slots = []   # (name, row offset, formatter or Nested)
+        for position, (name, column, formatter) in enumerate(self.fields):
+            prefix = ('{' if position == 0 else ',') + encode_basestring_ascii(name) + ':'
+            offset = len(self.columns)
+            if isinstance(column, Nested):
+                nested = column.shape
+                self.columns.extend((f"{name}__{label}", col) for label, col in nested.columns)
+                if column.omit_if_null:
+                    encode = lambda row, i, p=prefix, enc=nested.encode: '' if row[i] is None else p + enc(row, i)
+                else:
+                    encode = lambda row, i, p=prefix, enc=nested.encode: p + enc(row, i)
+                self._parts.append((offset, encode))
+                self._slots.append((name, offset, column))
+            else:
+                self.columns.append((name, column))
+                encode_value = _value_encoder(column, formatter)
+                self._parts.append((offset, lambda row, i, p=prefix, enc=encode_value: p + enc(row[i])))
+                self._slots.append((name, offset, formatter))
+
+    def query(self):
+        """Query returning one row per record, labelled with the field names"""
+        query = db.session.query(*[column.label(label) for label, column in self.columns])
+        for target, onclause in self.outerjoins:
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def encode(self, row, offset=0):
+        """Render one projected row, or the slice at offset, as a JSON object"""
+        if offset and row[offset] is None:
+            return 'null'
+        return ''.join([encode(row, offset + i) for i, encode in self._parts]) + '}'
+
+    def encode_many(self, rows):
+        """Render rows as a JSON array"""
+        return '[' + ','.join([self.encode(row) for row in rows]) + ']'
+
+    def serialize(self, row, offset=0):
+        """Render one projected row, or the slice at offset, as a dict"""
+        if offset and row[offset] is None:
+            return None
+        data = {}
+        for name, i, formatter in self._slots:
+            if isinstance(formatter, Nested):
+                if formatter.omit_if_null and row[offset + i] is None:
+                    continue
+                data[name] = formatter.shape.serialize(row, offset + i)
+            else:
+                value = row[offset + i]
+                data[name] = formatter(value) if formatter and value is not None else value
+        return data
+
+    def serialize_many(self, rows):
+        return [self.serialize(row) for row in rows]
+
+
+def json_rows_response(key, shape, rows, status=200, **extra):
+    """JSON response {key: [rows...], **extra} encoded with the shape's encoders"""
+    body = '{' + encode_basestring_ascii(key) + ':' + shape.encode_many(rows)
+    for name, value in extra.items():
+        body += ',' + encode_basestring_ascii(name) + ':' + dumps(value)
+    return current_app.response_class(body + '}', status=status, mimetype='application/json')
+
+
+def wants_stream():
+    """True if the client asked for NDJSON, via Accept or ?stream=1"""
+    if request.args.get('stream') == '1':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def ndjson_response(shape, query):
+    """Stream every row of query as newline-delimited JSON.
+
+    Rows are fetched in batches of STREAM_YIELD_PER and written as they are
+    encoded, so memory stays flat and the first bytes go out right away
+    however many rows match.
+    """
+    rows = iter_query(query, current_app.config['STREAM_YIELD_PER'])
+
+    @stream_with_context
+    def generate():
+        for row in rows:
+            yield shape.encode(row) + '\n'
+
+    return current_app.response_class(generate(), mimetype='application/x-ndjson')
+
+
+PATIENT_SHAPES = {
+    'summary': Shape('summary', [
+        ('id', Patient.id, None),
+        ('user_id', Patient.user_id, None),
+        ('full_name', Patient.full_name, None),
+        ('phone', Patient.phone, None),
+        ('gender', Patient.gender, None),
+        ('blood_group', Patient.blood_group, None),
+    ]),
+    'detail': Shape('detail', [
+        ('id', Patient.id, None),
+        ('user_id', Patient.user_id, None),
+        ('full_name', Patient.full_name, None),
+        ('phone', Patient.phone, None),
+        ('date_of_birth', Patient.date_of_birth, _iso),
+        ('gender', Patient.gender, None),
+        ('blood_group', Patient.blood_group, None),
+        ('address', Patient.address, None),
+        ('emergency_contact', Patient.emergency_contact, None),
+        ('medical_history', Patient.medical_history, None),
+        ('allergies', Patient.allergies, None),
+        ('created_at', Patient.created_at, _iso),
+        ('updated_at', Patient.updated_at, _iso),
+    ]),
+}
+
+_DOCTOR_DEPARTMENT = [(Department, Doctor.department_id == Department.id)]
+
+DOCTOR_SHAPES = {
+    'summary': Shape('summary', [
+        ('id', Doctor.id, None),
+        ('user_id', Doctor.user_id, None),
+        ('full_name', Doctor.full_name, None),
+        ('phone', Doctor.phone, None),
+        ('department_id', Doctor.department_id, None),
+        ('department_name', Department.name, None),
+        ('qualification', Doctor.qualification, None),
+        ('experience_years', Doctor.experience_years, None),
+        ('consultation_fee', Doctor.consultation_fee, None),
+        ('is_available', Doctor.is_available, None),
+    ], outerjoins=_DOCTOR_DEPARTMENT),
+    'detail': Shape('detail', [
+        ('id', Doctor.id, None),
+        ('user_id', Doctor.user_id, None),
+        ('full_name', Doctor.full_name, None),
+        ('phone', Doctor.phone, None),
+        ('department_id', Doctor.department_id, None),
+        ('department_name', Department.name, None),
+        ('qualification', Doctor.qualification, None),
+        ('experience_years', Doctor.experience_years, None),
+        ('consultation_fee', Doctor.consultation_fee, None),
+        ('is_available', Doctor.is_available, None),
+        ('bio', Doctor.bio, None),
+        ('created_at', Doctor.created_at, _iso),
+        ('updated_at', Doctor.updated_at, _iso),
+    ], outerjoins=_DOCTOR_DEPARTMENT),
+}
+
+TREATMENT_SHAPES = {
+    'summary': Shape('summary', [
+        ('id', Treatment.id, None),
+        ('diagnosis', Treatment.diagnosis, None),
+        ('prescription', Treatment.prescription, None),
+        ('next_visit_date', Treatment.next_visit_date, _iso),
+        ('follow_up_required', Treatment.follow_up_required, None),
+    ]),
+    'detail': Shape('detail', [
+        ('id', Treatment.id, None),
+        ('appointment_id', Treatment.appointment_id, None),
+        ('diagnosis', Treatment.diagnosis, None),
+        ('prescription', Treatment.prescription, None),
+        ('treatment_notes', Treatment.treatment_notes, None),
+        ('next_visit_date', Treatment.next_visit_date, _iso),
+        ('follow_up_required', Treatment.follow_up_required, None),
+        ('created_at', Treatment.created_at, _iso),
+        ('updated_at', Treatment.updated_at, _iso),
+    ]),
+}
+
+_APPOINTMENT_DETAILS = [
+    (Patient, Appointment.patient_id == Patient.id),
+    (Doctor, Appointment.doctor_id == Doctor.id),
+    (Department, Doctor.department_id == Department.id),
+    (Treatment, Treatment.appointment_id == Appointment.id),
+]
+
+APPOINTMENT_SHAPES = {
+    'summary': Shape('summary', [
+        ('id', Appointment.id, None),
+        ('patient_id', Appointment.patient_id, None),
+        ('doctor_id', Appointment.doctor_id, None),
+        ('appointment_date', Appointment.appointment_date, _iso),
+        ('appointment_time', Appointment.appointment_time, _hour_minute),
+        ('status', Appointment.status, None),
+        ('patient_name', Patient.full_name, None),
+        ('doctor_name', Doctor.full_name, None),
+        ('department_name', Department.name, None),
+        ('treatment', Nested(TREATMENT_SHAPES['summary']), None),
+    ], outerjoins=_APPOINTMENT_DETAILS),
+    'detail': Shape('detail', [
+        ('id', Appointment.id, None),
+        ('patient_id', Appointment.patient_id, None),
+        ('doctor_id', Appointment.doctor_id, None),
+        ('appointment_date', Appointment.appointment_date, _iso),
+        ('appointment_time', Appointment.appointment_time, _hour_minute),
+        ('status', Appointment.status, None),
+        ('reason', Appointment.reason, None),
+        ('notes', Appointment.notes, None),
+        ('created_at', Appointment.created_at, _iso),
+        ('updated_at', Appointment.updated_at, _iso),
+        ('patient_name', Patient.full_name, None),
+        ('patient_phone', Patient.phone, None),
+        ('doctor_name', Doctor.full_name, None),
+        ('department_name', Department.name, None),
+        ('treatment', Nested(TREATMENT_SHAPES['detail'], omit_if_null=True), None),
+    ], outerjoins=_APPOINTMENT_DETAILS),
+}
+
+
+def requested_shape(shapes, default='summary'):
+    """Shape named by ?shape=, so list clients can opt in to full records"""
+    name = request.args.get('shape', default)
+    if name not in shapes:
+        raise InvalidShape(f"Unknown shape '{name}', expected one of: {', '.join(shapes)}")
+    return shapes[name]
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.utils.sql_metrics import fingerprint, current_stats
+
+logger = logging.getLogger('app.sql.slow')
+
+# Most recent slow queries of this process, newest last
+_recent = deque(maxlen=200)
+_recent_lock = threading.Lock()
+_threshold = None
+
+
+def _param_shape(value):
+    """Type name of a bind parameter; values themselves are never logged"""
+    if isinstance(value, (list, tuple)):
+        return [_param_shape(item) for item in value]
+    return type(value).__name__
+
+
+def _param_shapes(parameters, executemany):
+    if executemany:
+        return {'rows': len(parameters), 'row': _param_shapes(parameters[0], False) if parameters else None}
+    if isinstance(parameters, dict):
+        return {name: _param_shape(value) for name, value in parameters.items()}
+    return [_param_shape(value) for value in parameters or ()]
+
+
+def _explain(conn, statement, parameters):
+    """Capture the plan the database chooses for a statement right now.
+
+    EXPLAIN runs on the caller's connection, inside its transaction. Only
+    SQLite is explained: a failed statement there leaves the transaction
+    usable, while on PostgreSQL it aborts it, so other databases log no plan.
+    """
+    if conn.dialect.name != 'sqlite' or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _threshold is not None:
+        conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _threshold is None or not conn.info.get('slow_query_start'):
+        return
+
+    elapsed = time.perf_counter() - conn.info['slow_query_start'].pop()
+    if elapsed * 1000 < _threshold:
+        return
+
+    stats = current_stats()
+    entry = {
+        'event': 'slow_query',
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'duration_ms': round(elapsed * 1000, 2),
+        'source': stats.label if stats else None,
+        'sql': fingerprint(statement),
+        'params': _param_shapes(parameters, executemany),
+        'plan': None if executemany else _explain(conn, statement, parameters)
+    }
+    with _recent_lock:
+        _recent.append(entry)
+    logger.warning(json.dumps(entry, default=str))
+
+
+def get_slow_queries(limit=None):
+    """Return recent slow queries of this process, newest first"""
+    with _recent_lock:
+        entries = list(reversed(_recent))
+    return entries[:limit] if limit else entries
+
+
+def init_app(app):
+    """Enable the slow query log with the app's threshold and log file"""
+    global _threshold, _recent
+
+    if app.config['SLOW_QUERY_THRESHOLD_MS'] is None:
+        _threshold = None
+        return
+
+    with _recent_lock:
+        if _recent.maxlen != app.config['SLOW_QUERY_BUFFER_SIZE']:
+            _recent = deque(_recent, maxlen=app.config['SLOW_QUERY_BUFFER_SIZE'])
+
+    log_path = app.config['SLOW_QUERY_LOG_PATH']
+    if log_path and not logger.handlers:
+        try:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            handler = RotatingFileHandler(
+                log_path,
+                maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                backupCount=app.config['SLOW_QUERY_LOG_BACKUPS']
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        except OSError as e:
+            print(f"Slow query log file error: {e}")
+
+    _threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
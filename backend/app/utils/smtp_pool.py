@@ -0,0 +1,173 @@
+import os
+import time
+import smtplib
+import threading
+
+# Refusals of one message; the server reset the transaction and the session
+# is still usable
+_REJECTED_MESSAGE_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+
+def _is_broken_session(error):
+    """True for failures that mean the connection itself is gone.
+
+    SMTPException subclasses OSError, so SMTP errors are excluded from the
+    socket errors explicitly.
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPPoolExhausted(smtplib.SMTPException):
+    """Raised when no SMTP session frees up within the acquire timeout"""
+
+
+class _Session:
+    """An open, authenticated SMTP connection and its bookkeeping"""
+
+    def __init__(self, server):
+        self.server = server
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPPool:
+    """Pool of persistent, authenticated SMTP sessions.
+
+    Opening a session costs a TCP connect, EHLO, STARTTLS and AUTH, which
+    is far slower than sending a message over it. Sessions are kept open
+    between messages and handed to whichever thread sends next; at most
+    max_sessions are open at once, and senders wait up to acquire_timeout
+    for one to free up.
+
+    A session idle longer than idle_timeout, or that has sent max_messages,
+    is closed instead of reused, as servers drop idle connections and
+    limit messages per connection. If a reused session turns out to have
+    been dropped anyway, the message is retried once on a new one.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 max_sessions=4, acquire_timeout=30, idle_timeout=60,
+                 max_messages=100, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_sessions = max_sessions
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._reset()
+
+        # Counters exposed by metrics()
+        self.connects = 0
+        self.reuses = 0
+        self.reconnects = 0
+        self.sent = 0
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.max_sessions)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _check_fork(self):
+        """Forget sessions inherited from a parent process.
+
+        Prefork workers share the parent's sockets after fork, so they are
+        abandoned without QUIT rather than used from two processes.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()
+                server.ehlo()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.connects += 1
+        return _Session(server)
+
+    def _checkout(self):
+        """Return (session, reused), preferring the most recently used idle session"""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                session = self._idle.pop()
+                if now - session.last_used < self.idle_timeout:
+                    self.reuses += 1
+                    return session, True
+                self._close(session)
+        return self._connect(), False
+
+    def _checkin(self, session):
+        session.last_used = time.monotonic()
+        if session.sent >= self.max_messages:
+            self._close(session)
+            return
+        with self._lock:
+            self._idle.append(session)
+
+    @staticmethod
+    def _close(session):
+        try:
+            session.server.quit()
+        except Exception:
+            session.server.close()
+
+    def send_message(self, msg):
+        """Send msg over a pooled session, reconnecting if the session was dropped"""
+        self._check_fork()
+        slots = self._slots
+        if not slots.acquire(timeout=self.acquire_timeout):
+            raise SMTPPoolExhausted(f'No SMTP session free after {self.acquire_timeout}s')
+        try:
+            while True:
+                session, reused = self._checkout()
+                try:
+                    session.server.send_message(msg)
+                except _REJECTED_MESSAGE_ERRORS:
+                    # Rejected message, e.g. a refused recipient; sending it
+                    # again would fail the same way
+                    self._checkin(session)
+                    raise
+                except Exception as e:
+                    session.server.close()
+                    if not (reused and _is_broken_session(e)):
+                        raise
+                    # Dropped by the server while idle, retry on a new session
+                    self.reconnects += 1
+                    continue
+                session.sent += 1
+                self.sent += 1
+                self._checkin(session)
+                return
+        finally:
+            slots.release()
+
+    def close(self):
+        """QUIT every idle session"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._close(session)
+
+    def metrics(self):
+        return {
+            'idle': len(self._idle),
+            'max_sessions': self.max_sessions,
+            'connects': self.connects,
+            'reuses': self.reuses,
+            'reconnects': self.reconnects,
+            'sent': self.sent
+        }
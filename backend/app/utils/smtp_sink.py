@@ -0,0 +1,192 @@
+"""
+In-process SMTP server that accepts and keeps every message, for running
+email jobs offline. Point EMAIL_HOST/EMAIL_PORT at it and set
+EMAIL_USE_TLS=0; any username and password are accepted.
+
+    python -m app.utils.smtp_sink --port 1025
+"""
+import argparse
+import socket
+import threading
+import socketserver
+from email import message_from_bytes
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """One client connection, speaking just enough SMTP for smtplib"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        sink._opened(self.connection)
+        try:
+            self.converse(sink)
+        finally:
+            sink._closed(self.connection)
+
+    def converse(self, sink):
+        self.reply('220 smtp-sink ready')
+        mail_from, rcpt_tos = None, []
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode('utf-8', 'replace').strip().partition(' ')
+            command = command.upper()
+
+            if command == 'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250-8BITMIME')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif command == 'HELO':
+                self.reply('250 smtp-sink')
+            elif command == 'AUTH':
+                mechanism = argument.split(' ')[0].upper()
+                if mechanism == 'LOGIN':
+                    if ' ' not in argument:
+                        self.reply('334 VXNlcm5hbWU6')
+                        self.rfile.readline()
+                    self.reply('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                elif ' ' not in argument:
+                    self.reply('334 ')
+                    self.rfile.readline()
+                self.reply('235 Authentication successful')
+            elif command == 'MAIL':
+                mail_from, rcpt_tos = argument.partition(':')[2].strip(), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipient = argument.partition(':')[2].strip()
+                if recipient.strip('<>') in sink.refused_recipients:
+                    self.reply('550 5.1.1 Mailbox unavailable')
+                else:
+                    rcpt_tos.append(recipient)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                sink._store(mail_from, rcpt_tos, b''.join(lines))
+                mail_from, rcpt_tos = None, []
+                self.reply('250 OK: queued')
+            elif command == 'RSET':
+                mail_from, rcpt_tos = None, []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif command == 'STARTTLS':
+                self.reply('454 TLS not available')
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """SMTP server on a background thread that records what it receives.
+
+    Usable as a context manager; port 0 picks a free port, available as
+    .port once started. connections counts every connection accepted and
+    max_open the most that were open at once. RCPT for an address in
+    refused_recipients is answered with 550.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, on_message=None, refused_recipients=()):
+        self.host = host
+        self.port = port
+        self.on_message = on_message
+        self.refused_recipients = set(refused_recipients)
+        self.messages = []
+        self.connections = 0
+        self.max_open = 0
+        self._open = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def _opened(self, connection):
+        with self._lock:
+            self.connections += 1
+            self._open.add(connection)
+            self.max_open = max(self.max_open, len(self._open))
+
+    def _closed(self, connection):
+        with self._lock:
+            self._open.discard(connection)
+
+    @property
+    def open_connections(self):
+        return len(self._open)
+
+    def drop_connections(self):
+        """Close every client connection, as a server timing out idle sessions does"""
+        with self._lock:
+            connections = list(self._open)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _store(self, mail_from, rcpt_tos, data):
+        message = {
+            'mail_from': mail_from,
+            'rcpt_tos': rcpt_tos,
+            'message': message_from_bytes(data)
+        }
+        with self._lock:
+            self.messages.append(message)
+        if self.on_message:
+            self.on_message(message)
+
+    def start(self):
+        self._server = _ThreadingServer((self.host, self.port), _SMTPHandler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local SMTP sink')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--refuse', action='append', default=[], help='Recipient address to refuse')
+    args = parser.parse_args()
+
+    def show(message):
+        print(f"{message['mail_from']} -> {', '.join(message['rcpt_tos'])}: {message['message']['Subject']}")
+
+    sink = SMTPSink(args.host, args.port, on_message=show, refused_recipients=args.refuse).start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        sink._thread.join()
+    except KeyboardInterrupt:
+        sink.stop()
@@ -0,0 +1,178 @@
+import re
+import json
+import time
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+from flask import request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('app.sql')
+
+# Stats of the request or Celery task running in this context, if any
+_current = ContextVar('sql_metrics', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+_PARAM_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget when SQL_ENFORCE_BUDGETS is on"""
+
+
+class QueryStats:
+    """Statement count, DB time and statement fingerprints for one unit of work"""
+
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """Fingerprints run at least threshold times, the usual N+1 signature"""
+        return {sql: n for sql, n in self.fingerprints.most_common() if n >= threshold}
+
+    def to_dict(self, threshold):
+        return {
+            'label': self.label,
+            'queries': self.count,
+            'db_time_ms': round(self.total_time * 1000, 2),
+            'repeated': self.repeated(threshold)
+        }
+
+
+def fingerprint(statement):
+    """Normalize SQL so that the same query with different values compares equal"""
+    sql = _WHITESPACE.sub(' ', statement).strip()
+    sql = _LITERALS.sub('?', sql)
+    return _PARAM_LIST.sub('(?)', sql)
+
+
+def start_tracking(label):
+    """Start collecting stats in the current context; returns a reset token"""
+    return _current.set(QueryStats(label))
+
+
+def stop_tracking(token):
+    """Stop collecting and return the stats gathered since start_tracking"""
+    stats = _current.get()
+    _current.reset(token)
+    return stats
+
+
+def current_stats():
+    """Stats of the running request or task, or None outside one"""
+    return _current.get()
+
+
+def log_stats(stats, threshold):
+    """Emit one structured log line for a finished request or task"""
+    data = stats.to_dict(threshold)
+    level = logging.WARNING if data['repeated'] else logging.INFO
+    logger.log(level, json.dumps({'event': 'sql_metrics', **data}))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None or not conn.info.get('query_start'):
+        return
+    stats.record(statement, time.perf_counter() - conn.info['query_start'].pop())
+
+
+def init_app(app):
+    """Track SQL per request, with debug headers and a log line per request"""
+    if not app.config['SQL_METRICS_ENABLED']:
+        return
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(app.config['SQL_METRICS_LOG_LEVEL'])
+
+    @app.before_request
+    def start_request_tracking():
+        request.environ['sql_metrics.token'] = start_tracking(f"{request.method} {request.path}")
+
+    @app.after_request
+    def report_request_stats(response):
+        token = request.environ.pop('sql_metrics.token', None)
+        if token is None:
+            return response
+        stats = stop_tracking(token)
+        threshold = app.config['SQL_REPEAT_THRESHOLD']
+        if app.debug:
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = f"{stats.total_time * 1000:.2f}"
+            response.headers['X-DB-Repeated-Queries'] = str(len(stats.repeated(threshold)))
+        log_stats(stats, threshold)
+        return response
+
+    @app.teardown_request
+    def stop_request_tracking(error=None):
+        # after_request is skipped when the view raised
+        token = request.environ.pop('sql_metrics.token', None)
+        if token is not None:
+            stop_tracking(token)
+
+
+def init_celery(celery, app):
+    """Track SQL per Celery task and log it when the task finishes"""
+    if not app.config['SQL_METRICS_ENABLED']:
+        return
+
+    from celery.signals import task_prerun, task_postrun
+    tokens = {}
+
+    @task_prerun.connect(weak=False)
+    def start_task_tracking(task_id=None, task=None, **kwargs):
+        tokens[task_id] = start_tracking(task.name)
+
+    @task_postrun.connect(weak=False)
+    def report_task_stats(task_id=None, task=None, **kwargs):
+        token = tokens.pop(task_id, None)
+        if token is not None:
+            log_stats(stop_tracking(token), app.config['SQL_REPEAT_THRESHOLD'])
+
+
+def query_budget(max_queries):
+    """Decorator declaring how many statements a view may run.
+
+    Going over logs a warning, or raises QueryBudgetExceeded when
+    SQL_ENFORCE_BUDGETS is set, so a test run fails on a new N+1.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            stats = current_stats()
+            before = stats.count if stats else 0
+            result = fn(*args, **kwargs)
+            if stats is None:
+                return result
+
+            used = stats.count - before
+            if used > max_queries:
+                message = f"{fn.__name__} ran {used} queries, budget is {max_queries}"
+                if current_app.config['SQL_ENFORCE_BUDGETS']:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(json.dumps({'event': 'query_budget_exceeded', 'view': fn.__name__,
+                                           'queries': used, 'budget': max_queries}))
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,94 @@
+import time
+import random
+import sqlite3
+from sqlalchemy import event
+
+
+def is_busy_error(error):
+    """True if an exception is SQLite reporting a locked or busy database"""
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class RetryingCursor(sqlite3.Cursor):
+    """Cursor that retries statements rejected with SQLITE_BUSY.
+
+    busy_timeout already makes SQLite wait for the lock; this adds a few
+    jittered retries on top for writers that still lose the race under
+    heavy contention, instead of surfacing "database is locked".
+
+    Only statements run outside a transaction are retried: a read or the
+    first write, which opens the transaction with BEGIN IMMEDIATE. Once a
+    transaction is open a busy error means its snapshot is stale, so
+    re-running one statement cannot succeed and the error is raised for
+    the caller to roll back.
+    """
+
+    retries = 3
+    backoff = 0.05
+
+    def execute(self, *args, **kwargs):
+        if self.connection.in_transaction:
+            return super().execute(*args, **kwargs)
+        return _with_retry(super().execute, self.retries, self.backoff, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        if self.connection.in_transaction:
+            return super().executemany(*args, **kwargs)
+        return _with_retry(super().executemany, self.retries, self.backoff, *args, **kwargs)
+
+
+class RetryingConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors and commits retry on SQLITE_BUSY"""
+
+    retries = 3
+    backoff = 0.05
+
+    def cursor(self, factory=None):
+        cursor = super().cursor(factory or RetryingCursor)
+        cursor.retries = self.retries
+        cursor.backoff = self.backoff
+        return cursor
+
+    def commit(self):
+        return _with_retry(super().commit, self.retries, self.backoff)
+
+
+def _with_retry(fn, retries, backoff, *args, **kwargs):
+    """Call fn, retrying with exponential backoff while SQLite is busy"""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if attempt == retries or not is_busy_error(e):
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+def sqlite_engine_options(config):
+    """Engine options for SQLite: busy-retrying connections and lock timeout.
+
+    sqlite3 opens a transaction right before the first INSERT, UPDATE or
+    DELETE; reads before that run outside any transaction. Opening it with
+    BEGIN IMMEDIATE takes the write lock up front, waiting busy_timeout for
+    it, so a write transaction never has to upgrade a read snapshot that
+    another writer has made stale (SQLITE_BUSY_SNAPSHOT under WAL).
+    """
+    RetryingConnection.retries = config['SQLITE_BUSY_RETRIES']
+    return {
+        'connect_args': {
+            'factory': RetryingConnection,
+            'timeout': config['SQLITE_PRAGMAS'].get('busy_timeout', 5000) / 1000,
+            'isolation_level': 'IMMEDIATE'
+        }
+    }
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the configured PRAGMA statements on every new connection"""
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
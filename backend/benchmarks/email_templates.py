@@ -0,0 +1,251 @@
+"""
+Email rendering: compiled Jinja templates vs the f-strings they replaced
+
+    python benchmarks/email_templates.py
+    python benchmarks/email_templates.py --renders 20000 --appointments 100
+
+Renders the appointment reminder and a doctor's monthly report, with
+--appointments rows, through render_email, with and without the
+plain-text part, and through copies of the f-string builders tasks.py
+used before the templates. The Jinja path also escapes every value,
+which the f-strings never did.
+
+The f-strings render faster; what matters is that both are far faster
+than SMTP can deliver (see smtp_throughput.py), so rendering is not what
+limits a reminder run.
+"""
+import os
+import sys
+import time
+import argparse
+from collections import namedtuple
+from datetime import date, time as dt_time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.utils.email_templates import render_email, precompile
+
+ReminderRow = namedtuple('ReminderRow', [
+    'appointment_date', 'appointment_time', 'patient_name', 'doctor_name', 'department_name'
+])
+
+
+# The f-string builders from tasks.py, as they were before the templates
+def fstring_reminder(row):
+    subject = f"Appointment Reminder - {row.appointment_date}"
+    html_content = f"""
+    <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background-color: #007bff; color: white; padding: 20px; text-align: center; }}
+                .content {{ padding: 20px; background-color: #f8f9fa; }}
+                .info {{ background-color: white; padding: 15px; margin: 10px 0; border-radius: 5px; }}
+                .footer {{ text-align: center; padding: 20px; color: #666; font-size: 12px; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>🏥 Appointment Reminder</h1>
+                </div>
+                <div class="content">
+                    <p>Dear {row.patient_name},</p>
+                    <p>This is a friendly reminder about your appointment scheduled for today.</p>
+
+                    <div class="info">
+                        <h3>Appointment Details:</h3>
+                        <p><strong>Doctor:</strong> {row.doctor_name}</p>
+                        <p><strong>Department:</strong> {row.department_name or 'N/A'}</p>
+                        <p><strong>Date:</strong> {row.appointment_date.strftime('%B %d, %Y')}</p>
+                        <p><strong>Time:</strong> {row.appointment_time}</p>
+                    </div>
+
+                    <p>Please arrive 10 minutes before your scheduled time.</p>
+                    <p>If you need to reschedule, please contact us as soon as possible.</p>
+                </div>
+                <div class="footer">
+                    <p>Hospital Management System</p>
+                    <p>This is an automated message, please do not reply.</p>
+                </div>
+            </div>
+        </body>
+    </html>
+    """
+    return subject, html_content
+
+
+def fstring_monthly_report(month_name, report):
+    appointment_rows = ""
+    for appointment_date, patient_name, status, diagnosis, prescription in report['appointments']:
+        appointment_rows += f"""
+        <tr>
+            <td style="padding: 8px; border: 1px solid #ddd;">{appointment_date}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{patient_name}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{status}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{diagnosis}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{prescription}</td>
+        </tr>
+        """
+
+    subject = f"Monthly Activity Report - {month_name}"
+    html_content = f"""
+    <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 800px; margin: 0 auto; padding: 20px; }}
+                .header {{ background-color: #28a745; color: white; padding: 20px; text-align: center; }}
+                .content {{ padding: 20px; background-color: #f8f9fa; }}
+                .stats {{ display: flex; justify-content: space-around; margin: 20px 0; }}
+                .stat-box {{ background-color: white; padding: 20px; border-radius: 5px; text-align: center; flex: 1; margin: 0 10px; }}
+                .stat-number {{ font-size: 36px; font-weight: bold; color: #007bff; }}
+                table {{ width: 100%; border-collapse: collapse; background-color: white; margin: 20px 0; }}
+                th {{ background-color: #007bff; color: white; padding: 12px; text-align: left; }}
+                .footer {{ text-align: center; padding: 20px; color: #666; font-size: 12px; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>📊 Monthly Activity Report</h1>
+                    <h2>{month_name}</h2>
+                </div>
+                <div class="content">
+                    <p>Dear Dr. {report['doctor_name']},</p>
+                    <p>Here is your activity summary for {month_name}:</p>
+
+                    <div class="stats">
+                        <div class="stat-box">
+                            <div class="stat-number">{report['total']}</div>
+                            <div>Total Appointments</div>
+                        </div>
+                        <div class="stat-box">
+                            <div class="stat-number">{report['completed']}</div>
+                            <div>Completed</div>
+                        </div>
+                        <div class="stat-box">
+                            <div class="stat-number">{report['cancelled']}</div>
+                            <div>Cancelled</div>
+                        </div>
+                    </div>
+
+                    <h3>Appointment Details:</h3>
+                    <table>
+                        <thead>
+                            <tr>
+                                <th>Date</th>
+                                <th>Patient</th>
+                                <th>Status</th>
+                                <th>Diagnosis</th>
+                                <th>Treatment</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {appointment_rows}
+                        </tbody>
+                    </table>
+                </div>
+                <div class="footer">
+                    <p>Hospital Management System</p>
+                    <p>This is an automated monthly report.</p>
+                </div>
+            </div>
+        </body>
+    </html>
+    """
+    return subject, html_content
+
+
+def jinja_reminder(row, plain_text):
+    subject = f"Appointment Reminder - {row.appointment_date}"
+    html_content, text_content = render_email(
+        'reminder',
+        plain_text=plain_text,
+        patient_name=row.patient_name,
+        doctor_name=row.doctor_name,
+        department_name=row.department_name,
+        appointment_date=row.appointment_date.strftime('%B %d, %Y'),
+        appointment_time=row.appointment_time
+    )
+    return subject, html_content, text_content
+
+
+def jinja_monthly_report(month_name, report, plain_text):
+    subject = f"Monthly Activity Report - {month_name}"
+    html_content, text_content = render_email(
+        'monthly_report',
+        subheading=month_name,
+        plain_text=plain_text,
+        month_name=month_name,
+        **report
+    )
+    return subject, html_content, text_content
+
+
+def make_report(appointments):
+    return {
+        'doctor_id': 1,
+        'doctor_name': 'Dr Bench',
+        'email': 'doctor@bench.local',
+        'total': appointments,
+        'completed': appointments // 2,
+        'cancelled': appointments // 4,
+        'appointments': [
+            [f'{1 + i % 28:02d}/10/2026', f'Patient {i}', 'Completed', 'Healthy', 'Rest']
+            for i in range(appointments)
+        ]
+    }
+
+
+def rate(fn, renders, repeat):
+    """Best renders per second over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(renders):
+            fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return renders / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--renders', type=int, default=10000)
+    parser.add_argument('--appointments', type=int, default=40, help='rows in each monthly report')
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args()
+
+    precompile()
+    row = ReminderRow(date(2026, 10, 19), dt_time(10, 0), 'Patient Bench', 'Dr Bench', 'Cardiology')
+    month_name = 'October 2026'
+    report = make_report(options.appointments)
+    report_renders = max(1, options.renders // 10)
+
+    cases = [
+        ('reminder', options.renders, [
+            ('f-string', lambda: fstring_reminder(row)),
+            ('jinja', lambda: jinja_reminder(row, False)),
+            ('jinja + plain text', lambda: jinja_reminder(row, True)),
+        ]),
+        (f'monthly report, {options.appointments} rows', report_renders, [
+            ('f-string', lambda: fstring_monthly_report(month_name, report)),
+            ('jinja', lambda: jinja_monthly_report(month_name, report, False)),
+            ('jinja + plain text', lambda: jinja_monthly_report(month_name, report, True)),
+        ]),
+    ]
+
+    print(f"best of {options.repeat}")
+    for title, renders, paths in cases:
+        print(f"{title} ({renders} renders)")
+        baseline = None
+        for name, fn in paths:
+            per_second = rate(fn, renders, options.repeat)
+            baseline = baseline or per_second
+            print(f"  {name:<20}{per_second:>10.0f} renders/s  ({per_second / baseline:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
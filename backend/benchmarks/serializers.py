@@ -0,0 +1,111 @@
+"""
+Appointment list serialization: compiled row encoders vs Appointment.to_dict
+
+    python benchmarks/serializers.py
+    python benchmarks/serializers.py --rows 50000 --repeat 5
+
+Both paths load the same appointments, with patient, doctor, department
+and treatment, from a throwaway SQLite database and produce the same
+JSON body. Times include the query, so the ORM path pays for building
+objects as it does in a request.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+_tmp = tempfile.TemporaryDirectory(prefix='serializer-bench-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'bench.db')
+os.environ['SLOW_QUERY_LOG_PATH'] = os.path.join(_tmp.name, 'slow_queries.log')
+os.environ['SQL_METRICS_LOG_LEVEL'] = 'WARNING'
+
+from datetime import date, datetime, time as dt_time, timedelta
+from flask import jsonify
+from app import create_app, db
+from app.models import User, Department, Doctor, Patient, Appointment, Treatment
+from app.utils.serializers import APPOINTMENT_SHAPES, json_rows_response
+
+
+def seed(rows):
+    department = Department(name='Cardiology')
+    doctor_user = User(username='bench_doctor', email='doctor@bench.local', role='doctor', password_hash='x')
+    patient_user = User(username='bench_patient', email='patient@bench.local', role='patient', password_hash='x')
+    db.session.add_all([department, doctor_user, patient_user])
+    db.session.flush()
+    doctor = Doctor(user_id=doctor_user.id, full_name='Dr Bench', department_id=department.id)
+    patient = Patient(user_id=patient_user.id, full_name='Patient Bench', phone='5550100')
+    db.session.add_all([doctor, patient])
+    db.session.flush()
+
+    now = datetime.utcnow()
+    start = date.today() - timedelta(days=rows // 8 + 1)
+    db.session.execute(Appointment.__table__.insert(), [{
+        'patient_id': patient.id,
+        'doctor_id': doctor.id,
+        'appointment_date': start + timedelta(days=i // 8),
+        'appointment_time': dt_time(9 + i % 8, 0),
+        'status': 'Completed',
+        'reason': 'Checkup',
+        'created_at': now,
+        'updated_at': now,
+    } for i in range(rows)])
+    # Every other appointment has a treatment
+    db.session.execute(Treatment.__table__.insert(), [{
+        'appointment_id': appointment_id,
+        'diagnosis': 'Healthy',
+        'prescription': 'Rest',
+        'follow_up_required': False,
+        'created_at': now,
+        'updated_at': now,
+    } for appointment_id in range(1, rows + 1, 2)])
+    db.session.commit()
+
+
+def to_dict_path():
+    appointments = Appointment.query.options(
+        *Appointment.eager_options(include_details=True)
+    ).order_by(Appointment.id).all()
+    return jsonify({'appointments': [apt.to_dict(include_details=True) for apt in appointments]}).get_data()
+
+
+def shape_path():
+    shape = APPOINTMENT_SHAPES['detail']
+    rows = shape.query().order_by(Appointment.id).all()
+    return json_rows_response('appointments', shape, rows).get_data()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seed(options.rows)
+        assert json.loads(to_dict_path()) == json.loads(shape_path()), 'paths disagree'
+
+        baseline = best_of(to_dict_path, options.repeat)
+        compiled = best_of(shape_path, options.repeat)
+
+    print(f"{options.rows} appointments, best of {options.repeat}")
+    print(f"to_dict + jsonify   {baseline * 1000:>8.1f} ms  {options.rows / baseline:>9.0f} rows/s")
+    print(f"compiled encoders   {compiled * 1000:>8.1f} ms  {options.rows / compiled:>9.0f} rows/s  ({baseline / compiled:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Email throughput: a new SMTP connection per message vs the session pool
+
+    python benchmarks/smtp_throughput.py
+    python benchmarks/smtp_throughput.py --messages 2000 --threads 8 --latency 0.005
+
+Both paths send the same messages to the in-process SMTP sink from a
+number of sender threads, as a threaded worker does. --latency delays
+every reply from the sink's side of the connection to stand in for the
+round trip to a real server; EHLO and AUTH pay it too, which is what the
+pool saves.
+"""
+import os
+import sys
+import time
+import smtplib
+import argparse
+import threading
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.utils import smtp_sink
+from app.utils.smtp_pool import SMTPPool
+from app.utils.smtp_sink import SMTPSink
+
+
+def message(number):
+    msg = EmailMessage()
+    msg['From'] = 'hospital@bench.local'
+    msg['To'] = f'patient{number}@bench.local'
+    msg['Subject'] = f'Appointment reminder {number}'
+    msg.set_content('Your appointment is tomorrow at 10:00.')
+    return msg
+
+
+def send_per_connection(sink):
+    def send(msg):
+        # What send_email did before the pool
+        server = smtplib.SMTP(sink.host, sink.port, timeout=10)
+        try:
+            server.ehlo()
+            server.login('bench', 'secret')
+            server.send_message(msg)
+        finally:
+            server.quit()
+    return send, lambda: None
+
+
+def send_pooled(sink, threads):
+    pool = SMTPPool(sink.host, sink.port, 'bench', 'secret', use_tls=False, max_sessions=threads)
+    return pool.send_message, pool.close
+
+
+def run(sender, sink, messages, threads):
+    send, close = sender
+    numbers = iter(range(messages))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                number = next(numbers, None)
+            if number is None:
+                return
+            send(message(number))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.002, help='seconds added to each server reply')
+    options = parser.parse_args()
+
+    reply = smtp_sink._SMTPHandler.reply
+
+    def slow_reply(handler, line):
+        time.sleep(options.latency)
+        reply(handler, line)
+    smtp_sink._SMTPHandler.reply = slow_reply
+
+    results = {}
+    for name, make_sender in (
+        ('connection per message', send_per_connection),
+        ('pooled sessions', lambda sink: send_pooled(sink, options.threads)),
+    ):
+        with SMTPSink() as sink:
+            elapsed = run(make_sender(sink), sink, options.messages, options.threads)
+            assert len(sink.messages) == options.messages, 'messages lost'
+            results[name] = (elapsed, sink.connections)
+
+    print(f"{options.messages} messages, {options.threads} threads, {options.latency * 1000:.1f} ms per reply")
+    baseline = results['connection per message'][0]
+    for name, (elapsed, connections) in results.items():
+        print(f"{name:<24}{options.messages / elapsed:>9.0f} msg/s  {connections:>6} connections"
+              f"  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Reader/writer throughput on SQLite before and after the production profile
+
+    python benchmarks/sqlite_concurrency.py
+    python benchmarks/sqlite_concurrency.py --readers 16 --writers 4 --seconds 10
+
+"before" is a stock connection: rollback journal, deferred transactions
+and no busy retries. "after" uses Config.SQLITE_PRAGMAS (WAL) and the
+app's connection options (BEGIN IMMEDIATE, busy retries). Readers run an
+indexed range query; writers run read-then-write units of work.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import create_engine, text
+from app.utils.sqlite import sqlite_engine_options, apply_sqlite_pragmas
+from config.config import Config
+
+ROWS = 20000
+
+
+def make_engine(path, profile, threads):
+    options = {'pool_size': threads, 'max_overflow': 0}
+    if profile == 'after':
+        options.update(sqlite_engine_options(Config.__dict__))
+    engine = create_engine('sqlite:///' + path, **options)
+    if profile == 'after':
+        apply_sqlite_pragmas(engine, Config.SQLITE_PRAGMAS)
+    return engine
+
+
+def seed(engine):
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE visits (id INTEGER PRIMARY KEY, patient_id INTEGER, day INTEGER, note TEXT)'))
+        conn.execute(text('CREATE INDEX ix_visits_patient_day ON visits (patient_id, day)'))
+        conn.execute(
+            text('INSERT INTO visits (patient_id, day, note) VALUES (:patient_id, :day, :note)'),
+            [{'patient_id': i % 500, 'day': i % 365, 'note': 'x' * 50} for i in range(ROWS)]
+        )
+
+
+def read(conn):
+    conn.execute(
+        text('SELECT id, day, note FROM visits WHERE patient_id = :patient_id ORDER BY day DESC LIMIT 20'),
+        {'patient_id': random.randrange(500)}
+    ).fetchall()
+
+
+def write(conn):
+    patient_id = random.randrange(500)
+    last = conn.execute(
+        text('SELECT max(day) FROM visits WHERE patient_id = :patient_id'), {'patient_id': patient_id}
+    ).scalar() or 0
+    conn.execute(
+        text('INSERT INTO visits (patient_id, day, note) VALUES (:patient_id, :day, :note)'),
+        {'patient_id': patient_id, 'day': last + 1, 'note': 'y' * 50}
+    )
+
+
+def worker(engine, unit, deadline, results):
+    done, errors, latencies = 0, 0, []
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                unit(conn)
+            done += 1
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+    results.append((done, errors, latencies))
+
+
+def run(profile, readers, writers, seconds):
+    read_results, write_results = [], []
+    with tempfile.TemporaryDirectory(prefix='sqlite-bench-') as directory:
+        engine = make_engine(os.path.join(directory, 'bench.db'), profile, readers + writers)
+        seed(engine)
+
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=worker, args=(engine, read, deadline, read_results)) for _ in range(readers)]
+        threads += [threading.Thread(target=worker, args=(engine, write, deadline, write_results)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    def summarize(results):
+        done = sum(r[0] for r in results)
+        errors = sum(r[1] for r in results)
+        latencies = sorted(latency for r in results for latency in r[2])
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+        return done / seconds, errors, p95
+
+    reads = summarize(read_results)
+    writes = summarize(write_results)
+    print(f"{profile:<7} reads/s {reads[0]:>9.0f}  p95 {reads[2]:>7.2f} ms  errors {reads[1]:>5}   "
+          f"writes/s {writes[0]:>7.0f}  p95 {writes[2]:>7.2f} ms  errors {writes[1]:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    options = parser.parse_args()
+
+    print(f"{options.readers} readers, {options.writers} writers, {options.seconds:g}s each")
+    for profile in ('before', 'after'):
+        run(profile, options.readers, options.writers, options.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,62 @@
 import os
 from datetime import timedelta
 
+
+def optional_float(name, default):
+    """Float from environment variable name; empty or 'off' turns the setting off (None)"""
+    value = os.environ.get(name, default)
+    if value is None or str(value).strip().lower() in ('', 'off', 'none'):
+        return None
+    return float(value)
+
+
 class Config:
     """Base configuration"""
     SECRET_KEY = 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'hospital.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URL',
+        'sqlite:///' + os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'hospital.db')
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Optional read replica; heavy read-only views and reports query it
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    READ_YOUR_WRITES_WINDOW = int(os.environ.get('READ_YOUR_WRITES_WINDOW', 10))  # Seconds a writer stays on the primary
+
+    # Connection pool, applied to the primary and the replica
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Drop connections older than this
+    DB_POOL_PRE_PING = True  # Check connections on checkout to survive server restarts
+
+    # SQLite production profile, run on every new connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Readers no longer block on the writer
+        'synchronous': 'NORMAL',  # Safe with WAL, fsync only at checkpoints
+        'busy_timeout': 5000,  # Milliseconds to wait for a write lock
+        'cache_size': -64000,  # Negative means KiB, i.e. 64 MB page cache
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY'
+    }
+    SQLITE_BUSY_RETRIES = 3  # Extra attempts once busy_timeout has run out
+
+    # SQL instrumentation
+    SQL_METRICS_ENABLED = True
+    SQL_METRICS_LOG_LEVEL = os.environ.get('SQL_METRICS_LOG_LEVEL', 'INFO')
+    SQL_REPEAT_THRESHOLD = 5  # Same statement this often in one request is likely an N+1
+    SQL_ENFORCE_BUDGETS = os.environ.get('SQL_ENFORCE_BUDGETS') == '1'  # Raise on query_budget overruns, for tests
+
+    # Slow query log; SLOW_QUERY_THRESHOLD_MS=off (or empty) turns it off
+    SLOW_QUERY_THRESHOLD_MS = optional_float('SLOW_QUERY_THRESHOLD_MS', 100)
+    SLOW_QUERY_LOG_PATH = os.environ.get(
+        'SLOW_QUERY_LOG_PATH',
+        os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'logs', 'slow_queries.log')
+    )
+    SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 5
+    SLOW_QUERY_BUFFER_SIZE = 200  # Recent entries kept in memory for the admin endpoint
+
     # JWT Configuration
     JWT_SECRET_KEY = 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
@@ -14,15 +64,80 @@ class Config:
 
     # Redis Configuration
     REDIS_URL = 'redis://localhost:6379/0'
+    REDIS_MAX_CONNECTIONS = 50
+    REDIS_SOCKET_TIMEOUT = 0.5  # Seconds; a slow Redis must not stall requests
+    REDIS_CONNECT_TIMEOUT = 0.5
+    REDIS_BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures before skipping Redis
+    REDIS_BREAKER_RESET_TIMEOUT = 30  # Seconds to skip Redis once the breaker trips
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = REDIS_URL
-    CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
+    CACHE_DEFAULT_TIMEOUT = 6 * 60 * 60  # 6 hours, entries are invalidated by tag
+    CACHE_TAG_TIMEOUT = 24 * 60 * 60  # Must outlive any cached entry
+    CACHE_LOCAL_MAX_ENTRIES = 1024  # In-process tier size, per worker
+    CACHE_LOCAL_TIMEOUT = 300  # Upper bound on in-process entry age
+    CACHE_STATS_FLUSH_INTERVAL = 5  # Seconds between flushes of local-tier hit counts to Redis
+    CACHE_LOCK_TIMEOUT = 30  # Max time one worker may hold a rebuild lock
+    CACHE_LOCK_WAIT = 5  # How long other workers wait for that rebuild
+
+    # Background jobs
+    REMINDER_BATCH_SIZE = 1000  # Rows fetched per batch by send_daily_reminders and send_monthly_reports
+    MONTHLY_REPORT_CHUNK_SIZE = 50  # Doctors per send_monthly_report_batch subtask
+    EMAIL_PLAIN_TEXT = True  # Send a plain-text alternative with HTML emails
+    REMINDER_MAX_RETRIES = 5  # Failed reminder sends retried before the delivery is dead-lettered
+    REMINDER_RETRY_BACKOFF = 60  # Seconds before the first retry, doubled on each attempt
+    REMINDER_RETRY_BACKOFF_MAX = 60 * 60
+    REMINDER_SEND_LEASE = 5 * 60  # A send still in progress after this is assumed lost
+    REMINDER_LEAD_HOURS = int(os.getenv('REMINDER_LEAD_HOURS', 2))  # Reminders go out this long before the appointment
+    REMINDER_SYNC_DAYS = 7  # How far ahead sync_reminder_schedule backfills the schedule
+    SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 4))  # Open SMTP sessions per worker process
+    SMTP_POOL_TIMEOUT = 30  # Seconds a sender waits for a free session
+    SMTP_IDLE_TIMEOUT = 60  # Idle sessions older than this are reopened, not reused
+    SMTP_MAX_MESSAGES_PER_SESSION = 100  # Reconnect after this many messages
+    SMTP_TIMEOUT = 10  # Socket timeout for SMTP commands
 
     # Celery Configuration
     broker_url = REDIS_URL
     result_backend = REDIS_URL
 
+    # Time-sensitive notifications, bulk reports and exports each get their
+    # own queue, so a backlog in one never delays the others
+    task_default_queue = 'default'
+    task_routes = {
+        'app.tasks.deliver_reminder': {'queue': 'realtime'},
+        'app.tasks.dispatch_due_reminders': {'queue': 'realtime'},
+        'app.tasks.send_daily_reminders': {'queue': 'realtime'},
+        'app.tasks.send_monthly_reports': {'queue': 'bulk'},
+        'app.tasks.send_monthly_report_batch': {'queue': 'bulk'},
+        'app.tasks.summarize_monthly_reports': {'queue': 'bulk'},
+        'app.tasks.sync_reminder_schedule': {'queue': 'bulk'},
+        'app.tasks.run_export_job': {'queue': 'exports'},
+        'app.tasks.sweep_exports': {'queue': 'exports'},
+    }
+    # Rate limits apply per worker process
+    task_annotations = {
+        'app.tasks.deliver_reminder': {'rate_limit': os.getenv('REMINDER_RATE_LIMIT', '20/s')},
+        'app.tasks.send_monthly_report_batch': {'rate_limit': os.getenv('REPORT_BATCH_RATE_LIMIT', '30/m')},
+    }
+
+    # Worker profiles started by worker.py: which queues a worker consumes
+    # and how. IO-bound email sending runs on threads, so one process keeps
+    # many SMTP round-trips in flight; rendering and exports are CPU-bound
+    # and run in prefork processes that fetch one task at a time.
+    WORKER_PROFILES = {
+        'realtime': {'queues': ['realtime', 'default'], 'pool': 'threads', 'concurrency': 16, 'prefetch_multiplier': 4},
+        'bulk': {'queues': ['bulk'], 'pool': 'prefork', 'concurrency': None, 'prefetch_multiplier': 1},
+        'exports': {'queues': ['exports'], 'pool': 'prefork', 'concurrency': 2, 'prefetch_multiplier': 1},
+        'all': {'queues': ['realtime', 'default', 'bulk', 'exports'], 'pool': 'prefork', 'concurrency': None, 'prefetch_multiplier': 1},
+    }
+
     # Pagination
     ITEMS_PER_PAGE = 10
+    MAX_ITEMS_PER_PAGE = 100
+    STREAM_YIELD_PER = 1000  # Rows fetched per batch by streaming listings and exports
+    EXPORT_GZIP = True  # Gzip CSV exports for clients sending Accept-Encoding: gzip
+
+    # Background exports
+    EXPORT_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'exports')
+    EXPORT_RETENTION_HOURS = 24  # Jobs and artifacts older than this are swept
 
 config = Config 
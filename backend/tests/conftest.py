@@ -0,0 +1,201 @@
+"""
+Shared fixtures: one app on a throwaway SQLite database with Redis
+replaced by fakeredis, emptied before every test.
+
+Query budgets are enforced: a view that runs more statements than its
+query_budget raises QueryBudgetExceeded, which propagates out of the
+test client and fails the test.
+"""
+import os
+import tempfile
+from datetime import date, time, timedelta
+
+_tmp = tempfile.mkdtemp(prefix='hospital-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'hospital.db')
+os.environ['SLOW_QUERY_LOG_PATH'] = os.path.join(_tmp, 'slow_queries.log')
+os.environ.setdefault('SQL_METRICS_LOG_LEVEL', 'WARNING')
+os.environ['SQL_ENFORCE_BUDGETS'] = '1'
+
+import fakeredis
+import pytest
+from flask_jwt_extended import create_access_token
+from config.config import Config
+
+Config.BCRYPT_LOG_ROUNDS = 4
+Config.PROPAGATE_EXCEPTIONS = True
+Config.EXPORT_DIR = os.path.join(_tmp, 'exports')
+Config.broker_url = 'memory://'
+Config.result_backend = 'cache+memory://'
+
+redis_server = fakeredis.FakeServer()
+
+
+def fake_redis():
+    return fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+
+
+# Built before test modules are collected: app modules bind redis_client
+# at import time, so it has to exist by then. The Celery app's Flask app
+# is used so tasks and requests share the same database and Redis.
+import app as app_pkg
+from app.celery_app import flask_app
+
+app_pkg.redis_client.client = fake_redis()
+app_pkg.redis_client.pubsub = lambda **kwargs: fake_redis().pubsub(**kwargs)
+
+
+@pytest.fixture(scope='session')
+def app():
+    return flask_app
+
+
+@pytest.fixture(autouse=True)
+def clean_state(app):
+    """Empty the database, Redis and the in-process cache before each test"""
+    from app import db, redis_client
+    from app.models import User
+    from app.utils import cache
+    from app.utils.redis_pool import CLOSED
+
+    redis_server.connected = True
+    redis_client.client.flushall()
+    redis_client.state = CLOSED
+    redis_client._consecutive_failures = 0
+    redis_client._trial_in_flight = False
+    cache._pending_tags.clear()
+    cache._local_tag_hits.clear()
+    if cache._local_cache is not None:
+        cache._local_cache.clear()
+
+    with app.app_context():
+        db.session.remove()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        admin = User(username='admin', email='admin@hospital.com', role='admin', is_active=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+    yield
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+
+
+def auth_headers(user):
+    return {'Authorization': 'Bearer ' + create_access_token(identity=str(user.id))}
+
+
+@pytest.fixture
+def admin_headers(ctx):
+    from app.models import User
+    return auth_headers(User.query.filter_by(role='admin').first())
+
+
+@pytest.fixture
+def make_department(ctx):
+    from app import db
+    from app.models import Department
+
+    def make(name='Cardiology'):
+        department = Department(name=name)
+        db.session.add(department)
+        db.session.commit()
+        return department
+    return make
+
+
+@pytest.fixture
+def make_doctor(ctx, make_department):
+    from app import db
+    from app.models import User, Doctor
+
+    def make(username='doctor1', department=None):
+        department = department or make_department(f'Department of {username}')
+        user = User(username=username, email=f'{username}@hospital.com', role='doctor', is_active=True)
+        user.set_password('password')
+        db.session.add(user)
+        db.session.flush()
+        doctor = Doctor(user_id=user.id, full_name=f'Dr {username}', department_id=department.id)
+        db.session.add(doctor)
+        db.session.commit()
+        return doctor
+    return make
+
+
+@pytest.fixture
+def make_patient(ctx):
+    from app import db
+    from app.models import User, Patient
+
+    def make(username='patient1'):
+        user = User(username=username, email=f'{username}@example.com', role='patient', is_active=True)
+        user.set_password('password')
+        db.session.add(user)
+        db.session.flush()
+        patient = Patient(user_id=user.id, full_name=f'Patient {username}')
+        db.session.add(patient)
+        db.session.commit()
+        return patient
+    return make
+
+
+@pytest.fixture
+def make_appointments(ctx):
+    """Book count appointments between a doctor and a patient, one per slot"""
+    from app import db
+    from app.models import Appointment, Treatment
+
+    def make(doctor, patient, count=1, status='Booked', start=None, with_treatment=False):
+        start = start or date.today() + timedelta(days=1)
+        appointments = []
+        for i in range(count):
+            appointment = Appointment(
+                doctor_id=doctor.id,
+                patient_id=patient.id,
+                appointment_date=start + timedelta(days=i // 8),
+                appointment_time=time(9 + i % 8, 0),
+                status=status
+            )
+            db.session.add(appointment)
+            appointments.append(appointment)
+        db.session.flush()
+        if with_treatment:
+            for appointment in appointments:
+                db.session.add(Treatment(appointment_id=appointment.id, diagnosis='Checked'))
+        db.session.commit()
+        return appointments
+    return make
+
+
+@pytest.fixture
+def count_queries(client):
+    """Run a GET with empty caches and return (response, statements executed)"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app.utils import cache
+
+    def run(url, headers):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        redis_server.connected = True
+        cache.redis_client.client.flushall()
+        if cache._local_cache is not None:
+            cache._local_cache.clear()
+        event.listen(Engine, 'after_cursor_execute', record)
+        try:
+            response = client.get(url, headers=headers)
+        finally:
+            event.remove(Engine, 'after_cursor_execute', record)
+        return response, statements
+    return run
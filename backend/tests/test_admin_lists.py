@@ -0,0 +1,30 @@
+def test_doctor_search_covers_every_page(client, admin_headers, make_department, make_doctor):
+    cardiology = make_department('Cardiology')
+    neurology = make_department('Neurology')
+    for i in range(12):
+        make_doctor(f'heart{i}', department=cardiology)
+    make_doctor('brain', department=neurology)
+
+    response = client.get('/api/admin/doctors?q=neuro', headers=admin_headers)
+    assert [d['full_name'] for d in response.get_json()['doctors']] == ['Dr brain']
+
+    response = client.get('/api/admin/doctors?q=heart&limit=10', headers=admin_headers)
+    body = response.get_json()
+    assert len(body['doctors']) == 10
+    cursor = body['pagination']['next_cursor']
+    response = client.get(f'/api/admin/doctors?q=heart&limit=10&cursor={cursor}', headers=admin_headers)
+    body = response.get_json()
+    assert len(body['doctors']) == 2
+    assert body['pagination']['has_more'] is False
+
+
+def test_patient_search_by_name_phone_and_id(client, admin_headers, make_patient):
+    from app import db
+    alice = make_patient('alice')
+    alice.phone = '5550100'
+    db.session.commit()
+    make_patient('bob')
+
+    for query in ('alice', '0100', str(alice.id)):
+        response = client.get(f'/api/admin/patients?q={query}', headers=admin_headers)
+        assert [p['id'] for p in response.get_json()['patients']] == [alice.id], query
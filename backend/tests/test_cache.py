@@ -0,0 +1,114 @@
+import time
+import pytest
+from conftest import redis_server, auth_headers
+from app import redis_client
+from app.utils import cache
+from app.utils.redis_pool import CLOSED, OPEN
+
+
+def trip_breaker():
+    redis_client.state = OPEN
+    redis_client._opened_at = time.monotonic()
+
+
+def close_breaker():
+    redis_client.state = CLOSED
+    redis_client._consecutive_failures = 0
+
+
+def test_set_cache_many_and_get_cache_many(ctx):
+    cache.set_cache_many({'a': {'n': 1}, 'b': [1, 2]}, timeout=60)
+    assert cache.get_cache_many(['a', 'missing', 'b']) == {'a': {'n': 1}, 'missing': None, 'b': [1, 2]}
+    assert cache.get_cache('a') == {'n': 1}
+    assert 0 < redis_client.ttl('a') <= 60
+
+
+def test_get_cache_many_while_redis_is_down(ctx):
+    cache.set_cache_many({'a': 1}, timeout=60)
+    trip_breaker()
+    assert cache.get_cache_many(['a']) == {'a': None}
+    # Writes are skipped, not queued
+    cache.set_cache_many({'b': 2}, timeout=60)
+    close_breaker()
+    assert cache.get_cache_many(['a', 'b']) == {'a': 1, 'b': None}
+
+
+def test_invalidation_is_deferred_while_the_breaker_is_open(ctx):
+    cache.set_cache('entry', {'body': 'old'}, tags=['department'])
+    trip_breaker()
+
+    cache.invalidate_tags('department')
+    assert cache._pending_tags == {'department'}
+    close_breaker()
+    assert redis_client.exists('entry')
+
+    cache.replay_pending_invalidations()
+    assert not redis_client.exists('entry')
+    assert not redis_client.exists(cache.tag_key('department'))
+    assert cache._pending_tags == set()
+
+
+def test_invalidation_is_deferred_when_redis_drops(ctx):
+    cache.set_cache('entry', {'body': 'old'}, tags=['doctor'])
+    redis_server.connected = False
+    cache.invalidate_tags('doctor')
+    redis_server.connected = True
+    assert cache._pending_tags == {'doctor'}
+
+    # The next invalidation carries the deferred tags with it
+    cache.set_cache('other', {'body': 'old'}, tags=['patient'])
+    cache.invalidate_tags('patient')
+    assert not redis_client.exists('entry')
+    assert not redis_client.exists('other')
+    assert cache._pending_tags == set()
+
+
+def test_cached_view_replays_invalidations_missed_during_an_outage(client, admin_headers, make_department, make_patient):
+    department = make_department('Cardiology')
+    headers = auth_headers(make_patient().user)
+
+    response = client.get('/api/patient/departments', headers=headers)
+    assert response.headers.get('X-Cache') is None
+    response = client.get('/api/patient/departments', headers=headers)
+    assert response.headers.get('X-Cache') == 'HIT'
+
+    redis_server.connected = False
+    response = client.put(f'/api/admin/departments/{department.id}', json={'name': 'Cardiac Care'}, headers=admin_headers)
+    assert response.status_code == 200
+    redis_server.connected = True
+    close_breaker()
+    assert 'department' in cache._pending_tags
+
+    response = client.get('/api/patient/departments', headers=headers)
+    assert response.headers.get('X-Cache') is None
+    assert 'Cardiac Care' in response.get_data(as_text=True)
+
+
+def test_local_tier_hits_are_counted_per_tag(client, make_department, make_patient):
+    make_department()
+    headers = auth_headers(make_patient().user)
+    local_hits = cache.get_local_cache().stats()['hits']
+    for _ in range(3):
+        client.get('/api/patient/departments', headers=headers)
+
+    stats = cache.get_cache_stats()
+    assert stats['tiers']['local']['hits'] == local_hits + 2
+    assert stats['tiers']['redis']['hits'] == 0
+    assert stats['tags']['department']['hits'] == 2
+    assert stats['tags']['department']['misses'] == 1
+
+
+def test_doctor_directory_is_cached_and_invalidated(client, admin_headers, make_doctor, make_patient):
+    doctor = make_doctor()
+    headers = auth_headers(make_patient().user)
+    urls = ['/api/patient/doctors', f'/api/patient/departments/{doctor.department_id}/doctors']
+    for url in urls:
+        client.get(url, headers=headers)
+        assert client.get(url, headers=headers).headers.get('X-Cache') == 'HIT'
+
+    response = client.put(f'/api/admin/doctors/{doctor.id}', json={'full_name': 'Dr Renamed'}, headers=admin_headers)
+    assert response.status_code == 200
+    for url in urls:
+        response = client.get(url, headers=headers)
+        assert response.headers.get('X-Cache') is None
+        assert 'Dr Renamed' in response.get_data(as_text=True)
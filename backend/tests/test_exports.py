@@ -0,0 +1,136 @@
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from flask import current_app
+from app import db, tasks
+from app.models import ExportJob
+from app.utils import exports
+
+
+@pytest.fixture
+def export_dir(ctx):
+    path = current_app.config['EXPORT_DIR']
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        os.remove(os.path.join(path, name))
+    return path
+
+
+@pytest.fixture
+def user_id(ctx):
+    from app.models import User
+    return User.query.filter_by(role='admin').first().id
+
+
+def add_job(user_id, status, age_hours=0, file_name=None, params=None):
+    params = params or {'patient_ids': None}
+    job = ExportJob(
+        user_id=user_id,
+        kind='treatments',
+        params=ExportJob.params_json(params),
+        request_hash=ExportJob.hash_request('treatments', params),
+        status=status,
+        file_name=file_name,
+        created_at=datetime.utcnow() - timedelta(hours=age_hours)
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def touch(export_dir, name, age_hours=0):
+    path = os.path.join(export_dir, name)
+    with open(path, 'w') as f:
+        f.write('data\n')
+    mtime = time.time() - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.mark.parametrize('status', ['Pending', 'Running'])
+def test_in_flight_job_is_reused(user_id, status):
+    job = add_job(user_id, status)
+    assert exports.find_reusable_job(user_id, 'treatments', {'patient_ids': None}).id == job.id
+
+
+def test_finished_job_is_not_reused_by_request(user_id, export_dir):
+    job = add_job(user_id, 'Completed', file_name='treatment_history_bulk_20260101_000000_1.csv')
+    touch(export_dir, job.file_name)
+    assert exports.find_reusable_job(user_id, 'treatments', {'patient_ids': None}) is None
+
+
+def test_identical_export_shares_the_file_by_content_hash(user_id, export_dir, make_doctor, make_patient, make_appointments):
+    make_appointments(make_doctor(), make_patient(), count=3, with_treatment=True)
+    first = add_job(user_id, 'Pending')
+    assert tasks.run_export_job(first.id)['status'] == 'success'
+    second = add_job(user_id, 'Pending')
+    assert tasks.run_export_job(second.id)['status'] == 'success'
+
+    db.session.expire_all()
+    first, second = ExportJob.query.get(first.id), ExportJob.query.get(second.id)
+    assert second.file_name == first.file_name
+    assert second.content_hash == first.content_hash
+    assert os.listdir(export_dir) == [first.file_name]
+
+
+def test_sweep_removes_only_finished_jobs_and_export_files(user_id, export_dir):
+    expired = add_job(user_id, 'Completed', age_hours=48, file_name='treatment_history_bulk_20260101_000000_1.csv')
+    failed = add_job(user_id, 'Failed', age_hours=48)
+    stuck = add_job(user_id, 'Running', age_hours=48)
+    recent = add_job(user_id, 'Completed', file_name='treatment_history_bulk_20260101_000000_4.csv')
+
+    touch(export_dir, expired.file_name, age_hours=48)
+    # Still used by a recent job, e.g. shared through the content hash
+    touch(export_dir, recent.file_name, age_hours=48)
+    touch(export_dir, '.export_99.tmp', age_hours=48)
+    touch(export_dir, 'treatment_history_7_20260101_000000_98.csv', age_hours=48)
+    # Not written by the export runner
+    touch(export_dir, 'treatment_history_1_20251013_081959.csv', age_hours=48)
+    touch(export_dir, 'README.txt', age_hours=48)
+
+    result = exports.sweep_exports()
+
+    assert result == {'jobs_removed': 2, 'jobs_abandoned': 1, 'files_removed': 3}
+    db.session.expire_all()
+    assert ExportJob.query.get(expired.id) is None
+    assert ExportJob.query.get(failed.id) is None
+    assert ExportJob.query.get(stuck.id).status == 'Failed'
+    assert sorted(os.listdir(export_dir)) == sorted([
+        'README.txt', recent.file_name, 'treatment_history_1_20251013_081959.csv'
+    ])
+
+    # The abandoned job goes on the next sweep
+    assert exports.sweep_exports()['jobs_removed'] == 1
+
+
+def test_run_export_job_skips_a_missing_job(ctx):
+    assert tasks.run_export_job(12345) == {'status': 'skipped', 'job_id': 12345}
+
+
+def test_run_export_job_survives_its_job_being_deleted(user_id, monkeypatch):
+    job = add_job(user_id, 'Pending')
+
+    def runner(job):
+        ExportJob.query.filter_by(id=job.id).delete()
+        db.session.commit()
+        raise RuntimeError('export failed')
+
+    monkeypatch.setitem(exports.EXPORT_RUNNERS, 'treatments', runner)
+    result = tasks.run_export_job(job.id)
+    assert result['status'] == 'error'
+    assert result['message'] == 'export failed'
+
+
+def test_job_fails_and_is_logged_when_the_queue_is_down(user_id, monkeypatch, caplog):
+    def broker_down(*args):
+        raise ConnectionError('broker unavailable')
+    monkeypatch.setattr(exports, 'enqueue', broker_down)
+
+    job, created = exports.create_export_job(user_id, 'treatments', {'patient_ids': None})
+
+    assert created
+    assert job.status == 'Failed'
+    assert [(r.name, r.getMessage()) for r in caplog.records] == [
+        ('app.exports', 'Export enqueue error: broker unavailable')
+    ]
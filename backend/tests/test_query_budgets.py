@@ -0,0 +1,61 @@
+import json
+import logging
+import pytest
+from conftest import auth_headers
+from app.models import Appointment, User
+from app.utils import sql_metrics
+from app.utils.sql_metrics import query_budget, QueryBudgetExceeded
+
+
+def test_budgets_are_enforced_in_tests(app):
+    assert app.config['SQL_ENFORCE_BUDGETS'] is True
+
+
+def test_over_budget_view_raises(app):
+    @query_budget(1)
+    def view():
+        User.query.all()
+        User.query.count()
+
+    with app.test_request_context():
+        token = sql_metrics.start_tracking('test')
+        try:
+            with pytest.raises(QueryBudgetExceeded, match='view ran 2 queries, budget is 1'):
+                view()
+        finally:
+            sql_metrics.stop_tracking(token)
+
+
+def test_over_budget_view_only_warns_when_not_enforced(app, monkeypatch, caplog):
+    monkeypatch.setitem(app.config, 'SQL_ENFORCE_BUDGETS', False)
+
+    @query_budget(1)
+    def view():
+        User.query.all()
+        User.query.count()
+        return 'ok'
+
+    with app.test_request_context():
+        token = sql_metrics.start_tracking('test')
+        try:
+            assert view() == 'ok'
+        finally:
+            sql_metrics.stop_tracking(token)
+
+    [record] = [r for r in caplog.records if r.name == 'app.sql']
+    assert record.levelno == logging.WARNING
+    assert json.loads(record.getMessage()) == {
+        'event': 'query_budget_exceeded', 'view': 'view', 'queries': 2, 'budget': 1
+    }
+
+
+def test_n_plus_one_fails_the_request(client, monkeypatch, make_doctor, make_patient, make_appointments):
+    doctor = make_doctor()
+    patient = make_patient()
+    make_appointments(doctor, patient, count=5)
+    headers = auth_headers(patient.user)
+
+    # Without eager loading every row lazy-loads its doctor and patient
+    monkeypatch.setattr(Appointment, 'eager_options', staticmethod(lambda include_details=False: []))
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/api/patient/appointments', headers=headers)
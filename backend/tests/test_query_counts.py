@@ -0,0 +1,51 @@
+"""
+Appointment lists must run the same number of statements whether they
+return one row or many; a difference means a lazy load per row (N+1)
+"""
+import pytest
+from conftest import auth_headers
+
+MANY = 12
+
+
+@pytest.fixture
+def one_and_many(make_department, make_doctor, make_patient, make_appointments):
+    """Two doctor/patient pairs, with one and with MANY completed, treated appointments"""
+    department = make_department()
+    pairs = {}
+    for size in (1, MANY):
+        doctor = make_doctor(f'doctor{size}', department=department)
+        patient = make_patient(f'patient{size}')
+        make_appointments(doctor, patient, count=size, status='Completed', with_treatment=True)
+        pairs[size] = {
+            'doctor': doctor.id,
+            'patient': patient.id,
+            'doctor_headers': auth_headers(doctor.user),
+            'patient_headers': auth_headers(patient.user),
+        }
+    return pairs
+
+
+ROUTES = [
+    ('admin appointments', lambda p, admin: (f"/api/admin/appointments?limit=50&patient_id={p['patient']}", admin)),
+    ('admin appointments detail', lambda p, admin: (f"/api/admin/appointments?limit=50&patient_id={p['patient']}&shape=detail", admin)),
+    ('doctor appointments', lambda p, admin: ('/api/doctor/appointments', p['doctor_headers'])),
+    ('doctor patient history', lambda p, admin: (f"/api/doctor/patients/{p['patient']}/history", p['doctor_headers'])),
+    ('patient appointments', lambda p, admin: ('/api/patient/appointments', p['patient_headers'])),
+    ('patient treatments', lambda p, admin: ('/api/patient/treatments', p['patient_headers'])),
+]
+
+
+@pytest.mark.parametrize('name, route', ROUTES, ids=[name for name, _ in ROUTES])
+def test_statement_count_does_not_grow_with_rows(name, route, one_and_many, admin_headers, count_queries):
+    counts = {}
+    for size, pair in one_and_many.items():
+        url, headers = route(pair, admin_headers)
+        response, statements = count_queries(url, headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        rows = body.get('appointments', body.get('treatments'))
+        assert len(rows) == size
+        counts[size] = len(statements)
+
+    assert counts[1] == counts[MANY], f"{name}: {counts[1]} statements for 1 row, {counts[MANY]} for {MANY}"
@@ -0,0 +1,289 @@
+"""
+Every statement run by every route must use an index. Each route in
+app.url_map is called once against a small seeded database, the SELECT,
+UPDATE and DELETE statements it runs are captured and checked with
+EXPLAIN QUERY PLAN; a "SCAN <table>" step, with or without an index to
+walk, reads every row.
+
+A new route fails test_every_route_is_checked until it is added to
+ROUTES, where listings appear once per filter. A scan that is intended is
+listed in ALLOWED_SCANS for that one statement, with the reason.
+"""
+import os
+import re
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+import pytest
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from conftest import auth_headers
+from app import db
+from app.models import DoctorAvailability, ExportJob, ReminderDelivery
+from app.routes import admin as admin_routes
+from app.utils import exports
+from app.utils.reminder_schedule import REMINDER_TYPE
+
+FULL_SCAN = re.compile(r'^SCAN (\w+?)(?:_\d+)?(?: USING (?:COVERING )?INDEX \w+)?$')
+CHECKED_STATEMENTS = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+Route = namedtuple('Route', 'endpoint method url role json')
+AllowedScan = namedtuple('AllowedScan', 'endpoint table statement reason')
+
+# Endpoints that never query the database
+NO_DATABASE = {
+    'static': 'serves frontend files',
+}
+
+NEXT_WEEK = (date.today() + timedelta(days=7)).isoformat()
+
+ROUTES = [
+    Route('auth.register', 'POST', '/api/auth/register', None, {
+        'username': 'newpatient', 'email': 'new@example.com', 'password': 'password', 'full_name': 'New Patient'
+    }),
+    Route('auth.login', 'POST', '/api/auth/login', None, {'username': 'admin', 'password': 'admin123'}),
+    Route('auth.get_current_user', 'GET', '/api/auth/me', 'patient', None),
+
+    Route('admin.dashboard', 'GET', '/api/admin/dashboard', 'admin', None),
+    Route('admin.cache_stats', 'GET', '/api/admin/cache/stats', 'admin', None),
+    Route('admin.slow_queries', 'GET', '/api/admin/slow-queries', 'admin', None),
+    Route('admin.get_departments', 'GET', '/api/admin/departments', 'admin', None),
+    Route('admin.create_department', 'POST', '/api/admin/departments', 'admin', {'name': 'Neurology'}),
+    Route('admin.update_department', 'PUT', '/api/admin/departments/{department}', 'admin',
+          {'name': 'Cardiology', 'description': 'Heart'}),
+    Route('admin.delete_department', 'DELETE', '/api/admin/departments/{empty_department}', 'admin', None),
+    Route('admin.get_doctors', 'GET', '/api/admin/doctors', 'admin', None),
+    Route('admin.get_doctors', 'GET', '/api/admin/doctors?department_id={department}', 'admin', None),
+    Route('admin.get_doctors', 'GET', '/api/admin/doctors?q=doctor', 'admin', None),
+    Route('admin.create_doctor', 'POST', '/api/admin/doctors', 'admin', {
+        'username': 'doctor3', 'email': 'doctor3@example.com', 'password': 'password',
+        'full_name': 'Dr Three', 'department_id': '{department}'
+    }),
+    Route('admin.get_doctor', 'GET', '/api/admin/doctors/{doctor}', 'admin', None),
+    Route('admin.update_doctor', 'PUT', '/api/admin/doctors/{doctor}', 'admin',
+          {'full_name': 'Dr One', 'email': 'doctor1@example.com', 'department_id': '{department}'}),
+    Route('admin.delete_doctor', 'DELETE', '/api/admin/doctors/{idle_doctor}', 'admin', None),
+    Route('admin.get_patients', 'GET', '/api/admin/patients', 'admin', None),
+    Route('admin.get_patients', 'GET', '/api/admin/patients?q=patient', 'admin', None),
+    Route('admin.get_patient', 'GET', '/api/admin/patients/{patient}', 'admin', None),
+    Route('admin.update_patient', 'PUT', '/api/admin/patients/{patient}', 'admin',
+          {'full_name': 'Patient One', 'email': 'patient1@example.com'}),
+    Route('admin.blacklist_patient', 'POST', '/api/admin/patients/{patient}/blacklist', 'admin', None),
+    Route('admin.get_appointments', 'GET', '/api/admin/appointments', 'admin', None),
+    Route('admin.get_appointments', 'GET', '/api/admin/appointments?status=Booked', 'admin', None),
+    Route('admin.get_appointments', 'GET', '/api/admin/appointments?patient_id={patient}', 'admin', None),
+    Route('admin.get_appointments', 'GET', '/api/admin/appointments?doctor_id={doctor}&shape=detail', 'admin', None),
+    Route('admin.export_treatments', 'GET', '/api/admin/export/treatments?patient_id={patient}', 'admin', None),
+    Route('admin.start_treatment_export', 'POST', '/api/admin/export/treatments/jobs', 'admin',
+          {'patient_ids': ['{patient}']}),
+    Route('admin.get_export_status', 'GET', '/api/admin/export/status/{admin_job}', 'admin', None),
+    Route('admin.download_export', 'GET', '/api/admin/export/download/{admin_job}', 'admin', None),
+    Route('admin.get_dead_reminders', 'GET', '/api/admin/reminders/dead-letter', 'admin', None),
+    Route('admin.retry_reminder', 'POST', '/api/admin/reminders/{delivery}/retry', 'admin', None),
+
+    Route('doctor.dashboard', 'GET', '/api/doctor/dashboard', 'doctor', None),
+    Route('doctor.get_appointments', 'GET', '/api/doctor/appointments', 'doctor', None),
+    Route('doctor.get_appointments', 'GET', '/api/doctor/appointments?upcoming=true', 'doctor', None),
+    Route('doctor.get_appointment', 'GET', '/api/doctor/appointments/{booked}', 'doctor', None),
+    Route('doctor.cancel_appointment', 'POST', '/api/doctor/appointments/{booked}/cancel', 'doctor', None),
+    Route('doctor.complete_appointment', 'POST', '/api/doctor/appointments/{booked}/complete', 'doctor',
+          {'diagnosis': 'Healthy', 'prescription': 'Rest'}),
+    Route('doctor.get_patients', 'GET', '/api/doctor/patients', 'doctor', None),
+    Route('doctor.get_patient_history', 'GET', '/api/doctor/patients/{patient}/history', 'doctor', None),
+    Route('doctor.update_patient_treatment', 'POST', '/api/doctor/patients/{patient}/treatment', 'doctor',
+          {'appointment_id': '{completed}', 'diagnosis': 'Recovered'}),
+    Route('doctor.get_availability', 'GET', '/api/doctor/availability', 'doctor', None),
+    Route('doctor.set_availability', 'POST', '/api/doctor/availability', 'doctor',
+          {'date': NEXT_WEEK, 'start_time': '09:00', 'end_time': '12:00'}),
+    Route('doctor.delete_availability', 'DELETE', '/api/doctor/availability/{availability}', 'doctor', None),
+    Route('doctor.get_profile', 'GET', '/api/doctor/profile', 'doctor', None),
+    Route('doctor.update_profile', 'PUT', '/api/doctor/profile', 'doctor', {'phone': '5550101', 'bio': 'Cardiologist'}),
+
+    Route('patient.dashboard', 'GET', '/api/patient/dashboard', 'patient', None),
+    Route('patient.get_departments', 'GET', '/api/patient/departments', 'patient', None),
+    Route('patient.get_department_doctors', 'GET', '/api/patient/departments/{department}/doctors', 'patient', None),
+    Route('patient.get_doctors', 'GET', '/api/patient/doctors', 'patient', None),
+    Route('patient.get_doctor', 'GET', '/api/patient/doctors/{doctor}', 'patient', None),
+    Route('patient.get_appointments', 'GET', '/api/patient/appointments', 'patient', None),
+    Route('patient.get_appointments', 'GET', '/api/patient/appointments?upcoming=true', 'patient', None),
+    Route('patient.book_appointment', 'POST', '/api/patient/appointments', 'patient',
+          {'doctor_id': '{doctor}', 'appointment_date': NEXT_WEEK, 'appointment_time': '15:00'}),
+    Route('patient.get_appointment', 'GET', '/api/patient/appointments/{booked}', 'patient', None),
+    Route('patient.cancel_appointment', 'POST', '/api/patient/appointments/{booked}/cancel', 'patient', None),
+    Route('patient.reschedule_appointment', 'PUT', '/api/patient/appointments/{booked}/reschedule', 'patient',
+          {'appointment_date': NEXT_WEEK, 'appointment_time': '16:00'}),
+    Route('patient.get_treatment_history', 'GET', '/api/patient/treatments', 'patient', None),
+    Route('patient.get_treatment', 'GET', '/api/patient/treatments/{treatment}', 'patient', None),
+    Route('patient.export_treatments', 'GET', '/api/patient/export/treatments', 'patient', None),
+    Route('patient.start_treatment_export', 'POST', '/api/patient/export/treatments/jobs', 'patient', None),
+    Route('patient.get_export_status', 'GET', '/api/patient/export/status/{patient_job}', 'patient', None),
+    Route('patient.download_export', 'GET', '/api/patient/export/download/{patient_job}', 'patient', None),
+    Route('patient.get_profile', 'GET', '/api/patient/profile', 'patient', None),
+    Route('patient.update_profile', 'PUT', '/api/patient/profile', 'patient', {'phone': '5550102'}),
+]
+
+# Statement prefixes: an unfiltered listing, and a dashboard total
+UNFILTERED = r'^SELECT (?!.* WHERE )'
+COUNT = r'^SELECT count\(\*\) AS count_1 FROM \(SELECT .* FROM '
+
+ALLOWED_SCANS = [
+    AllowedScan('admin.dashboard', 'departments', COUNT + r'departments\) AS anon_1$',
+                'Dashboard total of every row; the response is cached'),
+    AllowedScan('admin.dashboard', 'doctors', COUNT + r'doctors WHERE doctors\.is_available = 1\) AS anon_1$',
+                'Dashboard total, nearly every doctor is available; the response is cached'),
+    AllowedScan('admin.dashboard', 'patients', COUNT + r'patients\) AS anon_1$',
+                'Dashboard total of every row; the response is cached'),
+    AllowedScan('admin.dashboard', 'appointments', COUNT + r'appointments\) AS anon_1$',
+                'Dashboard total of every row; the response is cached'),
+    AllowedScan('admin.get_departments', 'departments', UNFILTERED + r'.* FROM departments$',
+                'The department directory is read whole: a handful of rows'),
+    AllowedScan('patient.get_departments', 'departments', UNFILTERED + r'.* FROM departments$',
+                'The department directory is read whole: a handful of rows, cached'),
+    AllowedScan('patient.dashboard', 'departments', UNFILTERED + r'.* FROM departments$',
+                'The department directory is read whole: a handful of rows, cached'),
+    AllowedScan('patient.get_doctors', 'doctors',
+                r' FROM doctors LEFT OUTER JOIN departments ON doctors\.department_id = departments\.id '
+                r'WHERE doctors\.is_available = 1$',
+                'The doctor directory is read whole, nearly every doctor is available; cached'),
+    AllowedScan('admin.get_doctors', 'doctors', UNFILTERED + r'.* FROM doctors .*ORDER BY doctors\.id ASC LIMIT',
+                'Keyset page walks the primary key and stops after one page'),
+    AllowedScan('admin.get_patients', 'patients', UNFILTERED + r'.* FROM patients ORDER BY patients\.id ASC LIMIT',
+                'Keyset page walks the primary key and stops after one page'),
+    AllowedScan('admin.get_appointments', 'appointments',
+                UNFILTERED + r'.* FROM appointments .*'
+                r'ORDER BY appointments\.appointment_date DESC, appointments\.id DESC LIMIT',
+                'Keyset page walks ix_appointments_appointment_date newest first and stops after one page'),
+    AllowedScan('admin.get_doctors', 'doctors',
+                r'WHERE lower\(doctors\.full_name\) LIKE lower\(\?\) OR lower\(departments\.name\) LIKE lower\(\?\) '
+                r'ORDER BY doctors\.id ASC LIMIT',
+                'Substring search cannot use a b-tree index; it stops after one page of matches'),
+    AllowedScan('admin.get_patients', 'patients',
+                r'WHERE lower\(patients\.full_name\) LIKE lower\(\?\) OR lower\(patients\.phone\) LIKE lower\(\?\) '
+                r'ORDER BY patients\.id ASC LIMIT',
+                'Substring search cannot use a b-tree index; it stops after one page of matches'),
+]
+
+
+@pytest.fixture
+def seeded(make_department, make_doctor, make_patient, make_appointments, monkeypatch):
+    """One of everything the routes act on, and the ids the URLs refer to"""
+    monkeypatch.setattr(admin_routes, 'enqueue', lambda *args: None)
+    monkeypatch.setattr(exports, 'enqueue', lambda *args: None)
+
+    department = make_department()
+    empty_department = make_department('Dermatology')
+    doctor = make_doctor(department=department)
+    idle_doctor = make_doctor('doctor2', department=department)
+    patient = make_patient()
+    completed = make_appointments(doctor, patient, count=3, status='Completed', with_treatment=True,
+                                  start=date.today() - timedelta(days=7))
+    booked = make_appointments(doctor, patient, count=2)
+    availability = DoctorAvailability(doctor_id=doctor.id, date=date.today() + timedelta(days=1),
+                                      start_time=time(9, 0), end_time=time(17, 0))
+    db.session.add(availability)
+    db.session.commit()
+
+    delivery_id, _ = ReminderDelivery.ensure([booked[1].id], REMINDER_TYPE)[booked[1].id]
+    ReminderDelivery.mark(delivery_id, 'Dead', 'mailbox full')
+
+    jobs = {}
+    os.makedirs(current_app.config['EXPORT_DIR'], exist_ok=True)
+    for name, user in (('admin_job', None), ('patient_job', patient.user)):
+        params = {'patient_ids': [patient.id]}
+        job = ExportJob(
+            user_id=user.id if user else 1, kind='treatments', params=ExportJob.params_json(params),
+            request_hash=ExportJob.hash_request('treatments', params), status='Completed',
+            file_name=f'treatment_history_{name}_20260101_000000.csv', completed_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+        with open(os.path.join(current_app.config['EXPORT_DIR'], job.file_name), 'w') as f:
+            f.write('date,diagnosis\n')
+        jobs[name] = job.id
+
+    ids = {
+        'department': department.id,
+        'empty_department': empty_department.id,
+        'doctor': doctor.id,
+        'idle_doctor': idle_doctor.id,
+        'patient': patient.id,
+        'completed': completed[0].id,
+        'booked': booked[0].id,
+        'treatment': completed[0].treatment.id,
+        'availability': availability.id,
+        'delivery': delivery_id,
+        **jobs,
+    }
+    headers = {
+        'doctor': auth_headers(doctor.user),
+        'patient': auth_headers(patient.user),
+    }
+    return ids, headers
+
+
+def fill(value, ids):
+    """Put seeded ids into a URL or JSON body; a whole '{name}' becomes the int id"""
+    if isinstance(value, str):
+        whole = re.fullmatch(r'\{(\w+)\}', value)
+        return ids[whole.group(1)] if whole else value.format(**ids)
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def full_scans(statement, parameters):
+    """Tables the statement reads in full; scans of subquery results don't count"""
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    scanned = {match.group(1) for match in (FULL_SCAN.match(row[3]) for row in plan) if match}
+    return scanned & set(db.metadata.tables)
+
+
+def allowance(endpoint, table, statement):
+    for allowed in ALLOWED_SCANS:
+        if allowed.endpoint == endpoint and allowed.table == table and re.search(allowed.statement, statement):
+            return allowed
+    return None
+
+
+def test_every_route_is_checked(app):
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()}
+    checked = {route.endpoint for route in ROUTES}
+    assert endpoints - checked - set(NO_DATABASE) == set(), 'add the new routes to ROUTES'
+    assert checked - endpoints == set(), 'ROUTES lists routes that no longer exist'
+
+
+def test_allowed_scans_are_for_listed_routes():
+    checked = {route.endpoint for route in ROUTES}
+    assert {allowed.endpoint for allowed in ALLOWED_SCANS} <= checked
+    assert all(allowed.reason for allowed in ALLOWED_SCANS)
+
+
+@pytest.mark.parametrize('route', ROUTES, ids=[f'{route.method} {route.url}' for route in ROUTES])
+def test_route_does_not_scan_tables(client, seeded, admin_headers, route):
+    ids, headers = seeded
+    headers = {'admin': admin_headers, None: {}, **headers}[route.role]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(CHECKED_STATEMENTS):
+            statements.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        response = client.open(fill(route.url, ids), method=route.method, headers=headers,
+                               json=fill(route.json, ids))
+        response.get_data()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    assert response.status_code < 400, response.get_data(as_text=True)
+
+    failures = []
+    for statement, parameters in statements:
+        sql = ' '.join(statement.split())
+        for table in sorted(full_scans(statement, parameters)):
+            if not allowance(route.endpoint, table, sql):
+                failures.append(f"scans {table}: {sql}")
+    assert not failures, '\n'.join(failures)
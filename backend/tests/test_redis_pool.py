@@ -0,0 +1,143 @@
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+from app.utils import redis_pool
+from app.utils.redis_pool import ResilientRedis, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the breaker's cool-down"""
+    now = [1000.0]
+    monkeypatch.setattr(redis_pool.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def breaker(server):
+    client = ResilientRedis('redis://localhost:6379/0', failure_threshold=3, reset_timeout=30)
+    client.client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return client
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        with pytest.raises(RedisConnectionError):
+            breaker.get('key')
+
+
+def test_breaker_opens_after_consecutive_failures(breaker, server, clock):
+    server.connected = False
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    assert breaker.available is False
+
+    # Open: calls fail fast without touching Redis
+    server.connected = True
+    with pytest.raises(CircuitOpenError):
+        breaker.get('key')
+    metrics = breaker.metrics()
+    assert metrics['trips'] == 1
+    assert metrics['failures'] == 3
+    assert metrics['short_circuited'] == 1
+
+
+def test_success_resets_the_failure_count(breaker, server, clock):
+    server.connected = False
+    fail(breaker, 2)
+    server.connected = True
+    breaker.get('key')
+    server.connected = False
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+
+def test_command_errors_do_not_count_as_failures(breaker, clock):
+    breaker.set('key', 'not a number')
+    for _ in range(5):
+        with pytest.raises(ResponseError):
+            breaker.incr('key')
+    assert breaker.state == CLOSED
+
+
+def test_half_open_trial_success_closes(breaker, server, clock):
+    server.connected = False
+    fail(breaker, 3)
+    server.connected = True
+
+    clock[0] += 29
+    assert breaker.available is False
+    clock[0] += 1
+    assert breaker.available is True
+
+    breaker.set('key', 'value')
+    assert breaker.state == CLOSED
+    assert breaker.get('key') == 'value'
+
+
+def test_half_open_trial_failure_reopens(breaker, server, clock):
+    server.connected = False
+    fail(breaker, 3)
+    clock[0] += 30
+
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    assert breaker.metrics()['trips'] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.get('key')
+
+
+def test_half_open_allows_a_single_trial(breaker, server, clock):
+    server.connected = False
+    fail(breaker, 3)
+    clock[0] += 30
+
+    # The first caller becomes the trial; others fail fast until it returns
+    assert breaker._before_call() is True
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.get('key')
+    breaker._record_success(True)
+    assert breaker.state == CLOSED
+
+
+def test_pipeline_goes_through_the_breaker(breaker, server, clock):
+    server.connected = False
+    for _ in range(3):
+        pipe = breaker.pipeline(transaction=False)
+        pipe.set('key', 'value')
+        with pytest.raises(RedisConnectionError):
+            pipe.execute()
+    assert breaker.state == OPEN
+
+
+def test_get_many_and_set_many(breaker):
+    breaker.set_many({'a': '1', 'b': '2'}, 60)
+    assert breaker.get_many(['a', 'missing', 'b']) == ['1', None, '2']
+    assert 0 < breaker.ttl('a') <= 60
+
+
+def test_get_many_and_set_many_are_single_calls(breaker):
+    breaker.set_many({'a': '1', 'b': '2', 'c': '3'}, 60)
+    calls = breaker.calls
+    breaker.get_many(['a', 'b', 'c'])
+    assert breaker.calls == calls + 1
+
+    calls = breaker.calls
+    breaker.set_many({'d': '4', 'e': '5'}, 60)
+    assert breaker.calls == calls + 1
+
+
+def test_get_many_and_set_many_skip_empty_input(breaker):
+    calls = breaker.calls
+    assert breaker.get_many([]) == []
+    breaker.set_many({}, 60)
+    assert breaker.calls == calls
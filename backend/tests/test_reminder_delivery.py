@@ -0,0 +1,190 @@
+import smtplib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import db, tasks
+from app.models import Appointment, ReminderDelivery
+from app.routes import admin as admin_routes
+from app.utils.reminder_schedule import REMINDER_TYPE
+from app.utils.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def outbox(app, monkeypatch):
+    """Point send_email at an SMTP sink that refuses patient2's address"""
+    with SMTPSink(refused_recipients=['patient2@example.com']) as sink:
+        monkeypatch.setattr(tasks, 'EMAIL_HOST', sink.host)
+        monkeypatch.setattr(tasks, 'EMAIL_PORT', sink.port)
+        monkeypatch.setattr(tasks, 'EMAIL_USE_TLS', False)
+        app.extensions.pop('smtp_pool', None)
+        yield sink
+        pool = app.extensions.pop('smtp_pool', None)
+        if pool is not None:
+            pool.close()
+
+
+@pytest.fixture
+def reminder(make_doctor, make_patient, make_appointments):
+    """Make a booked appointment and return the id of its ledger row"""
+    doctor = make_doctor()
+    days = iter(range(1, 100))
+
+    def make(username='patient1'):
+        start = datetime.now().date() + timedelta(days=next(days))
+        appointment = make_appointments(doctor, make_patient(username), start=start)[0]
+        deliveries = ReminderDelivery.ensure([appointment.id], REMINDER_TYPE)
+        return deliveries[appointment.id][0]
+    return make
+
+
+def deliver(delivery_id):
+    return tasks.deliver_reminder.apply(args=(delivery_id,)).get()
+
+
+def delivery(delivery_id):
+    db.session.expire_all()
+    return db.session.get(ReminderDelivery, delivery_id)
+
+
+@contextmanager
+def recording_statements():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'after_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'after_cursor_execute', record)
+
+
+def test_running_a_delivery_twice_sends_once(outbox, reminder):
+    delivery_id = reminder()
+
+    assert deliver(delivery_id) == {'status': 'success', 'delivery_id': delivery_id}
+    assert deliver(delivery_id) == {'status': 'skipped', 'delivery_id': delivery_id}
+
+    assert len(outbox.messages) == 1
+    assert outbox.messages[0]['rcpt_tos'] == ['<patient1@example.com>']
+    row = delivery(delivery_id)
+    assert (row.status, row.attempts) == ('Sent', 1)
+    assert row.sent_at is not None
+
+
+def test_delivery_runs_a_fixed_number_of_statements(outbox, reminder):
+    delivery_id = reminder()
+
+    with recording_statements() as statements:
+        assert deliver(delivery_id)['status'] == 'success'
+
+    # Claim, one joined reminder lookup, mark as sent
+    assert [sql.split()[0] for sql in statements] == ['UPDATE', 'SELECT', 'UPDATE']
+    assert 'JOIN reminder_deliveries' in statements[1]
+
+
+@pytest.mark.parametrize('batches', [1, 3])
+def test_daily_job_statements_grow_with_batches_not_appointments(app, make_doctor, make_patient,
+                                                                 make_appointments, monkeypatch, batches):
+    monkeypatch.setitem(app.config, 'REMINDER_BATCH_SIZE', 8)
+    queued = []
+    monkeypatch.setattr(tasks.deliver_reminder, 'delay', queued.append)
+    for number in range(1, batches + 1):
+        make_appointments(make_doctor(f'doctor{number}'), make_patient(f'patient{number}'),
+                          count=8, start=datetime.now().date())
+
+    with recording_statements() as statements:
+        result = tasks.send_daily_reminders()
+
+    assert (result['status'], result['queued']) == ('success', 8 * batches)
+    assert len(queued) == 8 * batches
+    # Per batch: load ids, read the ledger, insert the missing rows, read it back;
+    # then one last empty load
+    assert len(statements) == 4 * batches + 1
+
+
+def test_send_in_progress_is_taken_over_after_the_lease(app, outbox, reminder):
+    delivery_id = reminder()
+    assert ReminderDelivery.claim(delivery_id, app.config['REMINDER_SEND_LEASE'])
+
+    # Another worker holds the claim
+    assert deliver(delivery_id)['status'] == 'skipped'
+    assert outbox.messages == []
+
+    # ... and died without finishing
+    expired = datetime.utcnow() - timedelta(seconds=app.config['REMINDER_SEND_LEASE'] + 1)
+    db.session.execute(
+        ReminderDelivery.__table__.update().where(ReminderDelivery.id == delivery_id).values(updated_at=expired)
+    )
+    db.session.commit()
+
+    assert deliver(delivery_id)['status'] == 'success'
+    assert len(outbox.messages) == 1
+    row = delivery(delivery_id)
+    assert (row.status, row.attempts) == ('Sent', 2)
+
+
+def test_delivery_is_dead_lettered_after_max_retries(app, outbox, reminder, monkeypatch):
+    monkeypatch.setitem(app.config, 'REMINDER_MAX_RETRIES', 2)
+    delivery_id = reminder('patient2')
+
+    # Eager retries run at once, one after another
+    result = deliver(delivery_id)
+
+    assert result['status'] == 'dead'
+    row = delivery(delivery_id)
+    assert (row.status, row.attempts) == ('Dead', 3)
+    assert '550' in row.last_error
+    assert outbox.messages == []
+
+
+def test_failed_send_is_marked_retrying(app, outbox, reminder, monkeypatch):
+    delivery_id = reminder('patient2')
+    retries = []
+    monkeypatch.setattr(tasks.deliver_reminder, 'retry',
+                        lambda exc, countdown: retries.append(countdown) or exc)
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        tasks.deliver_reminder(delivery_id)
+
+    backoff = app.config['REMINDER_RETRY_BACKOFF']
+    assert backoff <= retries[0] <= 2 * backoff
+    row = delivery(delivery_id)
+    assert (row.status, row.attempts) == ('Retrying', 1)
+
+
+def test_cancelled_appointment_is_skipped(outbox, reminder):
+    delivery_id = reminder()
+    appointment = db.session.get(Appointment, delivery(delivery_id).appointment_id)
+    appointment.status = 'Cancelled'
+    db.session.commit()
+
+    assert deliver(delivery_id)['status'] == 'skipped'
+
+    assert outbox.messages == []
+    assert delivery(delivery_id).status == 'Skipped'
+
+
+def test_admin_lists_and_retries_dead_reminders(client, admin_headers, reminder, monkeypatch):
+    queued = []
+    monkeypatch.setattr(admin_routes, 'enqueue', lambda name, *args: queued.append((name, *args)))
+    dead_id, pending_id = reminder('patient1'), reminder('patient2')
+    ReminderDelivery.mark(dead_id, 'Dead', 'mailbox full')
+
+    response = client.get('/api/admin/reminders/dead-letter', headers=admin_headers)
+    assert response.status_code == 200
+    assert [(r['id'], r['last_error']) for r in response.get_json()['reminders']] == [(dead_id, 'mailbox full')]
+
+    assert client.post(f'/api/admin/reminders/{pending_id}/retry', headers=admin_headers).status_code == 409
+    assert client.post('/api/admin/reminders/999999/retry', headers=admin_headers).status_code == 404
+
+    response = client.post(f'/api/admin/reminders/{dead_id}/retry', headers=admin_headers)
+    assert response.status_code == 202
+    assert response.get_json()['reminder']['status'] == 'Pending'
+    assert queued == [('app.tasks.deliver_reminder', dead_id)]
+    row = delivery(dead_id)
+    assert (row.status, row.attempts) == ('Pending', 0)
+    assert client.get('/api/admin/reminders/dead-letter', headers=admin_headers).get_json()['reminders'] == []
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db, redis_client, tasks
+from app.models import ReminderDelivery
+from app.utils import reminder_schedule
+from app.utils.reminder_schedule import SCHEDULE_KEY, REMINDER_TYPE
+
+
+@pytest.fixture
+def booked(make_doctor, make_patient, make_appointments):
+    """Three booked appointments tomorrow, nothing scheduled yet"""
+    return make_appointments(make_doctor(), make_patient(), count=3)
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Delivery ids passed to deliver_reminder.delay, instead of the broker"""
+    calls = []
+    monkeypatch.setattr(tasks.deliver_reminder, 'delay', calls.append)
+    return calls
+
+
+def scheduled():
+    return {int(member): score for member, score in redis_client.zrange(SCHEDULE_KEY, 0, -1, withscores=True)}
+
+
+def test_schedule_reminder_adds_moves_and_removes(booked):
+    appointment = booked[0]
+    reminder_schedule.schedule_reminder(appointment)
+    due = reminder_schedule.send_at(appointment.appointment_date, appointment.appointment_time)
+    assert scheduled() == {appointment.id: due.timestamp()}
+
+    appointment.appointment_time = appointment.appointment_time.replace(hour=15)
+    db.session.commit()
+    reminder_schedule.schedule_reminder(appointment)
+    assert scheduled()[appointment.id] == due.timestamp() + 6 * 3600
+
+    appointment.status = 'Cancelled'
+    db.session.commit()
+    reminder_schedule.schedule_reminder(appointment)
+    assert scheduled() == {}
+
+
+def test_schedule_errors_are_logged_for_sync_to_repair(booked, monkeypatch, caplog):
+    def redis_error(*args):
+        raise ConnectionError('connection reset')
+    monkeypatch.setattr(redis_client.client, 'zadd', redis_error)
+
+    reminder_schedule.schedule_reminder(booked[0])
+
+    assert [(r.name, r.getMessage()) for r in caplog.records] == [
+        ('app.reminders', 'Reminder schedule error: connection reset')
+    ]
+
+
+def test_pop_due_takes_due_members_once(booked):
+    now = datetime.now()
+    redis_client.zadd(SCHEDULE_KEY, {'1': now.timestamp() - 30, '2': now.timestamp() - 10, '3': now.timestamp() + 60})
+
+    assert reminder_schedule.pop_due(now, 1) == [(1, now.timestamp() - 30)]
+    assert reminder_schedule.pop_due(now, 10) == [(2, now.timestamp() - 10)]
+    assert reminder_schedule.pop_due(now, 10) == []
+    assert list(scheduled()) == [3]
+
+
+def test_dispatch_queues_due_reminders(booked, queued):
+    now = datetime.now()
+    redis_client.zadd(SCHEDULE_KEY, {str(booked[0].id): now.timestamp() - 10,
+                                     str(booked[1].id): now.timestamp() + 3600})
+
+    assert tasks.dispatch_due_reminders() == {'status': 'success', 'queued': 1, 'expired': 0}
+
+    delivery = ReminderDelivery.query.filter_by(appointment_id=booked[0].id).one()
+    assert queued == [delivery.id]
+    assert delivery.status == 'Pending'
+    assert list(scheduled()) == [booked[1].id]
+
+
+def test_dispatch_restores_popped_reminders_when_enqueueing_fails(booked, monkeypatch):
+    def broker_down(deliveries):
+        raise ConnectionError('broker unavailable')
+    monkeypatch.setattr(tasks, 'dispatch_deliveries', broker_down)
+    due = datetime.now().timestamp() - 10
+    redis_client.zadd(SCHEDULE_KEY, {str(booked[0].id): due})
+
+    result = tasks.dispatch_due_reminders()
+
+    assert result['status'] == 'error'
+    assert scheduled() == {booked[0].id: due}
+
+
+def test_sync_backfills_appointments_missing_from_the_schedule(booked, make_appointments):
+    yesterday = datetime.now().date() - timedelta(days=1)
+    make_appointments(booked[0].doctor, booked[0].patient, count=1, start=yesterday)
+    make_appointments(booked[0].doctor, booked[0].patient, count=1, status='Cancelled',
+                      start=datetime.now().date() + timedelta(days=2))
+
+    assert reminder_schedule.sync_schedule() == 3
+    assert scheduled() == {
+        appointment.id: reminder_schedule.send_at(
+            appointment.appointment_date, appointment.appointment_time
+        ).timestamp()
+        for appointment in booked
+    }
+
+
+@pytest.mark.parametrize('status', ['Pending', 'Sending', 'Retrying', 'Sent', 'Dead'])
+def test_sync_leaves_dispatched_reminders_alone(booked, status):
+    deliveries = ReminderDelivery.ensure([booked[0].id], REMINDER_TYPE)
+    ReminderDelivery.mark(deliveries[booked[0].id][0], status)
+
+    assert reminder_schedule.sync_schedule() == 2
+    assert set(scheduled()) == {booked[1].id, booked[2].id}
+
+
+def test_sync_does_not_requeue_a_reminder_dispatch_just_queued(booked, queued):
+    redis_client.zadd(SCHEDULE_KEY, {str(booked[0].id): datetime.now().timestamp() - 10})
+    tasks.dispatch_due_reminders()
+    assert len(queued) == 1
+
+    tasks.sync_reminder_schedule()
+    tasks.dispatch_due_reminders()
+
+    assert booked[0].id not in scheduled()
+    assert len(queued) == 1
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine, insert
+from conftest import auth_headers
+from app import db
+from app.models import Department, Patient
+from app.utils.replica import REPLICA_BIND
+
+
+@pytest.fixture
+def lagging_replica(app, tmp_path, ctx):
+    """A replica bind whose rows are out of date"""
+    engine = create_engine('sqlite:///' + str(tmp_path / 'replica.db'))
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Department.__table__).values(name='Stale Name'))
+        conn.execute(insert(Patient.__table__).values(user_id=999, full_name='Stale Patient'))
+    db.engines[REPLICA_BIND] = engine
+    yield engine
+    del db.engines[REPLICA_BIND]
+    engine.dispose()
+
+
+def test_read_replica_view_reads_the_replica(client, lagging_replica, admin_headers, make_patient):
+    make_patient()
+    response = client.get('/api/admin/patients', headers=admin_headers)
+    assert [p['full_name'] for p in response.get_json()['patients']] == ['Stale Patient']
+
+
+def test_cache_rebuilds_read_the_primary(client, lagging_replica, make_department, make_patient):
+    make_department('Fresh Name')
+    headers = auth_headers(make_patient().user)
+
+    response = client.get('/api/patient/departments', headers=headers)
+    assert response.headers.get('X-Cache') is None
+    body = response.get_data(as_text=True)
+    assert 'Fresh Name' in body
+    assert 'Stale Name' not in body
+
+
+def test_recent_write_errors_are_logged(ctx, monkeypatch, caplog):
+    from app import redis_client
+    from app.utils.replica import mark_recent_write, recently_wrote
+
+    def redis_error(*args):
+        raise ConnectionError('connection reset')
+    monkeypatch.setattr(redis_client.client, 'setex', redis_error)
+    monkeypatch.setattr(redis_client.client, 'exists', redis_error)
+
+    mark_recent_write(1)
+    # Unknown means the user may have written, so they read the primary
+    assert recently_wrote(1) is True
+    assert [(r.name, r.getMessage()) for r in caplog.records] == [
+        ('app.replica', 'Recent write mark error: connection reset'),
+        ('app.replica', 'Recent write check error: connection reset'),
+    ]
@@ -0,0 +1,31 @@
+import json
+from datetime import date, timedelta
+from app.models import Appointment
+from app.utils.serializers import APPOINTMENT_SHAPES
+
+
+def test_appointment_detail_shape_matches_to_dict(ctx, make_doctor, make_patient, make_appointments):
+    doctor = make_doctor()
+    patient = make_patient()
+    make_appointments(doctor, patient, count=2, status='Completed', with_treatment=True,
+                      start=date.today() - timedelta(days=3))
+    make_appointments(doctor, patient, count=2)
+
+    shape = APPOINTMENT_SHAPES['detail']
+    rows = shape.query().order_by(Appointment.id).all()
+    expected = [
+        appointment.to_dict(include_details=True)
+        for appointment in Appointment.query.order_by(Appointment.id)
+    ]
+    assert ['treatment' in data for data in expected] == [True, True, False, False]
+
+    assert [json.loads(shape.encode(row)) for row in rows] == expected
+    assert shape.serialize_many(rows) == expected
+    assert json.loads(shape.encode_many(rows)) == expected
+
+
+def test_appointment_summary_shape_renders_missing_treatment_as_null(ctx, make_doctor, make_patient, make_appointments):
+    make_appointments(make_doctor(), make_patient())
+    row = APPOINTMENT_SHAPES['summary'].query().one()
+    assert json.loads(APPOINTMENT_SHAPES['summary'].encode(row))['treatment'] is None
+    assert APPOINTMENT_SHAPES['summary'].serialize(row)['treatment'] is None
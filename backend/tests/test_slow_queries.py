@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+import pytest
+from app import db
+from app.models import Department
+from app.utils import slow_queries
+from config.config import optional_float
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    """Treat every statement as slow, and start from an empty buffer"""
+    monkeypatch.setattr(slow_queries, '_threshold', 0)
+    slow_queries._recent.clear()
+    yield
+    slow_queries._recent.clear()
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, 100.0), ('250', 250.0), ('0', 0.0), ('off', None), ('OFF', None), ('', None), ('none', None)
+])
+def test_threshold_can_be_turned_off(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv('SLOW_QUERY_THRESHOLD_MS', raising=False)
+    else:
+        monkeypatch.setenv('SLOW_QUERY_THRESHOLD_MS', value)
+    assert optional_float('SLOW_QUERY_THRESHOLD_MS', 100) == expected
+
+
+def test_init_app_turns_the_log_off(app, monkeypatch):
+    monkeypatch.setattr(slow_queries, '_threshold', 100)
+    monkeypatch.setitem(app.config, 'SLOW_QUERY_THRESHOLD_MS', None)
+    slow_queries.init_app(app)
+    assert slow_queries._threshold is None
+
+
+def test_slow_statement_in_a_request_is_logged_and_the_write_commits(client, admin_headers, log_everything):
+    response = client.post('/api/admin/departments', json={'name': 'Neurology'}, headers=admin_headers)
+
+    entries = slow_queries.get_slow_queries()
+    assert response.status_code == 201
+    assert Department.query.filter_by(name='Neurology').count() == 1
+    select = next(entry for entry in entries if 'FROM departments WHERE departments.name' in entry['sql'])
+    assert select['source'] == 'POST /api/admin/departments'
+    assert select['params'][0] == 'str'
+    assert 'SEARCH departments' in ' '.join(select['plan'])
+    assert any(entry['sql'].startswith('INSERT INTO departments') and entry['plan'] is None for entry in entries)
+
+
+def test_explain_inside_a_write_transaction_keeps_it(ctx, log_everything):
+    db.session.add(Department(name='Neurology'))
+    db.session.flush()
+    connection = db.session.connection()
+    assert connection.connection.in_transaction
+
+    Department.query.filter_by(name='Neurology').one()
+    # A statement SQLite cannot plan fails without touching the transaction
+    assert slow_queries._explain(connection, 'SELECT * FROM missing_table', ())[0].startswith('EXPLAIN failed')
+    assert connection.connection.in_transaction
+
+    db.session.add(Department(name='Oncology'))
+    db.session.commit()
+    db.session.remove()
+    assert {d.name for d in Department.query.all()} == {'Neurology', 'Oncology'}
+    lookup = next(entry for entry in slow_queries.get_slow_queries() if 'WHERE departments.name' in entry['sql'])
+    assert 'SEARCH departments' in ' '.join(lookup['plan'])
+
+
+def test_other_databases_are_not_explained_on_the_callers_connection():
+    def cursor():
+        raise AssertionError('EXPLAIN ran inside the caller\'s transaction')
+    conn = SimpleNamespace(dialect=SimpleNamespace(name='postgresql'),
+                           connection=SimpleNamespace(cursor=cursor))
+
+    assert slow_queries._explain(conn, 'SELECT 1', ()) is None
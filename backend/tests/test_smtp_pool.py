@@ -0,0 +1,182 @@
+import time
+import smtplib
+import threading
+import pytest
+from email.message import EmailMessage
+from app import tasks
+from app.utils.smtp_pool import SMTPPool, SMTPPoolExhausted
+from app.utils.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def sink():
+    with SMTPSink() as sink:
+        yield sink
+
+
+def make_pool(sink, **options):
+    return SMTPPool(sink.host, sink.port, 'user', 'secret', use_tls=False, **options)
+
+
+def message(number):
+    msg = EmailMessage()
+    msg['From'] = 'hospital@test.local'
+    msg['To'] = f'patient{number}@test.local'
+    msg['Subject'] = f'Reminder {number}'
+    msg.set_content('See you tomorrow')
+    return msg
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_sequential_sends_reuse_one_session(sink):
+    pool = make_pool(sink)
+    for number in range(20):
+        pool.send_message(message(number))
+    pool.close()
+
+    assert pool.metrics() == {
+        'idle': 0, 'max_sessions': 4, 'connects': 1, 'reuses': 19, 'reconnects': 0, 'sent': 20
+    }
+    assert sink.connections == 1
+    assert [m['rcpt_tos'] for m in sink.messages] == [[f'<patient{n}@test.local>'] for n in range(20)]
+
+
+def test_session_retired_after_max_messages(sink):
+    pool = make_pool(sink, max_messages=5)
+    for number in range(12):
+        pool.send_message(message(number))
+    pool.close()
+
+    assert pool.metrics()['connects'] == 3
+    assert sink.connections == 3
+    assert len(sink.messages) == 12
+
+
+def test_idle_session_past_timeout_is_replaced(sink):
+    pool = make_pool(sink, idle_timeout=0)
+    pool.send_message(message(1))
+    pool.send_message(message(2))
+    pool.close()
+
+    assert pool.metrics()['connects'] == 2
+    assert pool.metrics()['reuses'] == 0
+
+
+def test_reconnects_after_server_drops_idle_session(sink):
+    pool = make_pool(sink)
+    pool.send_message(message(1))
+    sink.drop_connections()
+    wait_for(lambda: sink.open_connections == 0)
+
+    pool.send_message(message(2))
+    pool.close()
+
+    metrics = pool.metrics()
+    assert metrics['reconnects'] == 1
+    assert metrics['connects'] == 2
+    assert metrics['sent'] == 2
+    assert sink.connections == 2
+    assert [m['message']['Subject'] for m in sink.messages] == ['Reminder 1', 'Reminder 2']
+
+
+def test_failed_fresh_connection_is_not_retried(sink):
+    pool = make_pool(sink)
+    sink.stop()
+
+    with pytest.raises(OSError):
+        pool.send_message(message(1))
+    assert pool.metrics()['reconnects'] == 0
+
+
+def test_refused_recipient_is_not_retried_and_keeps_the_session():
+    with SMTPSink(refused_recipients=['patient2@test.local']) as sink:
+        pool = make_pool(sink)
+        pool.send_message(message(1))
+
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            pool.send_message(message(2))
+        assert pool.metrics()['idle'] == 1
+
+        pool.send_message(message(3))
+        pool.close()
+
+    metrics = pool.metrics()
+    assert metrics['connects'] == 1
+    assert metrics['reconnects'] == 0
+    assert metrics['sent'] == 2
+    assert sink.connections == 1
+    assert [m['message']['Subject'] for m in sink.messages] == ['Reminder 1', 'Reminder 3']
+
+
+def test_concurrent_senders_share_at_most_max_sessions():
+    # A slow server keeps sessions busy, so senders have to queue for them
+    with SMTPSink(on_message=lambda message: time.sleep(0.005)) as sink:
+        pool = make_pool(sink, max_sessions=3)
+        errors = []
+
+        def send(offset):
+            try:
+                for number in range(offset, offset + 10):
+                    pool.send_message(message(number))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=send, args=(i * 10,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        pool.close()
+
+    assert errors == []
+    assert len(sink.messages) == 80
+    assert sink.max_open <= 3
+    assert pool.metrics()['connects'] == sink.connections <= 3
+    assert pool.metrics()['sent'] == 80
+
+
+def test_sender_gives_up_when_every_session_is_busy():
+    release = threading.Event()
+    with SMTPSink(on_message=lambda message: release.wait(5)) as sink:
+        pool = make_pool(sink, max_sessions=1, acquire_timeout=0.05)
+        holder = threading.Thread(target=pool.send_message, args=(message(1),))
+        holder.start()
+        wait_for(lambda: sink.open_connections == 1)
+
+        with pytest.raises(SMTPPoolExhausted):
+            pool.send_message(message(2))
+
+        release.set()
+        holder.join()
+        pool.send_message(message(3))
+        pool.close()
+
+    assert [m['message']['Subject'] for m in sink.messages] == ['Reminder 1', 'Reminder 3']
+    assert sink.connections == 1
+
+
+def test_send_email_goes_through_the_app_pool(app, sink, monkeypatch):
+    monkeypatch.setattr(tasks, 'EMAIL_HOST', sink.host)
+    monkeypatch.setattr(tasks, 'EMAIL_PORT', sink.port)
+    monkeypatch.setattr(tasks, 'EMAIL_USE_TLS', False)
+    app.extensions.pop('smtp_pool', None)
+    try:
+        with app.app_context():
+            for number in range(3):
+                assert tasks.send_email(f'patient{number}@test.local', 'Reminder', '<p>Hi</p>',
+                                        text_content='Hi')
+            pool = tasks.get_smtp_pool()
+            pool.close()
+    finally:
+        app.extensions.pop('smtp_pool', None)
+
+    assert pool.metrics()['connects'] == 1
+    assert pool.metrics()['reuses'] == 2
+    assert sink.connections == 1
+    assert len(sink.messages) == 3
@@ -0,0 +1,43 @@
+import json
+import logging
+from datetime import datetime
+import pytest
+from app import tasks
+from app.utils import sql_metrics
+
+
+@pytest.fixture
+def sql_log(caplog):
+    """sql_metrics log lines, at every level"""
+    caplog.set_level(logging.INFO, logger='app.sql')
+
+    def lines():
+        return [(r.levelname, json.loads(r.getMessage())) for r in caplog.records if r.name == 'app.sql']
+    return lines
+
+
+def test_celery_task_stats_are_logged_per_task(sql_log):
+    tasks.send_daily_reminders.apply().get()
+
+    [(level, data)] = sql_log()
+    assert level == 'INFO'
+    assert data['event'] == 'sql_metrics'
+    assert data['label'] == 'app.tasks.send_daily_reminders'
+    assert data['queries'] == 1
+    assert data['repeated'] == {}
+    assert sql_metrics.current_stats() is None
+
+
+def test_repeated_statements_in_a_task_log_a_warning(app, sql_log, monkeypatch, make_doctor, make_patient,
+                                                     make_appointments):
+    monkeypatch.setitem(app.config, 'REMINDER_BATCH_SIZE', 1)
+    monkeypatch.setattr(tasks.deliver_reminder, 'delay', lambda delivery_id: None)
+    make_appointments(make_doctor(), make_patient(), count=5, start=datetime.now().date())
+
+    tasks.send_daily_reminders.apply().get()
+
+    [(level, data)] = sql_log()
+    assert level == 'WARNING'
+    assert data['label'] == 'app.tasks.send_daily_reminders'
+    # The id load runs once per batch of one, plus the final empty one
+    assert 6 in data['repeated'].values()
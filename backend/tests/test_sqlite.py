@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from app.utils import sqlite as sqlite_utils
+from app.utils.sqlite import RetryingConnection, sqlite_engine_options, apply_sqlite_pragmas
+from config.config import Config
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'busy.db')
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)')
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry backoffs instead of sleeping"""
+    calls = []
+    monkeypatch.setattr(sqlite_utils.time, 'sleep', lambda seconds: calls.append(seconds))
+    return calls
+
+
+def connect(path, timeout=0.01):
+    """Connection configured like the app's; use .cursor(), as SQLAlchemy does,
+    since Connection.execute bypasses the retrying cursor"""
+    options = sqlite_engine_options(Config.__dict__)['connect_args']
+    return sqlite3.connect(path, **{**options, 'timeout': timeout}, check_same_thread=False)
+
+
+def test_first_write_opens_an_immediate_transaction(path):
+    conn = connect(path)
+    conn.execute('SELECT count(*) FROM items').fetchone()
+    assert not conn.in_transaction
+
+    conn.execute('INSERT INTO items (value) VALUES (1)')
+    assert conn.in_transaction
+
+    # Holding the write lock from BEGIN IMMEDIATE keeps other writers out
+    other = connect(path)
+    with pytest.raises(sqlite3.OperationalError, match='locked'):
+        other.execute('BEGIN IMMEDIATE')
+    conn.commit()
+
+
+def test_write_outside_a_transaction_is_retried_until_the_lock_frees(path):
+    holder = connect(path)
+    holder.execute('INSERT INTO items (value) VALUES (1)')
+    threading.Timer(0.1, holder.commit).start()
+
+    writer = connect(path)
+    writer.retries = 10
+    writer.cursor().execute('INSERT INTO items (value) VALUES (2)')
+    writer.commit()
+    assert writer.cursor().execute('SELECT count(*) FROM items').fetchone()[0] == 2
+
+
+def test_statement_inside_a_transaction_is_not_retried(path, sleeps):
+    reader = connect(path)
+    cursor = reader.cursor()
+    cursor.execute('BEGIN')
+    cursor.execute('SELECT count(*) FROM items').fetchone()
+
+    writer = connect(path)
+    writer.execute('INSERT INTO items (value) VALUES (1)')
+    writer.commit()
+
+    # The reader's snapshot is stale: no retry can make this write succeed
+    with pytest.raises(sqlite3.OperationalError):
+        cursor.execute('INSERT INTO items (value) VALUES (2)')
+    assert sleeps == []
+    reader.rollback()
+
+
+def test_concurrent_read_then_write_units_of_work(path):
+    config = {**Config.__dict__, 'SQLITE_BUSY_RETRIES': 10}
+    engine = create_engine('sqlite:///' + path, **sqlite_engine_options(config))
+    apply_sqlite_pragmas(engine, Config.SQLITE_PRAGMAS)
+    errors = []
+
+    def work():
+        for _ in range(25):
+            try:
+                with engine.begin() as conn:
+                    count = conn.execute(text('SELECT count(*) FROM items')).scalar()
+                    conn.execute(text('INSERT INTO items (value) VALUES (:value)'), {'value': count})
+                    conn.execute(text('UPDATE items SET value = value + 1 WHERE id = 1'))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT count(*) FROM items')).scalar() == 150
+    engine.dispose()
@@ -0,0 +1,115 @@
+import pytest
+from kombu import Consumer
+from app import tasks
+from app.celery_app import celery
+from config.config import Config
+from worker import worker_argv
+
+REMINDER_TASKS = ['app.tasks.deliver_reminder', 'app.tasks.dispatch_due_reminders', 'app.tasks.send_daily_reminders']
+BULK_TASKS = ['app.tasks.send_monthly_reports', 'app.tasks.send_monthly_report_batch',
+              'app.tasks.summarize_monthly_reports', 'app.tasks.sync_reminder_schedule']
+BACKLOG = 500
+
+
+@pytest.fixture
+def broker():
+    """A connection to the in-memory broker, with every queue empty"""
+    with celery.connection_for_write() as connection:
+        channel = connection.default_channel
+
+        def purge():
+            for queue in celery.amqp.queues.values():
+                queue(channel).declare()
+                queue(channel).purge()
+        purge()
+        yield connection
+        purge()
+
+
+def route(name):
+    return celery.amqp.router.route({}, name)['queue'].name
+
+
+def queue_size(connection, name):
+    return connection.default_channel.queue_declare(queue=name, passive=True).message_count
+
+
+def enqueue_backlog(connection, **options):
+    """BACKLOG monthly report batches, then reminders for 20 appointments"""
+    with celery.producer_or_acquire() as producer:
+        for number in range(BACKLOG):
+            tasks.send_monthly_report_batch.apply_async(
+                args=('October 2026', [{'doctor_id': number}]), producer=producer, **options
+            )
+        for delivery_id in range(20):
+            tasks.deliver_reminder.apply_async(args=(delivery_id,), producer=producer, **options)
+
+
+def drain(connection, queues, limit=None):
+    """Task names in the order a worker consuming queues receives them"""
+    received = []
+
+    def on_message(body, message):
+        received.append(message.headers['task'])
+        message.ack()
+
+    consumer = Consumer(
+        connection.default_channel,
+        queues=[celery.amqp.queues[name] for name in queues],
+        callbacks=[on_message],
+        accept=['json']
+    )
+    with consumer:
+        while limit is None or len(received) < limit:
+            try:
+                connection.drain_events(timeout=0.1)
+            except TimeoutError:
+                break
+    return received
+
+
+def test_routes_keep_reminders_off_the_bulk_queue():
+    assert {name: route(name) for name in REMINDER_TASKS} == dict.fromkeys(REMINDER_TASKS, 'realtime')
+    assert {name: route(name) for name in BULK_TASKS} == dict.fromkeys(BULK_TASKS, 'bulk')
+    assert route('app.tasks.run_export_job') == 'exports'
+    assert route('app.tasks.unrouted') == Config.task_default_queue
+
+
+def test_every_routed_queue_has_a_worker_profile():
+    consumed = {queue for name, profile in Config.WORKER_PROFILES.items() if name != 'all'
+                for queue in profile['queues']}
+    assert {route['queue'] for route in Config.task_routes.values()} <= consumed
+    assert Config.task_default_queue in Config.WORKER_PROFILES['realtime']['queues']
+    assert 'bulk' not in Config.WORKER_PROFILES['realtime']['queues']
+
+
+def test_realtime_worker_drains_reminders_behind_a_bulk_backlog(broker):
+    enqueue_backlog(broker)
+    assert queue_size(broker, 'bulk') == BACKLOG
+    assert queue_size(broker, 'realtime') == 20
+
+    received = drain(broker, Config.WORKER_PROFILES['realtime']['queues'])
+
+    assert received == ['app.tasks.deliver_reminder'] * 20
+    assert queue_size(broker, 'bulk') == BACKLOG
+
+
+def test_shared_queue_puts_reminders_behind_the_backlog(broker):
+    # What routing prevents: with one queue, reminders wait for every report batch
+    enqueue_backlog(broker, queue=Config.task_default_queue)
+
+    received = drain(broker, [Config.task_default_queue], limit=BACKLOG)
+
+    assert received == ['app.tasks.send_monthly_report_batch'] * BACKLOG
+    assert queue_size(broker, Config.task_default_queue) == 20
+
+
+def test_worker_argv_consumes_the_profile_queues():
+    argv = worker_argv('realtime', Config.WORKER_PROFILES['realtime'])
+    assert argv[argv.index('--queues') + 1] == 'realtime,default'
+    assert argv[argv.index('--pool') + 1] == 'threads'
+
+    argv = worker_argv('bulk', Config.WORKER_PROFILES['bulk'], pool='solo', concurrency=2)
+    assert argv[argv.index('--queues') + 1] == 'bulk'
+    assert argv[argv.index('--pool') + 1] == 'solo'
+    assert argv[argv.index('--concurrency') + 1] == '2'
@@ -0,0 +1,63 @@
+"""
+Start a Celery worker for one of the profiles in Config.WORKER_PROFILES
+
+    python worker.py realtime
+    python worker.py bulk --concurrency 8
+    python worker.py realtime --pool gevent -- --without-heartbeat
+
+Arguments after -- are passed to the celery worker unchanged.
+"""
+import argparse
+import sys
+from config.config import Config
+
+
+def worker_argv(name, profile, pool=None, concurrency=None, loglevel='info'):
+    """celery worker arguments for a profile, with optional overrides"""
+    argv = [
+        'worker',
+        '--hostname', f'{name}@%h',
+        '--queues', ','.join(profile['queues']),
+        '--pool', pool or profile['pool'],
+        '--prefetch-multiplier', str(profile['prefetch_multiplier']),
+        '--loglevel', loglevel
+    ]
+    concurrency = concurrency or profile['concurrency']
+    if concurrency:
+        argv += ['--concurrency', str(concurrency)]
+    return argv
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    extra = []
+    if '--' in args:
+        split = args.index('--')
+        args, extra = args[:split], args[split + 1:]
+
+    parser = argparse.ArgumentParser(description='Start a Celery worker by profile')
+    parser.add_argument('profile', choices=sorted(Config.WORKER_PROFILES))
+    parser.add_argument('--pool', help='Override the profile pool, e.g. gevent for email workers')
+    parser.add_argument('--concurrency', type=int, help='Override the profile concurrency')
+    parser.add_argument('--loglevel', default='info')
+    parser.add_argument('--dry-run', action='store_true', help='Print the worker arguments and exit')
+    options = parser.parse_args(args)
+
+    argv = worker_argv(
+        options.profile,
+        Config.WORKER_PROFILES[options.profile],
+        pool=options.pool,
+        concurrency=options.concurrency,
+        loglevel=options.loglevel
+    ) + extra
+
+    if options.dry_run:
+        print('celery -A app.celery_app ' + ' '.join(argv))
+        return
+
+    from app.celery_app import celery
+    celery.worker_main(argv=argv)
+
+
+if __name__ == '__main__':
+    main()
@@ -94,7 +94,7 @@ const AdminDashboard = {
                                 </tr>
                             </thead>
                             <tbody>
-                                <tr v-for="doctor in filteredDoctors" :key="doctor.id">
+                                <tr v-for="doctor in doctors" :key="doctor.id">
                                     <td>{{ doctor.full_name }}</td>
                                     <td>{{ doctor.department_name }}</td>
                                     <td>{{ doctor.qualification || 'N/A' }}</td>
@@ -124,6 +124,11 @@ const AdminDashboard = {
                                 </tr>
                             </tbody>
                         </table>
+                        <div class="text-center mb-3" v-if="doctorsCursor">
+                            <button class="btn btn-outline-primary" @click="loadMoreDoctors">
+                                Load more
+                            </button>
+                        </div>
                     </div>
                 </div>
 
@@ -151,7 +156,7 @@ const AdminDashboard = {
                                 </tr>
                             </thead>
                             <tbody>
-                                <tr v-for="patient in filteredPatients" :key="patient.id">
+                                <tr v-for="patient in patients" :key="patient.id">
                                     <td>{{ patient.full_name }}</td>
                                     <td>{{ patient.phone || 'N/A' }}</td>
                                     <td>{{ patient.gender || 'N/A' }}</td>
@@ -172,6 +177,11 @@ const AdminDashboard = {
                                 </tr>
                             </tbody>
                         </table>
+                        <div class="text-center mb-3" v-if="patientsCursor">
+                            <button class="btn btn-outline-primary" @click="loadMorePatients">
+                                Load more
+                            </button>
+                        </div>
                     </div>
                 </div>
 
@@ -221,6 +231,11 @@ const AdminDashboard = {
                                 </tr>
                             </tbody>
                         </table>
+                        <div class="text-center mb-3" v-if="appointmentsCursor">
+                            <button class="btn btn-outline-primary" @click="loadMoreAppointments">
+                                Load more
+                            </button>
+                        </div>
                     </div>
                 </div>
 
@@ -398,6 +413,11 @@ const AdminDashboard = {
                                     </tr>
                                 </tbody>
                             </table>
+                            <div class="text-center" v-if="patientAppointmentsCursor">
+                                <button class="btn btn-outline-primary" @click="loadMorePatientHistory">
+                                    Load older visits
+                                </button>
+                            </div>
                         </div>
                     </div>
                 </div>
@@ -422,6 +442,13 @@ const AdminDashboard = {
             doctors: [],
             patients: [],
             appointments: [],
+            // Keyset pagination cursors, null once the last page is loaded
+            doctorsCursor: null,
+            patientsCursor: null,
+            appointmentsCursor: null,
+            patientAppointmentsCursor: null,
+            // Pending debounced search request
+            searchTimer: null,
             departments: [],
             patientAppointments: [],
             selectedPatient: null,
@@ -449,26 +476,6 @@ const AdminDashboard = {
         };
     },
 
-    computed: {
-        filteredDoctors() {
-            if (!this.searchQuery) return this.doctors;
-            const query = this.searchQuery.toLowerCase();
-            return this.doctors.filter(d =>
-                d.full_name.toLowerCase().includes(query) ||
-                d.department_name?.toLowerCase().includes(query)
-            );
-        },
-
-        filteredPatients() {
-            if (!this.searchQuery) return this.patients;
-            const query = this.searchQuery.toLowerCase();
-            return this.patients.filter(p =>
-                p.full_name.toLowerCase().includes(query) ||
-                p.phone?.toLowerCase().includes(query)
-            );
-        }
-    },
-
     mounted() {
         this.loadDashboard();
     },
@@ -480,14 +487,16 @@ const AdminDashboard = {
 
                 const [dashboardRes, doctorsRes, patientsRes, deptsRes] = await Promise.all([
                     API.admin.getDashboard(),
-                    API.admin.getDoctors(),
-                    API.admin.getPatients(),
+                    API.admin.getDoctors(this.searchParams()),
+                    API.admin.getPatients(this.searchParams()),
                     API.admin.getDepartments()
                 ]);
 
                 this.stats = dashboardRes.data;
                 this.doctors = doctorsRes.data.doctors;
+                this.doctorsCursor = doctorsRes.data.pagination.next_cursor;
                 this.patients = patientsRes.data.patients;
+                this.patientsCursor = patientsRes.data.pagination.next_cursor;
                 this.departments = deptsRes.data.departments;
 
                 await this.loadAppointments();
@@ -504,6 +513,62 @@ const AdminDashboard = {
                 const params = this.appointmentFilter ? { status: this.appointmentFilter } : {};
                 const response = await API.admin.getAppointments(params);
                 this.appointments = response.data.appointments;
+                this.appointmentsCursor = response.data.pagination.next_cursor;
+            } catch (error) {
+                this.$root.showToast('Failed to load appointments', 'error');
+            }
+        },
+
+        // Search runs on the server so it covers every row, not just the loaded pages
+        searchParams(cursor = null) {
+            const params = {};
+            if (this.searchQuery.trim()) params.q = this.searchQuery.trim();
+            if (cursor) params.cursor = cursor;
+            return params;
+        },
+
+        async search() {
+            try {
+                const [doctorsRes, patientsRes] = await Promise.all([
+                    API.admin.getDoctors(this.searchParams()),
+                    API.admin.getPatients(this.searchParams())
+                ]);
+                this.doctors = doctorsRes.data.doctors;
+                this.doctorsCursor = doctorsRes.data.pagination.next_cursor;
+                this.patients = patientsRes.data.patients;
+                this.patientsCursor = patientsRes.data.pagination.next_cursor;
+            } catch (error) {
+                this.$root.showToast('Search failed', 'error');
+            }
+        },
+
+        async loadMoreDoctors() {
+            try {
+                const response = await API.admin.getDoctors(this.searchParams(this.doctorsCursor));
+                this.doctors.push(...response.data.doctors);
+                this.doctorsCursor = response.data.pagination.next_cursor;
+            } catch (error) {
+                this.$root.showToast('Failed to load doctors', 'error');
+            }
+        },
+
+        async loadMorePatients() {
+            try {
+                const response = await API.admin.getPatients(this.searchParams(this.patientsCursor));
+                this.patients.push(...response.data.patients);
+                this.patientsCursor = response.data.pagination.next_cursor;
+            } catch (error) {
+                this.$root.showToast('Failed to load patients', 'error');
+            }
+        },
+
+        async loadMoreAppointments() {
+            try {
+                const params = { cursor: this.appointmentsCursor };
+                if (this.appointmentFilter) params.status = this.appointmentFilter;
+                const response = await API.admin.getAppointments(params);
+                this.appointments.push(...response.data.appointments);
+                this.appointmentsCursor = response.data.pagination.next_cursor;
             } catch (error) {
                 this.$root.showToast('Failed to load appointments', 'error');
             }
@@ -636,12 +701,26 @@ const AdminDashboard = {
                 this.selectedPatient = patient;
                 const response = await API.admin.getAppointments({ patient_id: patient.id });
                 this.patientAppointments = response.data.appointments;
+                this.patientAppointmentsCursor = response.data.pagination.next_cursor;
                 this.showPatientHistoryModal = true;
             } catch (error) {
                 this.$root.showToast('Failed to load patient history', 'error');
             }
         },
 
+        async loadMorePatientHistory() {
+            try {
+                const response = await API.admin.getAppointments({
+                    patient_id: this.selectedPatient.id,
+                    cursor: this.patientAppointmentsCursor
+                });
+                this.patientAppointments.push(...response.data.appointments);
+                this.patientAppointmentsCursor = response.data.pagination.next_cursor;
+            } catch (error) {
+                this.$root.showToast('Failed to load patient history', 'error');
+            }
+        },
+
         viewDoctorDetails(doctor) {
             alert(`Doctor Details:\n\nName: ${doctor.full_name}\nDepartment: ${doctor.department_name}\nQualification: ${doctor.qualification}\nExperience: ${doctor.experience_years} years\nPhone: ${doctor.phone}`);
         },
@@ -658,5 +737,12 @@ const AdminDashboard = {
             };
             return classes[status] || '';
         }
+    },
+
+    watch: {
+        searchQuery() {
+            clearTimeout(this.searchTimer);
+            this.searchTimer = setTimeout(() => this.search(), 300);
+        }
     }
 };
@@ -109,6 +109,11 @@ const DoctorDashboard = {
                                 </div>
                             </div>
                         </div>
+                        <div class="text-center" v-if="patientsCursor">
+                            <button class="btn btn-outline-primary" @click="loadMorePatients">
+                                Load more
+                            </button>
+                        </div>
                     </div>
                 </div>
 
@@ -301,6 +306,7 @@ const DoctorDashboard = {
             },
             appointments: [],
             patients: [],
+            patientsCursor: null,
             availability: [],
             patientHistory: [],
             selectedAppointment: null,
@@ -343,6 +349,7 @@ const DoctorDashboard = {
                 this.stats = statsRes.data;
                 this.appointments = aptsRes.data.appointments;
                 this.patients = patientsRes.data.patients;
+                this.patientsCursor = patientsRes.data.pagination.next_cursor;
                 this.availability = availRes.data.availability;
 
             } catch (error) {
@@ -352,6 +359,16 @@ const DoctorDashboard = {
             }
         },
 
+        async loadMorePatients() {
+            try {
+                const response = await API.doctor.getPatients({ cursor: this.patientsCursor });
+                this.patients.push(...response.data.patients);
+                this.patientsCursor = response.data.pagination.next_cursor;
+            } catch (error) {
+                this.$root.showToast('Failed to load patients', 'error');
+            }
+        },
+
         markComplete(appointment) {
             this.selectedAppointment = appointment;
             this.treatmentForm = {
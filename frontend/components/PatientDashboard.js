@@ -583,7 +583,16 @@ const PatientDashboard = {
         async exportTreatmentHistory() {
             try {
                 this.exporting = true;
-                const response = await API.patient.exportTreatments();
+                // Build the file in the background and poll until it is ready
+                let job = (await API.patient.startExport()).data.job;
+                while (job.status === 'Pending' || job.status === 'Running') {
+                    await new Promise(resolve => setTimeout(resolve, 1000));
+                    job = (await API.patient.getExportStatus(job.id)).data.job;
+                }
+                if (job.status !== 'Completed') {
+                    throw new Error(job.error || 'Export failed');
+                }
+                const response = await API.patient.downloadExport(job.id);
                  // Create a blob and trigger download
                 const blob = new Blob([response.data], { type: 'text/csv' });
                 const url = window.URL.createObjectURL(blob);
@@ -594,7 +603,7 @@ const PatientDashboard = {
                 link.click();
                 link.remove();
             } catch (error) {
-                const message = error.response?.data?.error || 'Failed to export treatment history.';
+                const message = error.response?.data?.error || error.message || 'Failed to export treatment history.';
                 this.$root.showToast(message, 'error');
             } finally {
                 this.exporting = false;
@@ -88,8 +88,8 @@ const API = {
             apiClient.delete(`/admin/doctors/${id}`),
 
         // Patients
-        getPatients: () =>
-            apiClient.get('/admin/patients'),
+        getPatients: (params) =>
+            apiClient.get('/admin/patients', { params }),
 
         getPatient: (id) =>
             apiClient.get(`/admin/patients/${id}`),
@@ -125,8 +125,8 @@ const API = {
             apiClient.post(`/doctor/appointments/${id}/cancel`),
 
         // Patients
-        getPatients: () =>
-            apiClient.get('/doctor/patients'),
+        getPatients: (params) =>
+            apiClient.get('/doctor/patients', { params }),
 
         getPatientHistory: (patientId) =>
             apiClient.get(`/doctor/patients/${patientId}/history`),
@@ -203,8 +203,14 @@ const API = {
         // Export
         exportTreatments: () =>
             apiClient.get('/patient/export/treatments', { responseType: 'blob' }),
-        
+
+        startExport: () =>
+            apiClient.post('/patient/export/treatments/jobs'),
+
         getExportStatus: (taskId) =>
-            apiClient.get(`/patient/export/status/${taskId}`)
+            apiClient.get(`/patient/export/status/${taskId}`),
+
+        downloadExport: (taskId) =>
+            apiClient.get(`/patient/export/download/${taskId}`, { responseType: 'blob' })
     }
 };